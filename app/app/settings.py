@@ -34,13 +34,19 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    # Sessions, CSRF, authentication and messages only run for the admin
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+# Requests under this path use token authentication only
+API_PATH_PREFIX = '/api/'
 
 ROOT_URLCONF = 'app.urls'
 
@@ -75,11 +81,140 @@ DATABASES = {
     }
 }
 
+# Read replicas, one per host in DB_REPLICA_HOSTS (comma separated)
+REPLICA_DATABASES = []
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip())
+    REPLICA_DATABASES.append(alias)
+
 if 'test' in sys.argv:
-    DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': 'mockdatabase'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': 'mockdatabase'
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': 'mockreplica',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+    REPLICA_DATABASES = []
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write. The pin
+# is kept in the cache, which must then be shared (core.checks)
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+# Replicas further behind the primary than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG', 2))
+REPLICA_HEALTH_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+
+# Caches must be shared by all worker processes in production (for
+# example memcached), invalidation relies on a single per-user counter
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
+}
+
+# Seconds derived recipe data (shopping lists, statistics...) stays cached
+RECIPE_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_MAX_RECIPES = 1000
+SIMILAR_RECIPES_MAX = 50
+COOKABLE_RECIPES_MAX = 100
+RECIPE_MULTI_GET_MAX = 100
+RECIPE_STATS_MAX_BUCKETS = 50
+# Memory budget of the per-process tag/ingredient bitmap indexes
+RECIPE_INDEX_MAX_BYTES = int(
+    os.environ.get('RECIPE_INDEX_MAX_BYTES', 64 * 1024 * 1024))
+
+# Paginated counts above this many rows come from the planner estimates
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Rows deleted per transaction by the background deletion tasks
+DELETION_BATCH_SIZE = 500
+# Running deletion tasks without a batch deleted for this long are
+# presumed lost with their runner and resumed
+DELETION_LOCK_TIMEOUT = 10 * 60
+
+# Smallest complete response worth compressing, in bytes
+GZIP_MIN_LENGTH = 1024
+# Recipes encoded per chunk of streamed recipe lists
+RECIPE_STREAM_CHUNK_SIZE = 500
+# Ids per query when reading recipes matched in memory, below the SQLite
+# limit on query parameters
+RECIPE_FETCH_CHUNK_SIZE = 500
+
+# Defaults of the serve command (see core.server)
+SERVE_BIND = os.environ.get('SERVE_BIND', '0.0.0.0:8000')
+# Workers share throttles, cache generations and replica pins through the
+# cache, so a single one is served until a shared cache is configured
+SERVE_WORKERS = int(os.environ.get(
+    'SERVE_WORKERS',
+    (os.cpu_count() or 1) if 'CACHE_BACKEND' in os.environ else 1))
+SERVE_BACKLOG = 2048
+SERVE_MAX_REQUESTS = int(os.environ.get('SERVE_MAX_REQUESTS', 5000))
+SERVE_MAX_REQUESTS_JITTER = int(
+    os.environ.get('SERVE_MAX_REQUESTS_JITTER', 500))
+SERVE_TIMEOUT = int(os.environ.get('SERVE_TIMEOUT', 30))
+SERVE_GRACEFUL_TIMEOUT = int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30))
+
+# Sub-requests accepted by the batch endpoint
+BATCH_MAX_REQUESTS = 20
+# Threads running the reads of a batch on PostgreSQL, each with its own
+# connection importing the batch's snapshot; 1 runs them in order on the
+# request's connection
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 1))
+
+# Change feed used by clients to sync (see recipe.changes). Cursors and
+# tombstones expire after SYNC_RETENTION seconds, then clients resync.
+SYNC_RETENTION = 30 * 24 * 60 * 60
+# Changes are served once they are this old, so that transactions still
+# in progress (which must be shorter) cannot add earlier positions
+SYNC_SETTLE_SECONDS = 5
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+# Background jobs (see core.jobs), registered by these modules
+JOB_MODULES = ['core.deletion', 'recipe.jobs']
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 4))
+# Seconds between polls of an idle worker
+JOB_POLL_INTERVAL = 1.0
+# Workers refresh the lock of their running jobs this often; jobs whose
+# lock is older than JOB_LOCK_TIMEOUT are presumed lost with their worker
+JOB_HEARTBEAT_INTERVAL = 60
+JOB_LOCK_TIMEOUT = 15 * 60
+# Retries wait JOB_RETRY_BACKOFF * 2 ** (attempts - 1) seconds, at most
+# JOB_RETRY_BACKOFF_MAX
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+# Seconds between queue depth reports of the worker command
+JOB_METRICS_INTERVAL = 60
+
+# Requests allowed per client and scope (see core.throttling)
+THROTTLE_ENABLED = 'test' not in sys.argv
+THROTTLE_RATES = {
+    'login': '10/min',
+    'signup': '20/hour',
+    'recipe_create': '60/min',
+    'upload': '30/min',
+    # Per address, looser so accounts sharing an address are not starved
+    'recipe_create_ip': '300/min',
+    'upload_ip': '150/min',
+    'job_enqueue': '30/min',
+}
+# Share of a client's remaining allowance each process may grant without
+# asking the shared cache
+THROTTLE_LOCAL_FRACTION = 0.1
+
+# Fraction of requests profiled by core.middleware.ProfilingMiddleware
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -120,10 +255,13 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
+# Recipe exports, never served as media but through their owner's API
+EXPORT_ROOT = '/vol/private/exports'
 
 if 'test' in sys.argv:
     MEDIA_ROOT = './core/tests/vol/web/media'
     STATIC_ROOT = './core/tests/vol/web/static'
+    EXPORT_ROOT = './core/tests/vol/private/exports'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
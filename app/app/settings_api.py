@@ -0,0 +1,36 @@
+"""
+Settings for processes that only serve the token authenticated API.
+
+The admin, sessions, messages, static files and the browsable API are
+left out, so a new process imports and checks less before it serves its
+first request. Migrations are run with the full ``app.settings``.
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import INSTALLED_APPS, MIDDLEWARE
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE if middleware not in (
+        'core.middleware.SessionMiddleware',
+        'core.middleware.CsrfViewMiddleware',
+        'core.middleware.AuthenticationMiddleware',
+        'core.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )
+]
+
+ROOT_URLCONF = 'app.urls_api'
+
+# JSON only, the browsable API needs templates and static files
+TEMPLATES = []
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
@@ -0,0 +1,12 @@
+from django.conf.urls.static import static
+from django.urls import path, include
+from django.conf import settings
+
+from core.views import BatchView
+
+urlpatterns = [
+    path('api/user/', include('user.urls')),
+    path('api/recipe/', include('recipe.urls')),
+    path('api/jobs/', include('core.urls')),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,26 @@
+"""
+End-to-end API benchmarks.
+
+The benchmarks drive the real URL routes in-process against the test
+database and compare the results with ``benchmarks/baseline.json``.
+They are not collected by the regular test run; execute them with:
+
+    python manage.py test benchmarks --pattern="bench_*.py"
+
+The dataset and run size are configured through environment variables:
+
+    BENCH_USERS, BENCH_RECIPES, BENCH_TAGS, BENCH_INGREDIENTS,
+    BENCH_SEED, BENCH_ITERATIONS, BENCH_TOLERANCE
+
+Suites measuring a single very large recipe book read the same settings
+with a ``BENCH_LARGE`` prefix (for example ``BENCH_LARGE_RECIPES``), and
+the statistics suite, which seeds a million recipes, with a
+``BENCH_STATS`` prefix.
+
+Set ``BENCH_UPDATE_BASELINE=1`` to rewrite the baseline with the
+current results instead of comparing against it. Query counts and the
+response sizes recorded by some scenarios must never exceed the
+baseline; latency and allocations may exceed it by ``BENCH_TOLERANCE``
+(a fraction, 1.0 by default). Latencies depend on the
+machine, so record the baseline where the benchmarks are run.
+"""
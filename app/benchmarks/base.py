@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import CanonicalName, Tag, Ingredient, Recipe
+from core.profiling import RequestProfile
+from core.seeding import insert_links
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+PASSWORD = 'Sstring1'
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def dataset_config(prefix, defaults):
+    """Return the dataset parameters, overridable through the environment"""
+    return {
+        key: env_int(f'{prefix}_{key.upper()}', value)
+        for key, value in defaults.items()
+    }
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def seed_dataset(users, recipes, tags, ingredients, seed):
+    """Create users with tags, ingredients and linked recipes"""
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    get_user_model().objects.bulk_create([
+        get_user_model()(email=f'bench{i}@mail.com', password=password)
+        for i in range(users)
+    ])
+    owners = list(get_user_model().objects.filter(
+        email__startswith='bench').order_by('id'))
+    catalog = CanonicalName.objects.intern_many(
+        [f'Tag {i}' for i in range(tags)] +
+        [f'Ingredient {i}' for i in range(ingredients)])
+    Tag.objects.bulk_create([
+        Tag(user=owner, name=f'Tag {i}', canonical_id=catalog[f'tag {i}'])
+        for owner in owners for i in range(tags)
+    ])
+    Ingredient.objects.bulk_create([
+        Ingredient(user=owner, name=f'Ingredient {i}',
+                   canonical_id=catalog[f'ingredient {i}'])
+        for owner in owners for i in range(ingredients)
+    ])
+    Recipe.objects.bulk_create([
+        Recipe(
+            user=owner,
+            title=f'Recipe {i}',
+            time_minutes=rng.randint(5, 240),
+            price=Decimal(rng.randint(100, 99999)) / 100,
+        )
+        for owner in owners for i in range(recipes)
+    ])
+
+    tag_ids, ingredient_ids = {}, {}
+    for user_id, pk in Tag.objects.values_list('user_id', 'id'):
+        tag_ids.setdefault(user_id, []).append(pk)
+    for user_id, pk in Ingredient.objects.values_list('user_id', 'id'):
+        ingredient_ids.setdefault(user_id, []).append(pk)
+    tag_links, ingredient_links = [], []
+    for user_id, pk in Recipe.objects.values_list('user_id', 'id'):
+        tag_links.extend(
+            (pk, tag_id)
+            for tag_id in rng.sample(tag_ids[user_id], min(3, tags)))
+        ingredient_links.extend(
+            (pk, ingredient_id) for ingredient_id in rng.sample(
+                ingredient_ids[user_id], min(8, ingredients)))
+    insert_links(Recipe.tags, tag_links, 5000)
+    insert_links(Recipe.ingredients, ingredient_links, 5000)
+    return owners
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {}
+    with open(BASELINE_PATH) as baseline:
+        return json.load(baseline)
+
+
+def compare(name, result, expected, tolerance):
+    """Return a description of every metric that regressed"""
+    problems = []
+    if result['queries'] > expected['queries']:
+        problems.append(
+            f"{name}: {result['queries']} queries per request "
+            f"(baseline {expected['queries']})")
+    # Response sizes are deterministic for a dataset
+    if result.get('bytes', 0) > expected.get('bytes', math.inf):
+        problems.append(
+            f"{name}: {result['bytes']} bytes (baseline {expected['bytes']})")
+    # p99 is recorded but too noisy at these sample sizes to gate on
+    for metric in ('p50_ms', 'p95_ms', 'alloc_kb'):
+        limit = expected[metric] * (1 + tolerance)
+        # Timer noise of a couple of milliseconds is not a regression
+        if result[metric] > limit and result[metric] - expected[metric] > 2:
+            problems.append(
+                f'{name}: {metric} {result[metric]} '
+                f'(baseline {expected[metric]}, limit {limit:.2f})')
+    return problems
+
+
+class BenchmarkCase(TestCase):
+    """Seed a dataset once and measure API scenarios against it"""
+    # Baseline section and prefix of the environment variables
+    suite = 'BENCH'
+    dataset_defaults = {
+        'users': 5,
+        'recipes': 200,
+        'tags': 20,
+        'ingredients': 50,
+        'seed': 1,
+    }
+    iterations = env_int('BENCH_ITERATIONS', 30)
+    tolerance = float(os.environ.get('BENCH_TOLERANCE', 1.0))
+    update_baseline = os.environ.get('BENCH_UPDATE_BASELINE') == '1'
+    results = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.results = {}
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = dataset_config(cls.suite, cls.dataset_defaults)
+        started = time.perf_counter()
+        owners = seed_dataset(**cls.dataset)
+        cls.seed_seconds = time.perf_counter() - started
+        cls.user = owners[0]
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.update_baseline and cls.results:
+            baseline = load_baseline()
+            section = baseline.get(cls.suite, {})
+            if section.get('dataset') != cls.dataset:
+                section = {'dataset': cls.dataset, 'scenarios': {}}
+            section['scenarios'].update(cls.results)
+            baseline[cls.suite] = section
+            with open(BASELINE_PATH, 'w') as output:
+                json.dump(baseline, output, indent=2, sort_keys=True)
+                output.write('\n')
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def fetch(self, url, params=None, **headers):
+        """Request ``url`` and return the whole body, streamed or not"""
+        response = self.client.get(url, params, **headers)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def measure(self, request):
+        """Call ``request`` repeatedly and return its performance metrics"""
+        request()
+        latencies, queries = [], []
+        for _ in range(self.iterations):
+            profile = RequestProfile()
+            connection = connections['default']
+            with connection.execute_wrapper(profile.execute_wrapper):
+                start = time.perf_counter()
+                request()
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(profile.query_count)
+
+        allocations = []
+        for _ in range(min(self.iterations, 5)):
+            tracemalloc.start()
+            try:
+                request()
+                allocations.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': max(queries),
+            'alloc_kb': round(max(allocations) / 1024, 1),
+        }
+
+    def run_scenario(self, name, request, **extra):
+        """
+        Measure a scenario and fail if it regressed from the baseline.
+        ``extra`` metrics (such as ``bytes``) are recorded along with it.
+        """
+        result = self.measure(request)
+        result.update(extra)
+        self.results[name] = result
+        print(f'\n{name}: {json.dumps(result)}', end=' ')
+        if self.update_baseline:
+            return result
+
+        baseline = load_baseline().get(self.suite, {})
+        if baseline.get('dataset') != self.dataset:
+            self.skipTest('baseline was recorded for a different dataset')
+        expected = baseline['scenarios'].get(name)
+        if expected is None:
+            self.skipTest(f'no baseline recorded for {name}')
+        problems = compare(name, result, expected, self.tolerance)
+        self.assertFalse(problems, 'Performance regression:\n' +
+                         '\n'.join(problems))
+        return result
@@ -0,0 +1,126 @@
+import io
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+from benchmarks.base import BenchmarkCase, PASSWORD
+from core.models import Recipe
+from recipe.snapshots import refresh_snapshots
+
+RECIPE_URL = reverse('recipe:recipe-list')
+SEARCH_URL = reverse('recipe:recipe-search-recipe')
+MULTI_GET_URL = reverse('recipe:recipe-multi-get')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+BATCH_URL = reverse('batch')
+
+
+class ApiBenchmarks(BenchmarkCase):
+    """Latency, queries and allocations of the public API routes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Bulk seeding skips the signals that maintain the snapshots
+        refresh_snapshots(Recipe.objects.values_list('id', flat=True))
+
+    def test_recipe_list(self):
+        self.run_scenario(
+            'recipe-list', lambda: self.fetch(RECIPE_URL))
+
+    def test_recipe_detail(self):
+        recipe = Recipe.objects.filter(user=self.user).first()
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.run_scenario('recipe-detail', lambda: self.client.get(url))
+
+    def test_recipe_multi_get(self):
+        ids = Recipe.objects.filter(user=self.user).values_list(
+            'id', flat=True)[:20]
+        params = {'ids': ','.join(str(pk) for pk in ids)}
+        self.run_scenario(
+            'recipe-multi-get', lambda: self.client.get(MULTI_GET_URL, params))
+
+    def test_startup_batch(self):
+        # The calls of the app's startup screen in one round trip
+        payload = {'requests': [
+            {'path': ME_URL},
+            {'path': TAGS_URL},
+            {'path': INGREDIENTS_URL},
+            {'path': f'{RECIPE_URL}?limit=20'},
+        ]}
+        self.run_scenario('startup-batch', lambda: self.client.post(
+            BATCH_URL, payload, format='json'))
+
+    def test_recipe_search(self):
+        self.run_scenario(
+            'recipe-search',
+            lambda: self.client.get(SEARCH_URL, {'ingredient': 'dient 1'}))
+
+    def test_shopping_list(self):
+        ids = Recipe.objects.filter(
+            user=self.user).values_list('id', flat=True)
+        params = {'recipes': ','.join(str(pk) for pk in ids)}
+
+        def shopping_list():
+            # Measure the grouped query, not the cache hit
+            cache.clear()
+            return self.client.get(SHOPPING_LIST_URL, params)
+
+        self.run_scenario('shopping-list', shopping_list)
+
+    def test_recipe_create(self):
+        payload = {
+            'title': 'Benchmark pie',
+            'time_minutes': 30,
+            'price': 10,
+            'tags': list(self.user.tag_set.values_list('id', flat=True)[:3]),
+            'ingredients': list(
+                self.user.ingredient_set.values_list('id', flat=True)[:8]),
+        }
+        self.run_scenario(
+            'recipe-create',
+            lambda: self.client.post(RECIPE_URL, payload, format='json'))
+
+    def test_recipe_patch(self):
+        recipe = Recipe.objects.filter(user=self.user).first()
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        titles = iter(range(1000000))
+        self.run_scenario('recipe-patch', lambda: self.client.patch(
+            url, {'title': f'Benchmark {next(titles)}'}))
+
+    def test_recipe_image_upload(self):
+        recipe = Recipe.objects.filter(user=self.user).first()
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        uploaded = []
+
+        def upload():
+            image = io.BytesIO()
+            Image.new('RGB', (64, 64)).save(image, 'JPEG')
+            image.name = 'bench.jpg'
+            image.seek(0)
+            res = self.client.post(url, {'image': image}, format='multipart')
+            uploaded.append(Recipe.objects.get(id=recipe.id).image.name)
+            return res
+
+        try:
+            self.run_scenario('recipe-image-upload', upload)
+        finally:
+            for name in uploaded:
+                default_storage.delete(name)
+
+    def test_token_login(self):
+        payload = {'email': self.user.email, 'password': PASSWORD}
+        self.run_scenario(
+            'token-login', lambda: self.client.post(TOKEN_URL, payload))
+
+    def test_tag_list(self):
+        self.run_scenario('tag-list', lambda: self.client.get(TAGS_URL))
+
+    def test_ingredient_list(self):
+        self.run_scenario(
+            'ingredient-list', lambda: self.client.get(INGREDIENTS_URL))
@@ -0,0 +1,90 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from benchmarks.base import BenchmarkCase
+from core.models import Recipe
+from recipe.pagination import KeysetPagination
+
+RECIPE_URL = reverse('recipe:recipe-list')
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+CHANGES_URL = reverse('recipe:changes')
+
+
+class LargeRecipeBookBenchmarks(BenchmarkCase):
+    """Endpoints over one user with a very large recipe book"""
+    suite = 'BENCH_LARGE'
+    dataset_defaults = {
+        'users': 1,
+        'recipes': 100000,
+        'tags': 40,
+        'ingredients': 120,
+        'seed': 1,
+    }
+
+    def test_recipe_similar(self):
+        recipe = Recipe.objects.filter(user=self.user).first()
+        url = reverse('recipe:recipe-similar', args=[recipe.id])
+        self.run_scenario(
+            'recipe-similar', lambda: self.client.get(url, {'k': 20}))
+
+    def test_recipe_cookable(self):
+        ingredients = self.user.ingredient_set.order_by('id')[:15]
+        params = {
+            'ingredients': ','.join(str(item.id) for item in ingredients),
+            'k': 20,
+        }
+        self.run_scenario(
+            'recipe-cookable', lambda: self.client.get(COOKABLE_URL, params))
+
+    def test_recipe_filtered_page(self):
+        tag = self.user.tag_set.order_by('id').first()
+        params = {'tags': tag.id, 'limit': 50}
+        self.run_scenario(
+            'recipe-filtered-page',
+            lambda: self.client.get(RECIPE_URL, params))
+
+    def test_recipe_pages(self):
+        params = {'ordering': 'price', 'max_time': 120, 'limit': 50}
+        self.run_scenario(
+            'recipe-page-first', lambda: self.client.get(RECIPE_URL, params))
+
+        recipes = Recipe.objects.filter(user=self.user, time_minutes__lte=120)
+        last = recipes.order_by('price', 'id')[recipes.count() * 9 // 10]
+        pagination = KeysetPagination()
+        pagination.ordering = ['price', 'id']
+        deep = dict(params, cursor=pagination.encode_cursor(
+            [last.price, last.id]))
+        self.run_scenario(
+            'recipe-page-deep', lambda: self.client.get(RECIPE_URL, deep))
+
+    def test_recipe_list_streamed(self):
+        # About a tenth of the book
+        params = {'max_price': 100}
+
+        def first_byte():
+            response = self.client.get(RECIPE_URL, params)
+            next(iter(response.streaming_content))
+            response.close()
+
+        self.run_scenario('recipe-list-first-byte', first_byte)
+        body = self.fetch(RECIPE_URL, params)
+        self.run_scenario(
+            'recipe-list-streamed', lambda: self.fetch(RECIPE_URL, params),
+            bytes=len(body))
+        gzipped = self.fetch(RECIPE_URL, params, HTTP_ACCEPT_ENCODING='gzip')
+        self.run_scenario(
+            'recipe-list-gzip',
+            lambda: self.fetch(
+                RECIPE_URL, params, HTTP_ACCEPT_ENCODING='gzip'),
+            bytes=len(gzipped))
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_recipe_changes(self):
+        # A sync after a few edits reads the log, not the book
+        cursor = self.client.get(CHANGES_URL).data['cursor']
+        for recipe in Recipe.objects.filter(user=self.user)[:20]:
+            recipe.title += ' (edited)'
+            recipe.save()
+        self.run_scenario(
+            'recipe-changes',
+            lambda: self.client.get(CHANGES_URL, {'cursor': cursor}))
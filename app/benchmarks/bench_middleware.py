@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from benchmarks.base import BenchmarkCase
+from core.models import Recipe
+from recipe.snapshots import refresh_snapshots
+
+TAGS_URL = reverse('recipe:tag-list')
+
+# The middleware stack before the API skipped the browser middleware
+STOCK_MIDDLEWARE = [
+    {
+        'core.middleware.SessionMiddleware':
+            'django.contrib.sessions.middleware.SessionMiddleware',
+        'core.middleware.CsrfViewMiddleware':
+            'django.middleware.csrf.CsrfViewMiddleware',
+        'core.middleware.AuthenticationMiddleware':
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'core.middleware.MessageMiddleware':
+            'django.contrib.messages.middleware.MessageMiddleware',
+    }.get(path, path)
+    for path in settings.MIDDLEWARE
+]
+
+
+class MiddlewareBenchmarks(BenchmarkCase):
+    """Cost of the middleware stack on small API responses"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = Recipe.objects.filter(user=cls.user).first()
+        refresh_snapshots([cls.recipe.id])
+
+    def compare_stacks(self, name, url):
+        self.run_scenario(f'{name}-lean-middleware',
+                          lambda: self.client.get(url))
+        with override_settings(MIDDLEWARE=STOCK_MIDDLEWARE):
+            # The client builds its middleware chain on first use
+            self.setUp()
+            self.run_scenario(f'{name}-stock-middleware',
+                              lambda: self.client.get(url))
+
+    def test_tag_list(self):
+        self.compare_stacks('tag-list', TAGS_URL)
+
+    def test_recipe_detail(self):
+        self.compare_stacks(
+            'recipe-detail',
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
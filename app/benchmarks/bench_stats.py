@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from benchmarks.base import BenchmarkCase, env_int
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+class RecipeStatsBenchmarks(BenchmarkCase):
+    """Database aggregates over a million-recipe book"""
+    suite = 'BENCH_STATS'
+    dataset_defaults = {
+        'users': 1,
+        'recipes': 1000000,
+        'tags': 1,
+        'ingredients': 1,
+        'seed': 1,
+    }
+    # Every request scans the whole book, keep the run short
+    iterations = env_int('BENCH_STATS_ITERATIONS', 5)
+
+    def test_recipe_stats(self):
+        def stats():
+            # Measure the aggregate queries, not the cache hit
+            cache.clear()
+            return self.client.get(STATS_URL, {'buckets': 20})
+
+        self.run_scenario('recipe-stats', stats)
@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from benchmarks.base import BenchmarkCase
+from core.throttling import SlidingWindowThrottle, reset_local_state
+
+RECIPES_URL = reverse('recipe:recipe-list')
+# Throttle checks per measured call, a single one is below timer noise
+CHECKS = 1000
+
+
+@override_settings(THROTTLE_ENABLED=True, THROTTLE_RATES={
+    'bench': '10000000/min', 'recipe_create': '10000000/min',
+    'recipe_create_ip': '10000000/min', 'upload': '10000000/min',
+    'upload_ip': '10000000/min'})
+class ThrottleBenchmarks(BenchmarkCase):
+    """Per-request cost of the sliding window rate limits"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        reset_local_state()
+        self.request = mock.Mock(
+            user=mock.Mock(is_authenticated=True, pk=self.user.pk))
+
+    def check_many(self):
+        throttle = SlidingWindowThrottle('bench')
+        for _ in range(CHECKS):
+            throttle.allow_request(self.request, None)
+
+    def test_throttle_local(self):
+        with override_settings(THROTTLE_LOCAL_FRACTION=0.1):
+            self.run_scenario('throttle-local-1000', self.check_many)
+
+    def test_throttle_shared(self):
+        # Every check goes to the shared cache
+        with override_settings(THROTTLE_LOCAL_FRACTION=0):
+            self.run_scenario('throttle-shared-1000', self.check_many)
+
+    def test_recipe_create_throttled(self):
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '5.00'}
+        self.run_scenario(
+            'recipe-create-throttled',
+            lambda: self.client.post(RECIPES_URL, payload))
@@ -2,12 +2,16 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from core import models
+from core.pagination import EstimatedCountPaginator
 from django.utils.translation import gettext as _
 
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['email__startswith']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -27,7 +31,81 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class OwnerFilter(admin.SimpleListFilter):
+    """
+    Restrict a changelist to one user's objects. Only the selected user is
+    offered, so the sidebar never lists every account.
+    """
+    title = _('owner')
+    parameter_name = 'user'
+
+    def lookups(self, request, model_admin):
+        user = self.owner()
+        return [(str(user.pk), user.email)] if user else []
+
+    def owner(self):
+        try:
+            return models.User.objects.filter(pk=int(self.value())).first()
+        except (TypeError, ValueError):
+            return None
+
+    def queryset(self, request, queryset):
+        if self.value() is not None:
+            return queryset.filter(user_id=self.value())
+        return queryset
+
+
+class OwnedObjectAdmin(admin.ModelAdmin):
+    """
+    Admin of objects owned by a user: related objects are picked through
+    autocomplete widgets, searches are index backed prefix matches best
+    narrowed down by owner, and changelists skip exact counts of large
+    tables.
+    """
+    autocomplete_fields = ['user']
+    list_select_related = ['user']
+    list_filter = [OwnerFilter]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+class TagAdmin(OwnedObjectAdmin):
+    list_display = ['name', 'user']
+    search_fields = ['name__startswith']
+
+
+class IngredientAdmin(OwnedObjectAdmin):
+    list_display = ['name', 'user']
+    search_fields = ['name__startswith']
+
+
+class RecipeAdmin(OwnedObjectAdmin):
+    list_display = ['title', 'user', 'price', 'time_minutes']
+    search_fields = ['title__startswith']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+
+
+class DeletionTaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'user_id', 'status', 'deleted', 'total',
+                    'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    raw_id_fields = ['user']
+    readonly_fields = ['kind', 'user', 'recipe_ids', 'total', 'deleted',
+                       'error', 'created_at', 'finished_at']
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'user_id', 'status', 'attempts',
+                    'run_after', 'created_at', 'finished_at']
+    list_filter = ['name', 'status']
+    raw_id_fields = ['user']
+    readonly_fields = ['name', 'payload', 'user', 'attempts', 'locked_at',
+                       'result', 'error', 'created_at', 'finished_at']
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.DeletionTask, DeletionTaskAdmin)
+admin.site.register(models.Job, JobAdmin)
@@ -0,0 +1,11 @@
+from rest_framework import authentication
+
+from core import profiling
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication that reports its time to the request profile"""
+
+    def authenticate(self, request):
+        with profiling.timed('auth'):
+            return super().authenticate(request)
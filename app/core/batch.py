@@ -0,0 +1,149 @@
+import json
+import logging
+from concurrent import futures
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.urls import Resolver404, resolve
+
+from core.db_router import choose_replica, read_from_replicas
+from core.middleware import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = b'{"detail":"Not found."}'
+SERVER_ERROR = b'{"detail":"Server error."}'
+
+
+def split_path(path):
+    """Split a sub-request path into the path and its query string"""
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def build_request(request, method, path, body=None):
+    """
+    Derive a sub-request from ``request``: same client and headers, with
+    its own method, path and JSON body. It is authenticated as the user
+    of ``request`` without authenticating again.
+    """
+    path, query = split_path(path)
+    content = b'' if body is None else json.dumps(body).encode()
+    environ = dict(request.META)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': BytesIO(content),
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def call_view(sub_request):
+    """Run the view routed for a sub-request and return status and body"""
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return 404, NOT_FOUND
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        # Not closed: closing sends request_finished, which would close
+        # the database connection shared by the whole batch
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+    except Exception:
+        logger.exception('Batched %s %s failed', sub_request.method,
+                         sub_request.get_full_path())
+        return 500, SERVER_ERROR
+    if not content:
+        content = b'null'
+    elif not response.get('Content-Type', '').startswith('application/json'):
+        content = json.dumps(content.decode(errors='replace')).encode()
+    return response.status_code, content
+
+
+@contextmanager
+def read_snapshot(using=DEFAULT_DB_ALIAS):
+    """
+    Run the block in one transaction whose reads all see the same state
+    of the database. PostgreSQL needs repeatable read for that; a
+    transaction is enough for SQLite.
+    """
+    connection = connections[using]
+    nested = connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql' and not nested:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield connection
+
+
+def call_views_concurrently(sub_requests, workers, using=DEFAULT_DB_ALIAS):
+    """
+    Run sub-requests in threads whose connections import the snapshot of
+    the current PostgreSQL transaction, so they read the same state.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT pg_export_snapshot()')
+        snapshot = cursor.fetchone()[0]
+
+    def call(sub_request):
+        connection = connections[using]
+        try:
+            with read_from_replicas(using != DEFAULT_DB_ALIAS, using), \
+                    transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                    cursor.execute('SET TRANSACTION SNAPSHOT %s', [snapshot])
+                return call_view(sub_request)
+        finally:
+            connection.close()
+
+    with futures.ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(call, sub_requests))
+
+
+def run_batch(request, specs, concurrency=1, replicas=False):
+    """
+    Run the sub-requests described by ``specs`` and return their statuses
+    and JSON bodies in order. Batches of reads share one transaction
+    snapshot, on a replica when ``replicas`` allows it; they run
+    concurrently with ``concurrency`` above one on PostgreSQL. Batches
+    with writes run one after the other on the primary.
+    """
+    sub_requests = [
+        build_request(request, spec['method'], spec['path'], spec.get('body'))
+        for spec in specs
+    ]
+    if any(spec['method'] not in SAFE_METHODS for spec in specs):
+        return [call_view(sub_request) for sub_request in sub_requests]
+    using = choose_replica() if replicas else DEFAULT_DB_ALIAS
+    with read_from_replicas(replicas, using), \
+            read_snapshot(using) as connection:
+        if concurrency > 1 and len(sub_requests) > 1 and \
+                connection.vendor == 'postgresql':
+            return call_views_concurrently(sub_requests, concurrency, using)
+        return [call_view(sub_request) for sub_request in sub_requests]
+
+
+def encode_responses(responses):
+    """Join the JSON bodies of the sub-responses without decoding them"""
+    items = b','.join(
+        b'{"status":%d,"body":%s}' % (status, content)
+        for status, content in responses
+    )
+    return b'{"responses":[' + items + b']}'
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries are not seen by the other processes
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """Whether entries stored by one process are seen by all the others"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """Read-your-writes pins must reach every process serving the client"""
+    if settings.REPLICA_DATABASES and not cache_is_shared():
+        return [Error(
+            'Read replicas require a cache shared by all processes.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION, for example to '
+                 'memcached, so a write pins its client to the primary '
+                 'in every worker.',
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,105 @@
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+_state = Local()
+_health = {}
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+             OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_aliases():
+    """Return the database aliases configured as read replicas"""
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+@contextmanager
+def read_from_replicas(enabled=True, alias=None):
+    """
+    Allow reads inside the block to be served by a replica, all by
+    ``alias`` when given so they see the same database.
+    """
+    previous = (getattr(_state, 'use_replica', False),
+                getattr(_state, 'alias', None))
+    _state.use_replica, _state.alias = enabled, alias
+    try:
+        yield
+    finally:
+        _state.use_replica, _state.alias = previous
+
+
+def replica_lag(alias):
+    """Return how many seconds the replica is behind the primary"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        connection.ensure_connection()
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def replica_is_healthy(alias):
+    """Check (at most once per interval) that a replica is usable"""
+    now = time.monotonic()
+    checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and \
+            now - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+    try:
+        healthy = replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    except DatabaseError:
+        healthy = False
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Return a healthy replica, or the primary when none is"""
+    candidates = [
+        alias for alias in replica_aliases() if replica_is_healthy(alias)
+    ]
+    if not candidates:
+        return DEFAULT_DB_ALIAS
+    return random.choice(candidates)
+
+
+def reset_replica_health():
+    """Forget cached replica health so the next read re-checks it"""
+    _health.clear()
+
+
+class ReplicaRouter:
+    """Route reads to a healthy replica when the request allows it"""
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False):
+            return DEFAULT_DB_ALIAS
+        return getattr(_state, 'alias', None) or choose_replica()
+
+    def db_for_write(self, model, **hints):
+        # Once a request writes, its later reads must see that write
+        _state.use_replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
@@ -0,0 +1,165 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from core.models import DeletionTask, Ingredient, Recipe, Tag
+from recipe.changes import deferred_changes
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_SALT = 'core.deletion.progress'
+
+
+def schedule_account_deletion(user):
+    """
+    Deactivate an account and queue the deletion of its data. The user
+    can no longer log in once this returns.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        total = sum(
+            model.objects.filter(user=user).count()
+            for model in (Recipe, Tag, Ingredient)) + 1
+        task = DeletionTask.objects.create(
+            kind=DeletionTask.ACCOUNT, user=user, total=total)
+        jobs.enqueue('deletion', {'task_id': task.id}, user=user)
+        return task
+
+
+def schedule_recipe_deletion(user, recipe_ids):
+    """Queue the deletion of the user's recipes among ``recipe_ids``"""
+    recipe_ids = list(Recipe.objects.filter(
+        user=user, id__in=recipe_ids,
+    ).order_by('id').values_list('id', flat=True))
+    with transaction.atomic():
+        task = DeletionTask.objects.create(
+            kind=DeletionTask.RECIPES, user=user, recipe_ids=recipe_ids,
+            total=len(recipe_ids))
+        jobs.enqueue('deletion', {'task_id': task.id}, user=user)
+        return task
+
+
+def batches(task, batch_size):
+    """Yield querysets of at most ``batch_size`` rows left to delete"""
+    if task.kind == DeletionTask.RECIPES:
+        for start in range(0, len(task.recipe_ids), batch_size):
+            yield Recipe.objects.filter(
+                user_id=task.user_id,
+                id__in=task.recipe_ids[start:start + batch_size])
+        return
+    for model in (Recipe, Tag, Ingredient):
+        while True:
+            ids = list(model.objects.filter(
+                user_id=task.user_id,
+            ).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            yield model.objects.filter(id__in=ids)
+    yield get_user_model().objects.filter(id=task.user_id)
+
+
+def run_task(task, batch_size=None):
+    """
+    Delete the rows of a task one batch per transaction, recording the
+    progress along with every batch so an interrupted task can resume.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    # Nobody is left to sync the changes of a deleted account
+    discard = task.kind == DeletionTask.ACCOUNT
+    try:
+        for queryset in batches(task, batch_size):
+            with transaction.atomic(), deferred_changes(discard=discard):
+                _, counts = queryset.delete()
+                DeletionTask.objects.filter(id=task.id).update(
+                    deleted=F('deleted') + counts.get(
+                        queryset.model._meta.label, 0),
+                    locked_at=timezone.now())
+    except Exception as exc:
+        logger.exception('Deletion task %s failed', task.id)
+        DeletionTask.objects.filter(id=task.id).update(
+            status=DeletionTask.FAILED, error=str(exc))
+        raise
+    DeletionTask.objects.filter(id=task.id).update(
+        status=DeletionTask.DONE, finished_at=timezone.now())
+    task.refresh_from_db()
+    return task
+
+
+def claimable_tasks():
+    """Pending tasks and running ones whose runner stopped deleting"""
+    stalled = timezone.now() - timedelta(
+        seconds=settings.DELETION_LOCK_TIMEOUT)
+    return DeletionTask.objects.filter(
+        Q(status=DeletionTask.PENDING) |
+        Q(status=DeletionTask.RUNNING, locked_at__lt=stalled) |
+        Q(status=DeletionTask.RUNNING, locked_at__isnull=True))
+
+
+def claim_task():
+    """
+    Mark the oldest claimable task as running and return it; stalled
+    tasks resume where their last batch left them.
+    """
+    for task in claimable_tasks().order_by('id')[:10]:
+        now = timezone.now()
+        claimed = claimable_tasks().filter(id=task.id).update(
+            status=DeletionTask.RUNNING, locked_at=now)
+        if claimed:
+            task.status, task.locked_at = DeletionTask.RUNNING, now
+            return task
+    return None
+
+
+def progress_token(task):
+    """Signed token giving access to the progress of a task"""
+    return signing.dumps(task.id, salt=PROGRESS_SALT)
+
+
+def task_from_token(token):
+    """Task of a progress token, or None when the token is invalid"""
+    try:
+        task_id = signing.loads(token, salt=PROGRESS_SALT)
+    except signing.BadSignature:
+        return None
+    return DeletionTask.objects.filter(id=task_id).first()
+
+
+def process_deletions(batch_size=None, limit=None):
+    """Run pending deletion tasks, returning the ones that completed"""
+    done = []
+    while limit is None or len(done) < limit:
+        task = claim_task()
+        if task is None:
+            break
+        try:
+            done.append(run_task(task, batch_size))
+        except Exception:
+            continue
+    return done
+
+
+@jobs.register('deletion', max_attempts=5)
+def deletion_job(job):
+    """Run the deletion task of a job unless process_deletions took it"""
+    statuses = [DeletionTask.PENDING, DeletionTask.FAILED]
+    if job.attempts > 1:
+        # The previous attempt may have died with the task running
+        statuses.append(DeletionTask.RUNNING)
+    task_id = job.payload['task_id']
+    if not DeletionTask.objects.filter(
+            id=task_id, status__in=statuses,
+    ).update(status=DeletionTask.RUNNING, error='',
+             locked_at=timezone.now()):
+        return None
+    task = run_task(DeletionTask.objects.get(id=task_id))
+    return {'deleted': task.deleted, 'total': task.total}
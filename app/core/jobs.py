@@ -0,0 +1,178 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class JobType:
+    """A registered job function and how it may be run"""
+
+    def __init__(self, name, func, max_attempts, public):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.public = public
+
+
+def register(name, max_attempts=3, public=False):
+    """
+    Register the decorated function as the job ``name``. It is called
+    with the ``Job`` and returns a JSON serializable result. Public jobs
+    may be enqueued by users through the API.
+    """
+    def decorator(func):
+        _registry[name] = JobType(name, func, max_attempts, public)
+        return func
+    return decorator
+
+
+def job_types():
+    """Return the registered job types, importing ``JOB_MODULES``"""
+    for module in settings.JOB_MODULES:
+        import_module(module)
+    return _registry
+
+
+def enqueue(name, payload=None, user=None, run_after=None):
+    """
+    Queue a job with the ``payload`` dict. Enqueued in the current
+    transaction, the job only becomes visible to workers if the
+    transaction commits.
+    """
+    job_type = job_types()[name]
+    return Job.objects.create(
+        name=name, payload=payload or {}, user=user,
+        max_attempts=job_type.max_attempts,
+        run_after=run_after or timezone.now())
+
+
+def ready_jobs():
+    return Job.objects.filter(
+        status=Job.QUEUED, run_after__lte=timezone.now(),
+    ).order_by('run_after', 'id')
+
+
+def claim_jobs(limit):
+    """
+    Mark up to ``limit`` ready jobs as running and return them. Rows
+    locked by another worker are skipped with ``FOR UPDATE SKIP LOCKED``;
+    databases without it (sqlite) claim each row with a conditional
+    update instead.
+    """
+    now = timezone.now()
+    changes = {'status': Job.RUNNING, 'locked_at': now,
+               'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready_jobs().select_for_update(
+                skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**changes)
+    else:
+        ids = [
+            pk for pk in ready_jobs().values_list('id', flat=True)[:limit]
+            if Job.objects.filter(id=pk, status=Job.QUEUED).update(**changes)
+        ]
+    return list(Job.objects.filter(id__in=ids).order_by('run_after', 'id'))
+
+
+def heartbeat(job_ids):
+    """Refresh the lock of jobs still running in this worker"""
+    return Job.objects.filter(id__in=job_ids, status=Job.RUNNING).update(
+        locked_at=timezone.now())
+
+
+def release_stalled_jobs():
+    """
+    Queue again the jobs whose worker stopped refreshing their lock, or
+    fail them when they used up their attempts.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    stalled = Job.objects.filter(status=Job.RUNNING, locked_at__lt=deadline)
+    error = 'Worker stopped while running the job'
+    released = stalled.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, locked_at=None, error=error)
+    failed = stalled.update(
+        status=Job.FAILED, finished_at=timezone.now(), error=error)
+    return released + failed
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter after ``attempts`` failures"""
+    delay = settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+    delay = min(delay, settings.JOB_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    job_type = job_types().get(job.name)
+    try:
+        if job_type is None:
+            raise LookupError(f'Unknown job {job.name!r}')
+        result = job_type.func(job)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.id, job.name)
+        error = traceback.format_exc()
+        if job_type is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        job.error = error
+        job.locked_at = None
+        job.save(update_fields=['status', 'run_after', 'finished_at',
+                                'error', 'locked_at'])
+        return job
+    job.status = Job.DONE
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'finished_at'])
+    return job
+
+
+def execute(job_id):
+    """Run a claimed job by id, in a worker thread or process"""
+    close_old_connections()
+    try:
+        return run_job(Job.objects.get(id=job_id)).status
+    finally:
+        close_old_connections()
+
+
+def queue_metrics():
+    """Depth of the queue per status and job name, and the oldest wait"""
+    now = timezone.now()
+    rows = Job.objects.filter(
+        status__in=[Job.QUEUED, Job.RUNNING],
+    ).values('name').annotate(
+        queued=Count('id', filter=Q(status=Job.QUEUED)),
+        ready=Count('id', filter=Q(status=Job.QUEUED, run_after__lte=now)),
+        running=Count('id', filter=Q(status=Job.RUNNING)),
+        oldest=Min('run_after', filter=Q(status=Job.QUEUED,
+                                         run_after__lte=now)),
+    ).order_by('name')
+    metrics = {'queued': 0, 'ready': 0, 'running': 0,
+               'oldest_ready_seconds': 0, 'jobs': {}}
+    for row in rows:
+        name = row.pop('name')
+        oldest = row.pop('oldest')
+        wait = round((now - oldest).total_seconds(), 3) if oldest else 0
+        metrics['jobs'][name] = dict(row, oldest_ready_seconds=wait)
+        for key in ('queued', 'ready', 'running'):
+            metrics[key] += row[key]
+        metrics['oldest_ready_seconds'] = max(
+            metrics['oldest_ready_seconds'], wait)
+    return metrics
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe, RecipeSnapshot
+from recipe.snapshots import BATCH_SIZE, expected_snapshots, \
+    refresh_snapshots
+
+
+class Command(BaseCommand):
+    """Django command to verify the recipe detail snapshots"""
+    help = 'Compare stored recipe snapshots with freshly rendered ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Rewrite missing and stale snapshots')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        checked, missing, stale = 0, [], []
+        last_id = 0
+        while True:
+            recipe_ids = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:options['batch_size']])
+            if not recipe_ids:
+                break
+            last_id = recipe_ids[-1]
+            stored = {
+                recipe_id: (user_id, data)
+                for recipe_id, user_id, data in RecipeSnapshot.objects.filter(
+                    recipe_id__in=recipe_ids,
+                ).values_list('recipe_id', 'user_id', 'data')
+            }
+            for snapshot in expected_snapshots(recipe_ids):
+                checked += 1
+                current = stored.get(snapshot.recipe_id)
+                if current is None:
+                    missing.append(snapshot.recipe_id)
+                elif current != (snapshot.user_id, snapshot.data):
+                    stale.append(snapshot.recipe_id)
+
+        self.stdout.write(
+            f'{checked} recipes checked, {len(missing)} snapshots missing, '
+            f'{len(stale)} stale')
+        if not missing and not stale:
+            return
+        if not options['repair']:
+            raise CommandError(
+                'Snapshots are inconsistent, run with --repair to fix them')
+        refresh_snapshots(missing + stale)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(missing) + len(stale)} snapshots repaired'))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
+
+
+class Command(BaseCommand):
+    """Django command to migrate the database only when it is behind"""
+    help = 'Run migrate when migrations are pending, in the same process'
+    # migrate runs the checks itself when it has work to do
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wait', action='store_true',
+            help='Wait for the database to accept connections first')
+        parser.add_argument(
+            '--wait-applied', action='store_true',
+            help='Wait for another process to apply the pending migrations '
+                 'instead of applying them')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def wait_for_database(self, connection):
+        self.stdout.write('Waiting for database...')
+        while True:
+            try:
+                connection.ensure_connection()
+                return
+            except OperationalError:
+                self.stdout.write(self.style.WARNING(
+                    'Database unavailable, waiting 1 second'))
+                time.sleep(1)
+
+    def pending(self, connection):
+        """Return the migrations not applied to the database yet"""
+        executor = MigrationExecutor(connection)
+        return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if options['wait']:
+            self.wait_for_database(connection)
+        if options['wait_applied']:
+            while self.pending(connection):
+                self.stdout.write(self.style.WARNING(
+                    'Migrations pending, waiting 1 second'))
+                time.sleep(1)
+            self.stdout.write('Database is up to date')
+            return
+        if not self.pending(connection):
+            self.stdout.write('No migrations to apply')
+            return
+        call_command('migrate', database=options['database'],
+                     verbosity=options['verbosity'], stdout=self.stdout)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.deletion import process_deletions
+
+
+class Command(BaseCommand):
+    """Django command to run the queued background deletions"""
+    help = 'Delete queued accounts and recipes in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Rows deleted per transaction')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new tasks')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            for task in process_deletions(options['batch_size']):
+                self.stdout.write(
+                    f'Task {task.id}: {task.status}, '
+                    f'{task.deleted}/{task.total} rows deleted')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
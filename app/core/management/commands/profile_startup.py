@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, mirroring what a new worker does before
+# answering its first request
+BOOT_SCRIPT = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+started = time.perf_counter()
+sys.argv = json.loads(sys.argv[1])
+import django
+django.setup()
+setup = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+environ = {'PATH_INFO': sys.argv.pop(), 'REQUEST_METHOD': 'GET'}
+setup_testing_defaults(environ)
+statuses = []
+
+
+def start_response(status, headers):
+    statuses.append(status)
+
+
+response = application(environ, start_response)
+b''.join(response)
+response.close()
+done = time.perf_counter()
+print(json.dumps({
+    'setup': setup - started,
+    'application': loaded - setup,
+    'first_request': done - loaded,
+    'total': done - started,
+    'status': statuses[0],
+}))
+'''
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+PROJECT_PACKAGES = ('app', 'core', 'recipe', 'user')
+
+
+def parse_importtime(output):
+    """Return (module, self us, cumulative us, depth) for each import"""
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(1)),
+                            int(match.group(2)), len(match.group(3)) // 2))
+    return imports
+
+
+def package_of(module):
+    """Group modules by distribution, and Django and DRF by subpackage"""
+    parts = module.split('.')
+    if parts[0] in ('django', 'rest_framework') and len(parts) > 1:
+        return '.'.join(parts[:3] if parts[1] == 'contrib' else parts[:2])
+    return parts[0]
+
+
+class Command(BaseCommand):
+    """Django command to profile the start of a new app process"""
+    help = 'Measure import time and time to the first request of a worker'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module',
+            default=os.environ.get('DJANGO_SETTINGS_MODULE'),
+            help='Settings of the profiled process (eg. app.settings_api)')
+        parser.add_argument(
+            '--path', default='/api/recipe/tag/',
+            help='Path of the first request')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15)
+
+    def boot(self, options, importtime=False):
+        env = dict(os.environ,
+                   DJANGO_SETTINGS_MODULE=options['settings_module'])
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        command = [sys.executable] + (['-X', 'importtime'] if importtime
+                                      else [])
+        # Same command line so the settings resolve as in this process
+        argv = json.dumps(sys.argv + [options['path']])
+        result = subprocess.run(
+            command + ['-c', BOOT_SCRIPT, argv], env=env,
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        runs = [self.boot(options)[0] for _ in range(options['runs'])]
+        self.stdout.write(
+            f"{options['settings_module']}, first request "
+            f"{options['path']} -> {runs[0]['status']}")
+        for phase in ('setup', 'application', 'first_request', 'total'):
+            self.stdout.write('{:<15} {:8.1f} ms (median of {})'.format(
+                phase, statistics.median(run[phase] for run in runs) * 1000,
+                len(runs)))
+
+        _, output = self.boot(options, importtime=True)
+        imports = parse_importtime(output)
+        packages = Counter()
+        for module, own, _, _ in imports:
+            packages[package_of(module)] += own
+        total = sum(packages.values())
+        self.stdout.write(
+            f'\nImports: {len(imports)} modules, {total / 1000:.1f} ms')
+        for package, own in packages.most_common(options['top']):
+            marker = '*' if package in PROJECT_PACKAGES else ' '
+            self.stdout.write(f'{own / 1000:8.1f} ms {marker} {package}')
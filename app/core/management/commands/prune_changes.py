@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipe.changes import prune_changes
+
+
+class Command(BaseCommand):
+    """Django command to delete the expired entries of the change log"""
+    help = 'Delete change log entries older than SYNC_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Entries deleted per query')
+
+    def handle(self, *args, **options):
+        pruned = prune_changes(options['batch_size'])
+        self.stdout.write(f'{pruned} change log entries deleted')
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    """Django command to generate a large synthetic dataset"""
+    help = 'Generate users with tags, ingredients and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--recipes', type=int, default=50,
+            help='Mean number of recipes per user')
+        parser.add_argument(
+            '--max-recipes', type=int, default=None,
+            help='Upper bound of recipes per user (default 20x the mean)')
+        parser.add_argument(
+            '--tags', type=int, default=30,
+            help='Maximum number of tags per user')
+        parser.add_argument(
+            '--ingredients', type=int, default=80,
+            help='Maximum number of ingredients per user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='Sstring1')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Users generated per worker task')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        plan = seeding.SeedPlan(
+            users=options['users'],
+            recipes=options['recipes'],
+            max_recipes=options['max_recipes'] or options['recipes'] * 20,
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            seed=options['seed'],
+            # Hashed once and shared, hashing per user would dominate
+            password=make_password(options['password']),
+            batch_size=options['batch_size'],
+        )
+        plan.allocate()
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            # sqlite has a single writer, extra processes only contend
+            self.stdout.write(self.style.WARNING(
+                'sqlite allows a single writer, using one worker'))
+            workers = 1
+
+        size = options['chunk_size']
+        chunks = [
+            range(start, min(start + size, plan.users))
+            for start in range(0, plan.users, size)
+        ]
+        started = time.monotonic()
+        users = rows = 0
+        for chunk_users, chunk_rows in self.run(plan, chunks, workers):
+            users += chunk_users
+            rows += chunk_rows
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{users}/{plan.users} users, {rows} rows '
+                f'({rows / max(elapsed, 1e-6):.0f} rows/s)')
+
+        plan.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {time.monotonic() - started:.1f}s'))
+
+    def run(self, plan, chunks, workers):
+        """Yield the result of every chunk as it is inserted"""
+        if workers == 1:
+            seeding.prepare_connection()
+            for chunk in chunks:
+                yield plan.insert(chunk)
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers, seeding.init_worker, (plan,)) as pool:
+            yield from pool.imap_unordered(seeding.insert_chunk, chunks)
@@ -0,0 +1,82 @@
+import os
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.checks import cache_is_shared
+from core.server import Arbiter, preload_application
+
+
+def listen(host, port, backlog):
+    """
+    Return a non-blocking socket listening on ``host``, which may be an
+    IPv6 address. Built by hand as ``socket.create_server`` needs
+    Python 3.8.
+    """
+    family, type_, proto, _, address = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[0]
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(address)
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock
+
+
+class Command(BaseCommand):
+    """Django command to serve the app with pre-forked worker processes"""
+    help = 'Serve the WSGI application with several worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind', default=settings.SERVE_BIND,
+            help='Address to listen on, as host:port')
+        parser.add_argument(
+            '--workers', type=int, default=settings.SERVE_WORKERS)
+        parser.add_argument(
+            '--max-requests', type=int, default=settings.SERVE_MAX_REQUESTS,
+            help='Replace a worker after serving this many requests '
+                 '(0 to never replace it)')
+        parser.add_argument(
+            '--max-requests-jitter', type=int,
+            default=settings.SERVE_MAX_REQUESTS_JITTER,
+            help='Random extra requests per worker so that workers are '
+                 'not all replaced at once')
+        parser.add_argument(
+            '--timeout', type=int, default=settings.SERVE_TIMEOUT,
+            help='Seconds before a silent worker is killed and replaced')
+        parser.add_argument(
+            '--graceful-timeout', type=int,
+            default=settings.SERVE_GRACEFUL_TIMEOUT,
+            help='Seconds stopping workers get to finish their requests')
+
+    def handle(self, *args, **options):
+        host, _, port = options['bind'].rpartition(':')
+        if not host or not port.isdigit():
+            raise CommandError('--bind must be given as host:port')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] > 1 and not cache_is_shared():
+            raise CommandError(
+                'Several workers need a cache shared by all processes; '
+                'set CACHE_BACKEND and CACHE_LOCATION or use --workers 1')
+
+        application = preload_application()
+        sock = listen(host.strip('[]'), int(port), settings.SERVE_BACKLOG)
+        host, port = sock.getsockname()[:2]
+        self.stdout.write(
+            f"Listening at http://{host}:{port} with {options['workers']} "
+            f'workers (pid {os.getpid()})')
+        self.stdout.flush()
+        Arbiter(
+            sock, application, options['workers'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            timeout=options['timeout'],
+            graceful_timeout=options['graceful_timeout'],
+        ).run()
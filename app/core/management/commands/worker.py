@@ -0,0 +1,98 @@
+import multiprocessing
+import signal
+import time
+from concurrent import futures
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run the queued background jobs"""
+    help = 'Run queued background jobs in a pool of threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help='Jobs run at the same time (default JOB_CONCURRENCY)')
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Run the jobs in threads or in separate processes')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between polls of an empty queue')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is ready')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or settings.JOB_CONCURRENCY
+        interval = options['interval']
+        if interval is None:
+            interval = settings.JOB_POLL_INTERVAL
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        jobs.job_types()
+        if options['pool'] == 'process':
+            # Forking would share the database connections of this process
+            connections.close_all()
+            pool = futures.ProcessPoolExecutor(
+                concurrency, mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup)
+        else:
+            pool = futures.ThreadPoolExecutor(concurrency)
+        self.stdout.write(
+            f'Running jobs with {concurrency} {options["pool"]} workers')
+        try:
+            self.run(pool, concurrency, interval, options['burst'])
+        finally:
+            pool.shutdown(wait=True)
+
+    def stop(self, signum, frame):
+        """Finish the running jobs and exit"""
+        self.running = False
+
+    def run(self, pool, concurrency, interval, burst):
+        pending = set()
+        # Job id of each pending future, for the heartbeats
+        job_ids = {}
+        next_check = next_beat = 0
+        while self.running:
+            if time.monotonic() >= next_beat:
+                jobs.heartbeat([job_ids[future] for future in pending])
+                next_beat = time.monotonic() + settings.JOB_HEARTBEAT_INTERVAL
+            if time.monotonic() >= next_check:
+                jobs.release_stalled_jobs()
+                self.report(jobs.queue_metrics())
+                next_check = time.monotonic() + settings.JOB_METRICS_INTERVAL
+            free = concurrency - len(pending)
+            claimed = jobs.claim_jobs(free) if free else []
+            for job in claimed:
+                future = pool.submit(jobs.execute, job.id)
+                job_ids[future] = job.id
+                pending.add(future)
+            if not pending:
+                if burst:
+                    break
+                time.sleep(interval)
+                continue
+            done, pending = futures.wait(
+                pending, timeout=0 if claimed else interval,
+                return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                del job_ids[future]
+                error = future.exception()
+                if error is not None:
+                    self.stderr.write(f'Job execution failed: {error!r}')
+        futures.wait(pending)
+
+    def report(self, metrics):
+        self.stdout.write(
+            f'Queue: {metrics["ready"]} ready, {metrics["queued"]} queued, '
+            f'{metrics["running"]} running, oldest ready for '
+            f'{metrics["oldest_ready_seconds"]}s')
@@ -0,0 +1,153 @@
+import hashlib
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.core.cache import cache
+from django.db import connections
+from django.middleware import csrf
+from django.middleware.gzip import GZipMiddleware
+
+from core import profiling
+from core.db_router import read_from_replicas, replica_aliases
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def is_api_request(request):
+    """Whether a request targets the token authenticated API"""
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+def client_key(request):
+    """Return a stable key identifying the client making the request"""
+    identity = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME) or \
+        request.META.get('REMOTE_ADDR')
+    if not identity:
+        return None
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve safe requests from read replicas, keeping a client on the
+    primary for a while after it writes so it reads its own changes.
+
+    Views running several calls in one request (batches) read whether
+    the client is pinned from ``request.replica_pinned`` and report
+    whether a call wrote in ``request.wrote``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_aliases():
+            return self.get_response(request)
+
+        key = client_key(request)
+        pin_key = f'replica:pin:{key}' if key else None
+        request.replica_pinned = bool(pin_key and cache.get(pin_key))
+        use_replica = request.method in SAFE_METHODS and \
+            not request.replica_pinned
+
+        with read_from_replicas(use_replica):
+            response = self.get_response(request)
+
+        wrote = getattr(request, 'wrote', request.method not in SAFE_METHODS)
+        if pin_key and wrote and response.status_code < 400:
+            cache.set(pin_key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a sample of requests, reporting time spent in authentication,
+    database queries, serialization and rendering in a Server-Timing
+    header and a structured log line.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile()
+        with profiling.profiling(profile), ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(profile.execute_wrapper))
+            response = self.get_response(request)
+
+        response['Server-Timing'] = profile.server_timing()
+        profiling.log_profile(request, response, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = profiling.current_profile()
+        if profile is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                profile.timings['render'] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Gzip responses for clients accepting it. Streamed responses are
+    compressed chunk by chunk as they are produced; complete responses
+    only from ``GZIP_MIN_LENGTH`` bytes, below which compressing costs
+    more time than the bytes saved.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and \
+                len(response.content) < settings.GZIP_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
+
+
+class BrowserOnlyMixin:
+    """
+    Skip a middleware for API requests. The API authenticates with tokens
+    and never uses sessions, messages or CSRF cookies, which only the
+    admin needs.
+    """
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_request(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin,
+                               auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(BrowserOnlyMixin, messages.MessageMiddleware):
+    pass
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.10 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='ingredient_user_name_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title'], name='recipe_user_title_like_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='tag_user_name_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+    ]
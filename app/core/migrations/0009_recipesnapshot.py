@@ -0,0 +1,23 @@
+# Generated by Django 3.2.10 on 2026-10-19 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSnapshot',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='core.recipe')),
+                ('data', models.TextField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
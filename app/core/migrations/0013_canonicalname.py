@@ -0,0 +1,31 @@
+# Generated by Django 3.2.10 on 2026-10-19 11:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ingredients', to='core.canonicalname'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='canonical',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tags', to='core.canonicalname'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations, transaction
+
+# Rows linked per transaction; also bounds the names of one IN clause
+BATCH_SIZE = 500
+
+
+def normalize_name(name):
+    """Copy of core.models.normalize_name as of this migration"""
+    return ' '.join(name.split()).casefold()[:255]
+
+
+def link_entries(model, catalog, using, batch_size=BATCH_SIZE):
+    """
+    Point the tags or ingredients not linked yet at their catalog names,
+    one batch of ids per transaction so large tables are never locked
+    for long and an interrupted run resumes where it stopped.
+    """
+    last_id = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(model.objects.using(using).filter(
+                id__gt=last_id, canonical__isnull=True,
+            ).order_by('id').values_list('id', 'name')[:batch_size])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+
+            groups = {}
+            for pk, name in rows:
+                groups.setdefault(normalize_name(name), []).append(pk)
+            ids = dict(catalog.objects.using(using).filter(
+                name__in=groups).values_list('name', 'id'))
+            missing = groups.keys() - ids.keys()
+            catalog.objects.using(using).bulk_create(
+                [catalog(name=key) for key in missing],
+                ignore_conflicts=True)
+            ids.update(catalog.objects.using(using).filter(
+                name__in=missing).values_list('name', 'id'))
+            for key, pks in groups.items():
+                model.objects.using(using).filter(id__in=pks).update(
+                    canonical_id=ids[key])
+
+
+def link_catalog(apps, schema_editor):
+    catalog = apps.get_model('core', 'CanonicalName')
+    for name in ('Tag', 'Ingredient'):
+        link_entries(apps.get_model('core', name), catalog,
+                     schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_canonicalname'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.10 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_link_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletiontask',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.contrib.auth.models import \
     BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
 import uuid
 import os
 
@@ -39,24 +40,108 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+# Longest catalog key; case folding may lengthen names ('ß' becomes 'ss')
+CATALOG_NAME_MAX_LENGTH = 255
+
+
+def normalize_name(name):
+    """Catalog key of a name: case and runs of whitespace are ignored"""
+    return ' '.join(name.split()).casefold()[:CATALOG_NAME_MAX_LENGTH]
+
+
+class CanonicalNameManager(models.Manager):
+    def intern_many(self, names):
+        """
+        Return the catalog ids of the names, keyed by their normalized
+        form, adding the ones not in the catalog yet.
+        """
+        keys = {normalize_name(name) for name in names}
+        ids = dict(self.filter(name__in=keys).values_list('name', 'id'))
+        missing = keys - ids.keys()
+        if missing:
+            # Concurrent writers may add the same names; keep theirs
+            self.bulk_create([self.model(name=key) for key in missing],
+                             ignore_conflicts=True)
+            ids.update(
+                self.filter(name__in=missing).values_list('name', 'id'))
+        return ids
+
+    def intern(self, name):
+        """Return the catalog id of a name, adding it if needed"""
+        return self.intern_many([name])[normalize_name(name)]
+
+
+class CanonicalName(models.Model):
+    """
+    Normalized tag or ingredient name shared by every user, so lookups
+    across users go through one row per name instead of one per user.
+    """
+    name = models.CharField(max_length=CATALOG_NAME_MAX_LENGTH, unique=True)
+
+    objects = CanonicalNameManager()
+
+    def __str__(self):
+        return self.name
+
+
+class CatalogEntry(models.Model):
+    """A user's name for an entry of the shared catalog"""
+    canonical = models.ForeignKey(
+        CanonicalName,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='%(class)ss',
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'name' in update_fields:
+            self.canonical_id = CanonicalName.objects.intern(self.name)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'canonical'}
+        super().save(*args, **kwargs)
+
+
+class Tag(CatalogEntry):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            # Prefix searches of one user's names; the pattern operator
+            # class lets PostgreSQL use it for LIKE 'prefix%'
+            models.Index(fields=['user', 'name'], name='tag_user_name_idx',
+                         opclasses=['', 'varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(CatalogEntry):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            # Prefix searches of one user's names; the pattern operator
+            # class lets PostgreSQL use it for LIKE 'prefix%'
+            models.Index(fields=['user', 'name'],
+                         name='ingredient_user_name_idx',
+                         opclasses=['', 'varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -81,6 +166,146 @@ class Recipe(models.Model):
     tags = models.ManyToManyField(Tag)
     image = models.ImageField(blank=True,null=True, upload_to=recipe_image_file_path)
 
+    class Meta:
+        indexes = [
+            # Ordered scans and keyset pages of one user's recipes
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'title', 'id'],
+                         name='recipe_user_title_idx'),
+            # Prefix searches of titles, see Tag
+            models.Index(fields=['user', 'title'],
+                         name='recipe_user_title_like_idx',
+                         opclasses=['', 'varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.title
 
+
+class RecipeSnapshot(models.Model):
+    """Pre-encoded detail representation of a recipe"""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='snapshot')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    data = models.TextField()
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class ChangeLog(models.Model):
+    """
+    Entry of the sequence of writes to a user's recipes, tags and
+    ingredients, read by syncing clients. The id is the position in the
+    sequence; deletions are kept as tombstones until they expire.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = [(RECIPE, 'Recipe'), (TAG, 'Tag'),
+                    (INGREDIENT, 'Ingredient')]
+
+    # Kept after the account itself is deleted
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Changes of one user after a position
+            models.Index(fields=['user', 'id'], name='changelog_user_id_idx'),
+        ]
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f'{self.kind} {self.object_id} {action}'
+
+
+class DeletionTask(models.Model):
+    """Rows of an account or a set of recipes waiting to be deleted"""
+    ACCOUNT = 'account'
+    RECIPES = 'recipes'
+    KIND_CHOICES = [(ACCOUNT, 'Account'), (RECIPES, 'Recipes')]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'),
+                      (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Kept after the account itself is deleted
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    recipe_ids = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when claimed and with every batch deleted while running
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} of user {self.user_id} ({self.status})'
+
+
+class Job(models.Model):
+    """Unit of background work run by the ``worker`` command"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'),
+                      (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Kept after the account itself is deleted
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Dequeue order of the ready jobs
+            models.Index(fields=['status', 'run_after', 'id'],
+                         name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
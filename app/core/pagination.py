@@ -0,0 +1,133 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def table_estimate(model, using='default'):
+    """
+    Row count of a model's table according to the database statistics,
+    or None when the database keeps no usable statistics.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'sqlite':
+        # Filled by ANALYZE; the first number is the row count
+        sql = "SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s"
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    # PostgreSQL reports -1 for tables that were never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def explain_estimate(queryset):
+    """Rows the PostgreSQL planner expects a queryset to return"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """
+    Approximate row count of a queryset: the table statistics when it is
+    unfiltered, otherwise the planner estimate where the database offers
+    one. Returns None when no estimate is available.
+    """
+    if not queryset.query.where:
+        return table_estimate(queryset.model, queryset.db)
+    return explain_estimate(queryset)
+
+
+class EstimatedPage(Page):
+    """Page whose successor is known from fetching one extra row"""
+
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts at most ``ESTIMATED_COUNT_THRESHOLD`` rows and
+    takes larger counts from the database estimates instead of running a
+    full COUNT(*). Estimated counts set ``count_is_estimated``, and their
+    pages are sliced without trusting the count.
+    """
+    count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, list):
+            return len(queryset)
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        counted = queryset.order_by()[:threshold + 1].count()
+        if counted <= threshold:
+            return counted
+        estimate = estimate_count(queryset)
+        if estimate is None:
+            return super().count
+        self.count_is_estimated = True
+        return max(estimate, counted)
+
+    def validate_number(self, number):
+        """Validate a page number, allowing pages past estimated counts"""
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_estimated or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return EstimatedPage(rows[:self.per_page], number, self,
+                             len(rows) > self.per_page)
+
+
+class EstimatedPageNumberPagination(PageNumberPagination):
+    """Page number pagination reporting whether the count is estimated"""
+    django_paginator_class = EstimatedCountPaginator
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_estimated': self.page.paginator.count_is_estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
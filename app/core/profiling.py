@@ -0,0 +1,125 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger('core.profiling')
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Timings collected while serving one sampled request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = Counter()
+        self.queries = Counter()
+        self.query_time = 0.0
+        self.active = set()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper that times every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.queries[sql] += 1
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.queries.values() if count > 1)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Return the value of the Server-Timing header"""
+        metrics = [
+            f'{name};dur={seconds * 1000:.2f}'
+            for name, seconds in sorted(self.timings.items())
+        ]
+        metrics.append(
+            f'db;dur={self.query_time * 1000:.2f};'
+            f'desc="{self.query_count} queries, '
+            f'{self.duplicate_count} duplicated"')
+        metrics.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        """Return the profile as a structured log record"""
+        duplicates = [
+            {'sql': sql[:200], 'count': count}
+            for sql, count in self.queries.most_common(5) if count > 1
+        ]
+        record = {
+            f'{name}_ms': round(seconds * 1000, 2)
+            for name, seconds in self.timings.items()
+        }
+        record.update({
+            'total_ms': round(self.elapsed() * 1000, 2),
+            'db_ms': round(self.query_time * 1000, 2),
+            'db_queries': self.query_count,
+            'db_duplicates': self.duplicate_count,
+            'duplicated_sql': duplicates,
+        })
+        return record
+
+
+def current_profile():
+    """Return the profile of the current request, if it is sampled"""
+    return _profile.get()
+
+
+@contextmanager
+def profiling(profile):
+    """Collect timings into the given profile inside the block"""
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current profile"""
+    profile = _profile.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - start
+        profile.active.discard(name)
+
+
+def log_profile(request, response, profile):
+    """Emit one structured log line for a profiled request"""
+    record = profile.as_dict()
+    record.update({
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+    })
+    logger.info(json.dumps(record), extra={'profile': record})
+
+
+class ProfiledSerializerMixin:
+    """Serializer mixin that reports to_representation time"""
+
+    def to_representation(self, instance):
+        if _profile.get() is None:
+            return super().to_representation(instance)
+        with timed('serialize'):
+            return super().to_representation(instance)
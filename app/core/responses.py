@@ -0,0 +1,66 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+def renders_plain_json(renderer, media_type):
+    """Whether a negotiated renderer produces compact JSON output"""
+    return type(renderer) is JSONRenderer and \
+        'indent' not in (media_type or '')
+
+
+class PreRenderedResponse(Response):
+    """
+    Response carrying content already encoded by ``JSONRenderer``.
+
+    The bytes are sent as they are when JSON is negotiated; ``data`` is
+    only decoded when another renderer (such as the browsable API) or a
+    caller needs it.
+    """
+
+    def __init__(self, content, **kwargs):
+        self.content_bytes = content
+        self._data = None
+        super().__init__(**kwargs)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.content_bytes)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if value is not None:
+            self._data = value
+
+    @property
+    def rendered_content(self):
+        renderer = getattr(self, 'accepted_renderer', None)
+        if not renders_plain_json(
+                renderer, getattr(self, 'accepted_media_type', None)):
+            return super().rendered_content
+        self['Content-Type'] = self.content_type or renderer.media_type
+        return self.content_bytes
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    JSON response sent as its chunks are produced.
+
+    ``data`` decodes the whole body, consuming the stream, so it is only
+    meant for callers that inspect the response instead of sending it.
+    """
+
+    def __init__(self, chunks, **kwargs):
+        kwargs.setdefault('content_type', JSONRenderer.media_type)
+        super().__init__(chunks, **kwargs)
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(b''.join(self.streaming_content))
+        return self._data
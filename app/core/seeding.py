@@ -0,0 +1,237 @@
+import math
+import random
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from core.models import CanonicalName, Tag, Ingredient, Recipe, \
+    normalize_name
+
+TAG_NAMES = [
+    'Breakfast', 'Brunch', 'Lunch', 'Dinner', 'Dessert', 'Snack', 'Vegan',
+    'Vegetarian', 'Gluten free', 'Dairy free', 'Low carb', 'Keto', 'Paleo',
+    'Quick', 'Slow cooker', 'One pot', 'Grill', 'Barbecue', 'Baking',
+    'Soup', 'Salad', 'Pasta', 'Seafood', 'Spicy', 'Comfort food', 'Party',
+    'Holiday', 'Kids', 'Healthy', 'Budget', 'Italian', 'Mexican', 'Indian',
+    'Thai', 'Chinese', 'Japanese', 'French', 'Brazilian', 'Greek',
+    'Middle Eastern',
+]
+
+INGREDIENT_NAMES = [
+    'Salt', 'Black pepper', 'Olive oil', 'Garlic', 'Onion', 'Butter',
+    'Sugar', 'Flour', 'Egg', 'Milk', 'Water', 'Lemon', 'Tomato', 'Rice',
+    'Chicken breast', 'Parsley', 'Carrot', 'Potato', 'Cheese', 'Cream',
+    'Vegetable oil', 'Honey', 'Soy sauce', 'Ginger', 'Cumin', 'Paprika',
+    'Oregano', 'Basil', 'Thyme', 'Rosemary', 'Cinnamon', 'Vanilla',
+    'Baking powder', 'Yeast', 'Bread', 'Pasta', 'Beef', 'Pork', 'Bacon',
+    'Shrimp', 'Salmon', 'Tuna', 'Cod', 'Beans', 'Chickpeas', 'Lentils',
+    'Spinach', 'Lettuce', 'Cucumber', 'Bell pepper', 'Chili', 'Zucchini',
+    'Eggplant', 'Mushroom', 'Broccoli', 'Cauliflower', 'Cabbage', 'Corn',
+    'Peas', 'Celery', 'Leek', 'Shallot', 'Coriander', 'Mint', 'Dill',
+    'Lime', 'Orange', 'Apple', 'Banana', 'Strawberry', 'Blueberry',
+    'Coconut milk', 'Yogurt', 'Mayonnaise', 'Mustard', 'Ketchup',
+    'Vinegar', 'Wine', 'Stock', 'Tofu', 'Oats', 'Almonds', 'Walnuts',
+    'Peanuts', 'Sesame', 'Chocolate', 'Cocoa', 'Brown sugar', 'Maple syrup',
+    'Noodles', 'Tortilla', 'Avocado', 'Pumpkin', 'Sweet potato', 'Quinoa',
+    'Feta', 'Mozzarella', 'Parmesan', 'Ricotta', 'Sausage', 'Ham', 'Lamb',
+    'Turkey', 'Duck', 'Anchovies', 'Capers', 'Olives', 'Pesto', 'Curry',
+    'Turmeric', 'Nutmeg', 'Cloves', 'Cardamom', 'Saffron', 'Bay leaf',
+]
+
+ADJECTIVES = [
+    'Classic', 'Easy', 'Spicy', 'Creamy', 'Crispy', 'Roasted', 'Grilled',
+    'Baked', 'Fresh', 'Smoky', 'Sweet', 'Tangy', 'Rustic', 'Homemade',
+]
+
+DISHES = [
+    'stew', 'salad', 'soup', 'pie', 'curry', 'bowl', 'tacos', 'risotto',
+    'bake', 'stir fry', 'sandwich', 'pasta', 'cake', 'skillet', 'wraps',
+]
+
+TIMES = [5, 10, 15, 20, 25, 30, 40, 45, 60, 90, 120, 180, 240]
+TIME_WEIGHTS = [2, 6, 10, 12, 10, 14, 8, 8, 10, 6, 4, 2, 1]
+
+
+def zipf_weights(count):
+    """Cumulative weights favouring the first items of a list"""
+    return list(accumulate(1 / (rank + 1) for rank in range(count)))
+
+
+def weighted_sample(rng, population, cum_weights, k):
+    """Pick k distinct items, favouring the heavily weighted ones"""
+    k = min(k, len(population))
+    picked = set()
+    while len(picked) < k:
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=k - len(picked)))
+    return picked
+
+
+class SeedPlan:
+    """
+    Everything a worker needs to generate its share of the dataset.
+
+    Every user owns fixed blocks of primary keys, so workers never need
+    to read back the rows they insert and the output only depends on the
+    seed and the user index.
+    """
+
+    def __init__(self, users, recipes, max_recipes, tags, ingredients,
+                 seed, password, batch_size):
+        self.users = users
+        self.recipes = recipes
+        self.max_recipes = max_recipes
+        self.tags = min(tags, len(TAG_NAMES))
+        self.ingredients = min(ingredients, len(INGREDIENT_NAMES))
+        self.seed = seed
+        self.password = password
+        self.batch_size = batch_size
+        self.bases = {}
+        self.catalog = {}
+
+    def allocate(self):
+        """
+        Reserve primary keys above the current maximum of each table and
+        add the names used to the shared catalog.
+        """
+        for model in (get_user_model(), Tag, Ingredient, Recipe):
+            current = model.objects.aggregate(top=Max('id'))['top'] or 0
+            self.bases[model._meta.label] = current + 1
+        self.catalog = CanonicalName.objects.intern_many(
+            TAG_NAMES + INGREDIENT_NAMES)
+
+    def canonical_id(self, name):
+        return self.catalog[normalize_name(name)]
+
+    def base(self, model):
+        return self.bases[model._meta.label]
+
+    def recipe_count(self, rng):
+        """Number of recipes for a user, from a long tailed distribution"""
+        sigma = 1.0
+        mu = math.log(max(self.recipes, 1)) - sigma ** 2 / 2
+        return min(self.max_recipes, int(rng.lognormvariate(mu, sigma)))
+
+    def generate(self, index):
+        """Return the rows owned by the user with the given index"""
+        rng = random.Random(f'{self.seed}:{index}')
+        user_id = self.base(get_user_model()) + index
+        user = get_user_model()(
+            id=user_id,
+            email=f'seed{self.seed}.user{index}@example.com',
+            name=f'Seed user {index}',
+            password=self.password,
+        )
+
+        tag_base = self.base(Tag) + index * self.tags
+        tag_names = rng.sample(TAG_NAMES, rng.randint(1, self.tags))
+        tags = [
+            Tag(id=tag_base + offset, user_id=user_id, name=name,
+                canonical_id=self.canonical_id(name))
+            for offset, name in enumerate(tag_names)
+        ]
+
+        ingredient_base = self.base(Ingredient) + index * self.ingredients
+        ingredient_names = rng.sample(
+            INGREDIENT_NAMES, rng.randint(3, self.ingredients))
+        ingredients = [
+            Ingredient(id=ingredient_base + offset, user_id=user_id,
+                       name=name, canonical_id=self.canonical_id(name))
+            for offset, name in enumerate(ingredient_names)
+        ]
+
+        recipe_base = self.base(Recipe) + index * self.max_recipes
+        tag_ids = [tag.id for tag in tags]
+        ingredient_ids = [ingredient.id for ingredient in ingredients]
+        ingredient_weights = zipf_weights(len(ingredient_ids))
+        recipes, tag_links, ingredient_links = [], [], []
+        for offset in range(self.recipe_count(rng)):
+            recipe_id = recipe_base + offset
+            picked = weighted_sample(
+                rng, ingredient_ids, ingredient_weights, rng.randint(3, 12))
+            main = ingredient_names[min(picked) - ingredient_base]
+            price = min(rng.lognormvariate(2.5, 0.7), 999.99)
+            recipes.append(Recipe(
+                id=recipe_id,
+                user_id=user_id,
+                title=f'{rng.choice(ADJECTIVES)} {main.lower()} '
+                      f'{rng.choice(DISHES)}',
+                time_minutes=rng.choices(TIMES, TIME_WEIGHTS)[0],
+                price=Decimal(f'{price:.2f}'),
+            ))
+            ingredient_links.extend(
+                (recipe_id, ingredient_id) for ingredient_id in sorted(picked))
+            tag_links.extend(
+                (recipe_id, tag_id) for tag_id in rng.sample(
+                    tag_ids, min(rng.randint(0, 4), len(tag_ids))))
+        return [user], tags, ingredients, recipes, tag_links, ingredient_links
+
+    def insert(self, indexes):
+        """Generate and insert the rows of a chunk of users"""
+        chunk = [[] for _ in range(6)]
+        for index in indexes:
+            for rows, generated in zip(chunk, self.generate(index)):
+                rows.extend(generated)
+        users, tags, ingredients, recipes, tag_links, ingredient_links = chunk
+        with transaction.atomic():
+            for model, rows in ((get_user_model(), users), (Tag, tags),
+                                (Ingredient, ingredients), (Recipe, recipes)):
+                model.objects.bulk_create(rows, batch_size=self.batch_size)
+            insert_links(Recipe.tags, tag_links, self.batch_size)
+            insert_links(Recipe.ingredients, ingredient_links, self.batch_size)
+        return len(indexes), sum(len(rows) for rows in chunk)
+
+    def reset_sequences(self):
+        """Move primary key sequences past the explicitly inserted ids"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [get_user_model(), Tag, Ingredient, Recipe])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def insert_links(descriptor, links, batch_size):
+    """
+    Insert (source id, target id) pairs into a many-to-many through table
+    with multi-row INSERT statements, skipping model instantiation.
+    """
+    field = descriptor.field
+    ops = connection.ops
+    columns = [field.m2m_column_name(), field.m2m_reverse_name()]
+    size = max(1, min(batch_size, ops.bulk_batch_size(columns, links)))
+    prefix = 'INSERT INTO {} ({}) VALUES '.format(
+        ops.quote_name(field.remote_field.through._meta.db_table),
+        ', '.join(ops.quote_name(column) for column in columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(links), size):
+            batch = links[start:start + size]
+            cursor.execute(
+                prefix + ', '.join(['(%s, %s)'] * len(batch)),
+                [value for link in batch for value in link])
+
+
+def prepare_connection():
+    """Speed up bulk loading on the current connection"""
+    if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')
+
+
+_worker_plan = None
+
+
+def init_worker(plan):
+    """Pool initializer: forget connections inherited from the parent"""
+    global _worker_plan
+    connections.close_all()
+    _worker_plan = plan
+
+
+def insert_chunk(indexes):
+    """Pool task inserting one chunk of users"""
+    prepare_connection()
+    return _worker_plan.insert(indexes)
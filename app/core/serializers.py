@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+
+from core import jobs
+from core.batch import split_path
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs, enqueued by name"""
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'payload', 'status', 'attempts',
+                  'max_attempts', 'run_after', 'result', 'error',
+                  'created_at', 'finished_at')
+        read_only_fields = ('id', 'status', 'attempts', 'max_attempts',
+                            'run_after', 'result', 'error', 'created_at',
+                            'finished_at')
+
+    def validate_name(self, value):
+        job_type = jobs.job_types().get(value)
+        if job_type is None or not job_type.public:
+            raise serializers.ValidationError(f'Unknown job {value!r}.')
+        return value
+
+    def validate_payload(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object.')
+        return value
+
+    def create(self, validated_data):
+        """Queue the job for the authenticated user"""
+        return jobs.enqueue(validated_data['name'],
+                            validated_data.get('payload'),
+                            user=self.context['request'].user)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """One API call of a batch"""
+    method = serializers.ChoiceField(
+        choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        path, _ = split_path(value)
+        if not path.startswith(settings.API_PATH_PREFIX):
+            raise serializers.ValidationError('Expected an API path.')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return value
+        if getattr(match.func, 'cls', None) is self.context['view_class']:
+            raise serializers.ValidationError('Batches cannot be nested.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """API calls to run in one round trip"""
+    requests = serializers.ListField(
+        child=SubRequestSerializer(), allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests.')
+        return value
@@ -0,0 +1,241 @@
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import tempfile
+import time
+
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def iter_views(resolver=None):
+    """Yield the view classes routed by the URL configuration"""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern)
+        else:
+            view = getattr(pattern.callback, 'cls', None)
+            if view is not None:
+                yield view
+
+
+def preload_application():
+    """
+    Load the WSGI application and everything its first requests would
+    otherwise build lazily: the URL resolvers and the serializer fields
+    of every API view.
+    """
+    application = get_wsgi_application()
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for view in set(iter_views(resolver)):
+        serializer_class = getattr(view, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+    return application
+
+
+class SharedSocketServer(WSGIServer):
+    """WSGI server handling connections accepted from a shared socket"""
+
+    def __init__(self, sock, application):
+        super().__init__(sock.getsockname()[:2], WSGIRequestHandler,
+                         bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        host, self.server_port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.setup_environ()
+        self.set_app(application)
+
+
+class Worker:
+    """
+    Child process serving requests until it is asked to stop or has
+    served ``max_requests``, touching its heartbeat file while idle and
+    between requests.
+    """
+
+    def __init__(self, sock, application, max_requests, timeout):
+        self.sock = sock
+        self.application = application
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.heartbeat = tempfile.TemporaryFile()
+        self.pid = None
+        self.alive = True
+
+    def last_beat(self):
+        return os.fstat(self.heartbeat.fileno()).st_mtime
+
+    def beat(self):
+        os.utime(self.heartbeat.fileno())
+
+    def stop(self, signum, frame):
+        self.alive = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for connection in connections.all():
+            connection.ensure_connection()
+        server = SharedSocketServer(self.sock, self.application)
+        served = 0
+        while self.alive and served < self.max_requests:
+            self.beat()
+            try:
+                readable, _, _ = select.select([self.sock], [], [], 1)
+            except InterruptedError:
+                continue
+            if not readable:
+                continue
+            try:
+                request, address = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                # Another worker accepted the connection first
+                continue
+            # Bound the time a slow client can hold the worker
+            request.settimeout(self.timeout)
+            try:
+                server.finish_request(request, address)
+            except Exception:
+                server.handle_error(request, address)
+            finally:
+                server.shutdown_request(request)
+            served += 1
+        if served >= self.max_requests:
+            logger.info('Worker %s recycled after %d requests',
+                        os.getpid(), served)
+        connections.close_all()
+
+
+class Arbiter:
+    """
+    Pre-forking process manager. The application is loaded once in the
+    parent and forked into ``workers`` children sharing the listening
+    socket. Children that die, exceed their request budget or stop
+    beating for ``timeout`` seconds are replaced.
+
+    Signals: TERM and INT stop gracefully, QUIT stops at once and HUP
+    replaces every worker without dropping connections.
+    """
+
+    def __init__(self, sock, application, workers, max_requests=0,
+                 max_requests_jitter=0, timeout=30, graceful_timeout=30):
+        self.sock = sock
+        self.application = application
+        self.size = workers
+        self.max_requests = max_requests or float('inf')
+        self.max_requests_jitter = max_requests_jitter
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}
+        self.signals = []
+
+    def handle_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def run(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT,
+                       signal.SIGHUP):
+            signal.signal(signum, self.handle_signal)
+        # Connections opened while preloading must not be shared
+        connections.close_all()
+        try:
+            while True:
+                if self.signals:
+                    signum = self.signals.pop(0)
+                    if signum == signal.SIGHUP:
+                        self.restart_workers()
+                    else:
+                        self.stop(graceful=signum != signal.SIGQUIT)
+                        return
+                self.reap_workers()
+                self.kill_stalled_workers()
+                self.spawn_workers()
+                time.sleep(0.5)
+        finally:
+            self.sock.close()
+
+    def spawn_worker(self):
+        jitter = random.randint(0, self.max_requests_jitter)
+        worker = Worker(self.sock, self.application,
+                        self.max_requests + jitter, self.timeout)
+        pid = os.fork()
+        if pid:
+            worker.pid = pid
+            self.workers[pid] = worker
+            return worker
+        # Child process
+        status = 0
+        try:
+            signal.signal(signal.SIGQUIT, signal.SIG_DFL)
+            worker.run()
+        except Exception:
+            logger.exception('Worker %s failed', os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def spawn_workers(self):
+        while len(self.workers) < self.size:
+            worker = self.spawn_worker()
+            logger.info('Booted worker %s', worker.pid)
+
+    def reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is not None:
+                worker.heartbeat.close()
+                if os.WIFSIGNALED(status) or os.WEXITSTATUS(status):
+                    logger.warning('Worker %s exited with status %s',
+                                   pid, status)
+
+    def kill_stalled_workers(self):
+        deadline = time.time() - self.timeout
+        for pid, worker in list(self.workers.items()):
+            if worker.last_beat() < deadline:
+                logger.warning('Worker %s timed out, killing it', pid)
+                self.kill(pid, signal.SIGKILL)
+
+    def restart_workers(self):
+        """Start a new set of workers, then stop the old ones gracefully"""
+        old = list(self.workers)
+        for _ in range(self.size):
+            self.spawn_worker()
+        for pid in old:
+            self.kill(pid, signal.SIGTERM)
+
+    def stop(self, graceful=True):
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+        deadline = time.time() + self.graceful_timeout
+        while self.workers and time.time() < deadline:
+            self.reap_workers()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGKILL)
+        while self.workers:
+            self.reap_workers()
+            time.sleep(0.1)
+
+    def kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
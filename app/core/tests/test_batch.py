@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import db_router
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse('batch')
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class BatchApiTests(TestCase):
+    """Test running several API calls in one request"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        Tag.objects.create(user=self.user, name='Vegan')
+        Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=5)
+
+    def batch(self, *requests):
+        res = self.client.post(
+            BATCH_URL, {'requests': list(requests)}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['responses']
+
+    def test_login_required(self):
+        """Test that the batch itself requires authentication"""
+        res = APIClient().post(
+            BATCH_URL, {'requests': [{'path': ME_URL}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_startup_calls_in_one_round_trip(self):
+        """Test that the responses come back in the order requested"""
+        responses = self.batch(
+            {'path': ME_URL},
+            {'path': TAGS_URL},
+            {'path': f'{RECIPES_URL}?limit=50'},
+            {'path': RECIPES_URL},
+        )
+
+        self.assertEqual([item['status'] for item in responses], [200] * 4)
+        self.assertEqual(responses[0]['body']['email'], 'test@mail.com')
+        self.assertEqual([tag['name'] for tag in responses[1]['body']],
+                         ['Vegan'])
+        self.assertEqual(responses[2]['body']['results'][0]['title'],
+                         'Salad')
+        # Streamed lists are collected into the batch
+        self.assertEqual(responses[3]['body'][0]['title'], 'Salad')
+
+    def test_authenticated_once(self):
+        """Test that sub-requests do not look the token up again"""
+        with CaptureQueriesContext(connection) as queries:
+            self.batch({'path': ME_URL}, {'path': TAGS_URL},
+                       {'path': TAGS_URL})
+
+        selects = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertEqual(
+            len([sql for sql in selects if 'authtoken_token' in sql]), 1)
+        # The token with its user, then the two tag lists
+        self.assertEqual(len(selects), 3)
+
+    def test_sub_request_errors_reported(self):
+        """Test that failing calls do not fail the batch"""
+        responses = self.batch(
+            {'path': '/api/recipe/missing/'},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {}},
+        )
+
+        self.assertEqual(responses[0]['status'], 404)
+        self.assertEqual(responses[1]['status'], 400)
+        self.assertIn('name', responses[1]['body'])
+
+    def test_writes_run_in_order(self):
+        """Test that a write is visible to the calls after it"""
+        responses = self.batch(
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Quick'}},
+            {'path': TAGS_URL},
+        )
+
+        self.assertEqual(responses[0]['status'], 201)
+        self.assertEqual(len(responses[1]['body']), 2)
+
+    def test_invalid_batches_rejected(self):
+        """Test that nested, non-API and oversized batches fail"""
+        for requests in ([], [{'path': BATCH_URL}], [{'path': '/admin/'}],
+                         [{'path': ME_URL}] * 3):
+            with override_settings(BATCH_MAX_REQUESTS=2):
+                res = self.client.post(
+                    BATCH_URL, {'requests': requests}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class BatchReplicaTests(TestCase):
+    """Test routing batches between the primary and the replicas"""
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        self.replica = connections['replica']
+        # The replica mirrors the test database; let it read the rows of
+        # the transaction wrapping each test
+        with self.replica.cursor() as cursor:
+            cursor.execute('PRAGMA read_uncommitted = 1')
+        db_router.reset_replica_health()
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        Tag.objects.create(user=user, name='Vegan')
+
+    def replica_reads(self, *requests):
+        """Run a batch and return how many reads the replica served"""
+        with CaptureQueriesContext(self.replica) as queries:
+            res = self.client.post(
+                BATCH_URL, {'requests': list(requests)}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len([query for query in queries.captured_queries
+                    if query['sql'].startswith('SELECT')])
+
+    def test_read_batch_served_by_replica(self):
+        """Test that reads only batches use the replica and do not pin"""
+        self.assertEqual(self.replica_reads(
+            {'path': TAGS_URL}, {'path': ME_URL}), 1)
+        self.assertEqual(self.replica_reads({'path': TAGS_URL}), 1)
+
+    def test_client_pinned_after_batched_write(self):
+        """Test that only a successful write pins the client"""
+        self.replica_reads({'method': 'POST', 'path': TAGS_URL, 'body': {}})
+        self.assertEqual(self.replica_reads({'path': TAGS_URL}), 1)
+
+        self.replica_reads(
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Quick'}})
+        self.assertEqual(self.replica_reads({'path': TAGS_URL}), 0)
@@ -1,7 +1,12 @@
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
+from core.management.commands.profile_startup import parse_importtime
+from core.models import Tag, Recipe, RecipeSnapshot
 
 
 class CommandTests(TestCase):
@@ -19,3 +24,149 @@ class CommandTests(TestCase):
         with patch('django.db.utils.ConnectionHandler.__getitem__') as get_item:
             get_item.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
+
+
+class SeedCommandTests(TestCase):
+
+    def seeded(self):
+        """Return the generated recipes in a comparable form"""
+        return list(Recipe.objects.order_by('user__email', 'id').values_list(
+            'user__email', 'title', 'time_minutes', 'price'))
+
+    def test_seed_creates_related_rows(self):
+        """Test seeding users with tags, ingredients and recipes"""
+        call_command('seed', users=3, recipes=5, workers=1, seed=7,
+                     stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertTrue(Tag.objects.exists())
+        for recipe in Recipe.objects.all():
+            self.assertGreaterEqual(recipe.ingredients.count(), 3)
+            for ingredient in recipe.ingredients.all():
+                self.assertEqual(ingredient.user_id, recipe.user_id)
+            for tag in recipe.tags.all():
+                self.assertEqual(tag.user_id, recipe.user_id)
+
+    def test_seed_is_deterministic(self):
+        """Test that the same seed generates the same data"""
+        call_command('seed', users=4, recipes=5, workers=1, seed=3,
+                     stdout=StringIO())
+        first = self.seeded()
+        get_user_model().objects.all().delete()
+        call_command('seed', users=4, recipes=5, workers=1, seed=3,
+                     stdout=StringIO())
+
+        self.assertTrue(first)
+        self.assertEqual(self.seeded(), first)
+
+    def test_seeded_users_can_log_in(self):
+        """Test that seeded users get a usable password"""
+        call_command('seed', users=1, workers=1, password='Secret123',
+                     stdout=StringIO())
+        user = get_user_model().objects.get()
+        self.assertTrue(user.check_password('Secret123'))
+
+
+class CheckRecipeSnapshotsCommandTests(TestCase):
+    """Test verifying and repairing the recipe snapshots"""
+
+    def setUp(self) -> None:
+        user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.recipe = Recipe.objects.create(
+            user=user, title='Salad', time_minutes=5, price=5)
+        self.recipe.tags.add(Tag.objects.create(user=user, name='Vegan'))
+
+    def check(self, *args):
+        out = StringIO()
+        call_command('check_recipe_snapshots', *args, stdout=out)
+        return out.getvalue()
+
+    def test_consistent_snapshots(self):
+        """Test that snapshots maintained by the signals are consistent"""
+        self.assertIn('1 recipes checked, 0 snapshots missing, 0 stale',
+                      self.check())
+
+    def test_inconsistent_snapshots_repaired(self):
+        """Test that stale snapshots fail the check until repaired"""
+        RecipeSnapshot.objects.update(data='{}')
+
+        with self.assertRaises(CommandError):
+            self.check()
+        self.assertIn('1 snapshots repaired', self.check('--repair'))
+        self.check()
+        self.assertIn('"Vegan"',
+                      RecipeSnapshot.objects.get(recipe=self.recipe).data)
+
+
+class MigrateIfPendingCommandTests(TestCase):
+
+    @patch('core.management.commands.migrate_if_pending.call_command')
+    def test_nothing_pending_skips_migrate(self, migrate):
+        """Test that migrate is not run for an up to date database"""
+        out = StringIO()
+        call_command('migrate_if_pending', stdout=out)
+
+        migrate.assert_not_called()
+        self.assertIn('No migrations to apply', out.getvalue())
+
+    @patch('core.management.commands.migrate_if_pending.call_command')
+    @patch('django.db.migrations.executor.MigrationExecutor.migration_plan')
+    def test_pending_migrations_applied(self, plan, migrate):
+        """Test that migrate runs when migrations are pending"""
+        plan.return_value = [('core', False)]
+        call_command('migrate_if_pending', stdout=StringIO())
+
+        migrate.assert_called_once()
+
+    @patch('time.sleep', return_value=True)
+    @patch('core.management.commands.migrate_if_pending.call_command')
+    @patch('django.db.migrations.executor.MigrationExecutor.migration_plan')
+    def test_wait_applied(self, plan, migrate, sleep):
+        """Test waiting for another process to apply the migrations"""
+        plan.side_effect = [[('core', False)], [('core', False)], []]
+        call_command('migrate_if_pending', wait_applied=True,
+                     stdout=StringIO())
+
+        migrate.assert_not_called()
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch('time.sleep', return_value=True)
+    @patch('django.db.backends.base.base.BaseDatabaseWrapper'
+           '.ensure_connection')
+    def test_wait_for_database(self, ensure_connection, sleep):
+        """Test waiting until the database accepts connections"""
+        def connect():
+            if sleep.call_count < 3:
+                raise OperationalError
+
+        ensure_connection.side_effect = connect
+        call_command('migrate_if_pending', wait=True, stdout=StringIO())
+
+        self.assertEqual(sleep.call_count, 3)
+
+
+class ProfileStartupCommandTests(TestCase):
+
+    def test_parse_importtime(self):
+        """Test reading the output of python -X importtime"""
+        imports = parse_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   rest_framework.compat\n'
+            'import time:        30 |        150 | rest_framework\n')
+
+        self.assertEqual(imports, [
+            ('rest_framework.compat', 120, 120, 1),
+            ('rest_framework', 30, 150, 0),
+        ])
+
+    def test_api_settings_start(self):
+        """Test that an API-only process serves the API but no admin"""
+        for path, status in (('/api/recipe/tag/', '401'),
+                             ('/admin/', '404')):
+            out = StringIO()
+            call_command('profile_startup', runs=1, path=path,
+                         settings_module='app.settings_api', stdout=out)
+
+            self.assertIn(f'{path} -> {status}', out.getvalue())
+            self.assertIn('Imports:', out.getvalue())
@@ -0,0 +1,53 @@
+import gzip
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Test compressing responses for clients accepting gzip"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=10,
+                   price=5)
+            for i in range(50))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_streamed_response_compressed(self):
+        """Test that streamed lists are compressed as they are sent"""
+        plain = b''.join(self.client.get(RECIPE_URL).streaming_content)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+        body = b''.join(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(body), plain)
+        self.assertLess(len(body), len(plain) / 2)
+
+    def test_small_response_not_compressed(self):
+        """Test that responses under the threshold are sent as they are"""
+        recipe = Recipe.objects.first()
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    @override_settings(GZIP_MIN_LENGTH=10)
+    def test_large_response_compressed(self):
+        """Test that complete responses from the threshold are compressed"""
+        res = self.client.get(
+            RECIPE_URL, {'limit': 50}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn(b'Recipe 0', gzip.decompress(res.content))
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db.utils import OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import checks, db_router
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        self.router = db_router.ReplicaRouter()
+        self.factory = RequestFactory()
+        db_router.reset_replica_health()
+        cache.clear()
+
+    def route(self, request):
+        """Run a request through the middleware and return the read db"""
+        routed = []
+
+        def view(req):
+            routed.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return routed[0]
+
+    def test_reads_use_primary_outside_requests(self):
+        """Test that reads default to the primary without a request"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_writes_use_primary(self):
+        """Test that writes go to the primary, as do reads after them"""
+        with db_router.read_from_replicas():
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        """Test that GET requests are served by the replica"""
+        request = self.factory.get('/api/recipe/recipe/')
+        self.assertEqual(self.route(request), 'replica')
+
+    def test_unsafe_request_reads_from_primary(self):
+        """Test that reads inside a write request use the primary"""
+        request = self.factory.post('/api/recipe/recipe/')
+        self.assertEqual(self.route(request), 'default')
+
+    def test_client_pinned_to_primary_after_write(self):
+        """Test read-your-writes stickiness after a successful write"""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        self.route(self.factory.post('/api/recipe/recipe/', **auth))
+
+        self.assertEqual(
+            self.route(self.factory.get('/api/recipe/recipe/', **auth)),
+            'default')
+        self.assertEqual(
+            self.route(self.factory.get(
+                '/api/recipe/recipe/', HTTP_AUTHORIZATION='Token other')),
+            'replica')
+
+    @patch('core.db_router.replica_lag', side_effect=OperationalError)
+    def test_unavailable_replica_falls_back_to_primary(self, lag):
+        """Test that an unreachable replica is skipped"""
+        request = self.factory.get('/api/recipe/recipe/')
+        self.assertEqual(self.route(request), 'default')
+
+    @patch('core.db_router.replica_lag', return_value=60.0)
+    def test_lagging_replica_falls_back_to_primary(self, lag):
+        """Test that a replica too far behind is skipped"""
+        request = self.factory.get('/api/recipe/recipe/')
+        self.assertEqual(self.route(request), 'default')
+
+    def test_replicas_require_shared_cache(self):
+        """Test that pins kept in a per-process cache are reported"""
+        self.assertEqual(
+            [error.id for error in checks.check_replica_cache(None)],
+            ['core.E001'])
+
+        memcached = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.'
+                       'PyMemcacheCache',
+            'LOCATION': 'memcached:11211',
+        }}
+        with override_settings(CACHES=memcached):
+            self.assertEqual(checks.check_replica_cache(None), [])
+
+    def test_replicas_are_not_migrated(self):
+        """Test that migrations only run on the primary"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica', 'core'))
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import deletion
+from core.models import ChangeLog, DeletionTask, Ingredient, Recipe, \
+    RecipeSnapshot, Tag
+
+
+def sample_recipe(user, title='Salad'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=5)
+
+
+class DeletionTests(TestCase):
+    """Test deleting accounts and recipes in background batches"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.other_user = get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Rice')
+        self.recipes = [sample_recipe(self.user, str(i)) for i in range(5)]
+        self.recipes[0].tags.add(tag)
+        self.other_recipe = sample_recipe(self.other_user)
+
+    def test_account_deactivated_when_scheduled(self):
+        """Test that the account is closed before its data is deleted"""
+        Token.objects.create(user=self.user)
+
+        task = deletion.schedule_account_deletion(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(task.total, 8)
+        self.assertEqual(task.status, DeletionTask.PENDING)
+
+    def test_account_deleted_in_batches(self):
+        """Test that processing removes every row of the account"""
+        task = deletion.schedule_account_deletion(self.user)
+
+        deletion.process_deletions(batch_size=2)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertEqual(task.deleted, 8)
+        self.assertFalse(get_user_model().objects.filter(
+            id=self.user.id).exists())
+        self.assertFalse(Recipe.objects.filter(user_id=self.user.id).exists())
+        self.assertTrue(
+            Recipe.objects.filter(id=self.other_recipe.id).exists())
+        self.assertEqual(RecipeSnapshot.objects.count(), 1)
+
+    def test_stalled_task_resumed(self):
+        """Test that a running task whose runner stopped is resumed"""
+        task = deletion.schedule_account_deletion(self.user)
+        DeletionTask.objects.filter(id=task.id).update(
+            status=DeletionTask.RUNNING,
+            locked_at=timezone.now() - timedelta(
+                seconds=settings.DELETION_LOCK_TIMEOUT + 1))
+
+        deletion.process_deletions()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertEqual(task.deleted, 8)
+
+    def test_live_task_not_claimed(self):
+        """Test that a task still deleting batches is left to its runner"""
+        task = deletion.schedule_account_deletion(self.user)
+        DeletionTask.objects.filter(id=task.id).update(
+            status=DeletionTask.RUNNING, locked_at=timezone.now())
+
+        self.assertIsNone(deletion.claim_task())
+
+    def test_changes_recorded_once_per_batch(self):
+        """Test that a batch logs its changes with a single insert"""
+        task = deletion.schedule_recipe_deletion(
+            self.user, [recipe.id for recipe in self.recipes])
+
+        with self.assertNumQueries(11):
+            deletion.run_task(task, batch_size=5)
+
+        self.assertEqual(ChangeLog.objects.filter(deleted=True).count(), 5)
+
+    def test_account_changes_not_recorded(self):
+        """Test that deleting an account logs no changes to sync"""
+        task = deletion.schedule_account_deletion(self.user)
+        deletion.run_task(task)
+
+        self.assertFalse(ChangeLog.objects.filter(
+            user_id=self.user.id, deleted=True).exists())
+
+    def test_only_own_recipes_deleted(self):
+        """Test bulk deleting recipes ignores other users' recipes"""
+        task = deletion.schedule_recipe_deletion(
+            self.user, [self.recipes[0].id, self.recipes[1].id,
+                        self.other_recipe.id])
+
+        deletion.process_deletions(batch_size=1)
+
+        task.refresh_from_db()
+        self.assertEqual((task.deleted, task.total), (2, 2))
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(
+            Recipe.objects.filter(id=self.other_recipe.id).exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_image_removed_after_commit(self):
+        """Test that image files are deleted once the rows are"""
+        recipe = self.recipes[0]
+        recipe.image = SimpleUploadedFile('cake.jpg', b'image')
+        recipe.save()
+        path = recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+            self.assertTrue(os.path.exists(path))
+
+        self.assertFalse(os.path.exists(path))
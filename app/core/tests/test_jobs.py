@@ -0,0 +1,327 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion, jobs
+from core.models import DeletionTask, Job, Recipe
+
+ENQUEUE_URL = reverse('jobs:enqueue')
+METRICS_URL = reverse('jobs:metrics')
+
+calls = []
+
+# Runs a burst worker with the test settings from a scratch directory
+WORKER_SCRIPT = '''
+import json, sys
+sys.argv = ['manage.py', 'test']
+import django
+django.setup()
+from django.core.management import call_command
+from core import jobs
+from core.models import Job
+
+@jobs.register('test_echo')
+def echo_job(job):
+    return job.payload
+
+call_command('migrate', verbosity=0)
+for value in range(6):
+    jobs.enqueue('test_echo', {{'value': value}})
+call_command('worker', **json.loads({options!r}))
+print(json.dumps(list(
+    Job.objects.order_by('id').values_list('status', 'result'))))
+'''
+
+
+@jobs.register('test_echo', public=True)
+def echo_job(job):
+    calls.append(job.id)
+    return job.payload
+
+
+@jobs.register('test_flaky', max_attempts=2)
+def flaky_job(job):
+    raise ValueError('Flaky')
+
+
+def job_url(job_id):
+    return reverse('jobs:job', args=[job_id])
+
+
+class JobQueueTests(TestCase):
+    """Test queueing, claiming and retrying background jobs"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        calls.clear()
+
+    def test_claim_marks_ready_jobs_running(self):
+        """Test that claims skip future jobs and respect the limit"""
+        first = jobs.enqueue('test_echo', {'value': 1})
+        second = jobs.enqueue('test_echo', {'value': 2})
+        jobs.enqueue('test_echo', run_after=timezone.now() +
+                     timedelta(hours=1))
+
+        claimed = jobs.claim_jobs(5)
+
+        self.assertEqual([job.id for job in claimed], [first.id, second.id])
+        self.assertEqual(claimed[0].status, Job.RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(jobs.claim_jobs(5), [])
+
+    def test_run_records_result(self):
+        """Test that a successful job stores its result"""
+        job = jobs.enqueue('test_echo', {'value': 1})
+
+        jobs.run_job(jobs.claim_jobs(1)[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'value': 1})
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [job.id])
+
+    @override_settings(JOB_RETRY_BACKOFF=10)
+    def test_failed_job_retried_with_backoff(self):
+        """Test that failures are retried later until attempts run out"""
+        job = jobs.enqueue('test_flaky')
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_jobs(1)[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.claim_jobs(1), [])
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_jobs(1)[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_stalled_jobs_released(self):
+        """Test that jobs left running by a dead worker are requeued"""
+        job = jobs.enqueue('test_flaky')
+        jobs.claim_jobs(1)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.release_stalled_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+        jobs.claim_jobs(1)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        jobs.release_stalled_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_heartbeat_keeps_long_jobs(self):
+        """Test that jobs whose worker is alive are not requeued"""
+        job = jobs.enqueue('test_flaky')
+        jobs.claim_jobs(1)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.heartbeat([job.id]), 1)
+        self.assertEqual(jobs.release_stalled_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_queue_metrics(self):
+        """Test that the metrics count the jobs per state and name"""
+        jobs.enqueue('test_echo')
+        jobs.enqueue('test_echo', run_after=timezone.now() +
+                     timedelta(hours=1))
+        jobs.enqueue('test_flaky')
+        jobs.claim_jobs(1)
+
+        metrics = jobs.queue_metrics()
+
+        self.assertEqual(
+            (metrics['queued'], metrics['ready'], metrics['running']),
+            (2, 1, 1))
+        self.assertEqual(metrics['jobs']['test_echo']['running'], 1)
+        self.assertEqual(metrics['jobs']['test_flaky']['ready'], 1)
+
+    def test_deletion_runs_as_job(self):
+        """Test that scheduled deletions are carried out by a job"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=5)
+        task = deletion.schedule_recipe_deletion(self.user, [recipe.id])
+        job = Job.objects.get(name='deletion')
+        self.assertEqual(job.payload, {'task_id': task.id})
+
+        jobs.run_job(jobs.claim_jobs(1)[0])
+
+        job.refresh_from_db()
+        task.refresh_from_db()
+        self.assertEqual(job.result, {'deleted': 1, 'total': 1})
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_deletion_job_skips_processed_task(self):
+        """Test that the job leaves tasks run by process_deletions alone"""
+        task = deletion.schedule_recipe_deletion(self.user, [])
+        deletion.process_deletions()
+
+        jobs.run_job(jobs.claim_jobs(1)[0])
+
+        job = Job.objects.get(name='deletion')
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNone(job.result)
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+
+
+class JobApiTests(TestCase):
+    """Test enqueueing jobs and polling their status through the API"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """Test that jobs cannot be queued anonymously"""
+        res = APIClient().post(ENQUEUE_URL, {'name': 'test_echo'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_enqueue_job(self):
+        """Test that a public job is queued for the user"""
+        res = self.client.post(
+            ENQUEUE_URL, {'name': 'test_echo', 'payload': {'value': 1}},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.payload, {'value': 1})
+        self.assertEqual(res.data['status'], Job.QUEUED)
+
+    def test_enqueue_payload_kept_apart(self):
+        """Test that payload keys never reach the enqueue arguments"""
+        payload = {'run_after': '2000-01-01T00:00:00Z', 'user': 1,
+                   'name': 'deletion'}
+        res = self.client.post(
+            ENQUEUE_URL, {'name': 'test_echo', 'payload': payload},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual((job.name, job.user), ('test_echo', self.user))
+        self.assertEqual(job.payload, payload)
+        self.assertGreater(job.run_after, job.created_at - timedelta(1))
+
+    def test_enqueue_private_job_rejected(self):
+        """Test that only public jobs can be queued through the API"""
+        for name in ('test_flaky', 'deletion', 'missing'):
+            res = self.client.post(ENQUEUE_URL, {'name': name})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_status(self):
+        """Test polling the status of a finished job"""
+        job = jobs.enqueue('test_echo', {'value': 2}, user=self.user)
+        jobs.run_job(jobs.claim_jobs(1)[0])
+
+        res = self.client.get(job_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.DONE)
+        self.assertEqual(res.data['result'], {'value': 2})
+
+    def test_other_users_job_hidden(self):
+        """Test that users only see their own jobs"""
+        other = get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1')
+        job = jobs.enqueue('test_echo', user=other)
+
+        res = self.client.get(job_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_metrics_admin_only(self):
+        """Test that the queue metrics are reserved to staff"""
+        jobs.enqueue('test_echo')
+
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['ready'], 1)
+
+    def test_recipe_export(self):
+        """Test that the export is downloaded only by its owner"""
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=5)
+        res = self.client.post(ENQUEUE_URL, {'name': 'recipe_export'})
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1'))
+
+        with override_settings(EXPORT_ROOT=export_root):
+            jobs.run_job(jobs.claim_jobs(1)[0])
+            job = Job.objects.get(id=res.data['id'])
+            self.assertEqual(job.status, Job.DONE)
+            download = self.client.get(job.result['url'])
+            recipes = json.loads(b''.join(download.streaming_content))
+            other_res = other.get(job.result['url'])
+
+        self.assertEqual([recipe['title'] for recipe in recipes], ['Salad'])
+        self.assertEqual(other_res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(job.result['url'].startswith(settings.MEDIA_URL))
+
+
+class WorkerCommandTests(SimpleTestCase):
+    """Test the worker command running jobs from other threads"""
+
+    def test_burst_runs_every_ready_job(self):
+        """Test that a burst worker runs the queue dry and exits"""
+        # Threads writing to the in-memory test database fail at once
+        # instead of waiting for its lock, so use a file database
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='app.settings',
+                   PYTHONPATH=str(settings.BASE_DIR))
+        script = WORKER_SCRIPT.format(options=json.dumps(
+            {'concurrency': 3, 'burst': True}))
+
+        process = subprocess.run(
+            [sys.executable, '-c', script], cwd=workdir.name, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            timeout=60)
+
+        self.assertEqual(process.returncode, 0, process.stderr)
+        output = process.stdout.splitlines()
+        self.assertIn('Running jobs with 3 thread workers', output)
+        self.assertIn('Queue: 6 ready', output[1])
+        self.assertEqual(json.loads(output[-1]),
+                         [['done', {'value': i}] for i in range(6)])
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class BrowserOnlyMiddlewareTests(TestCase):
+    """Test that browser middleware only runs outside the API"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_superuser(
+            'admin@mail.com', 'Sstring1')
+        self.client = APIClient(enforce_csrf_checks=True)
+
+    def test_api_request_skips_browser_middleware(self):
+        """Test that API requests get no session, user or messages"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        request = res.wsgi_request
+        for attribute in ('session', '_messages', 'csrf_processing_done'):
+            self.assertFalse(hasattr(request, attribute))
+        self.assertNotIn('Cookie', res.get('Vary', ''))
+
+    def test_admin_keeps_sessions_and_csrf(self):
+        """Test that the admin still logs in with a session and CSRF"""
+        login_url = reverse('admin:login')
+        res = self.client.get(login_url)
+        self.assertIn('csrftoken', res.cookies)
+
+        rejected = self.client.post(
+            login_url, {'username': 'admin@mail.com', 'password': 'Sstring1'})
+        self.assertEqual(rejected.status_code, 403)
+
+        res = self.client.post(login_url, {
+            'username': 'admin@mail.com',
+            'password': 'Sstring1',
+            'csrfmiddlewaretoken': res.cookies['csrftoken'].value,
+        })
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            self.client.get(reverse('admin:index')).status_code, 200)
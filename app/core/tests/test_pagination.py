@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.models import Tag
+from core.pagination import EstimatedCountPaginator
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+class EstimatedCountPaginatorTests(TestCase):
+    """Test counting large querysets from the database estimates"""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        other_user = get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1')
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.bulk_create(
+            Tag(user=other_user, name=f'Tag {i}') for i in range(4))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Tag.objects.bulk_create(
+            Tag(user=other_user, name=f'New tag {i}') for i in range(3))
+
+    def test_small_count_is_exact(self):
+        """Test that counts under the threshold are exact"""
+        paginator = EstimatedCountPaginator(
+            Tag.objects.filter(user=self.user).order_by('id'), 2)
+
+        self.assertEqual(paginator.count, 1)
+        self.assertFalse(paginator.count_is_estimated)
+
+    def test_large_count_is_estimated(self):
+        """Test that large tables are counted from their statistics"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by('id'), 2)
+
+        self.assertEqual(paginator.count, 5)
+        self.assertTrue(paginator.count_is_estimated)
+
+    def test_pages_past_estimated_count(self):
+        """Test that rows beyond a low estimate can still be paged"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by('id'), 3)
+
+        page = paginator.page(3)
+
+        self.assertEqual([tag.name for tag in page],
+                         ['New tag 1', 'New tag 2'])
+        self.assertFalse(page.has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
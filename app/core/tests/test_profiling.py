@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+# Unpaginated lists are streamed after the middleware has returned
+PAGE = {'limit': 50}
+# Still loads the links of each recipe with its own queries
+SEARCH_URL = reverse('recipe:recipe-search-recipe')
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=10, price=5)
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_has_no_timing(self):
+        """Test that requests outside the sample are not profiled"""
+        res = self.client.get(RECIPE_URL)
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_breakdown(self):
+        """Test that sampled requests report every timing phase"""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            res = self.client.get(RECIPE_URL, PAGE)
+
+        timing = res['Server-Timing']
+        for metric in ('auth;', 'db;', 'serialize;', 'render;', 'total;'):
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], RECIPE_URL)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_duplicated_queries_reported(self):
+        """Test that repeated SQL is counted as duplicated"""
+        for _ in range(3):
+            Recipe.objects.create(
+                user=self.user, title='Cake', time_minutes=10, price=5)
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(SEARCH_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['db_duplicates'], 0)
+        self.assertTrue(record['duplicated_sql'])
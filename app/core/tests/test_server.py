@@ -0,0 +1,88 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from core.management.commands.serve import listen
+from core.server import iter_views
+from recipe.views import RecipeViewSet, TagViewSet
+
+# Serves with the test settings from a scratch directory
+SERVE_SCRIPT = '''
+import json, sys
+sys.argv = ['manage.py', 'test']
+import django
+django.setup()
+from django.core.management import call_command
+call_command('serve', **json.loads({options!r}))
+'''
+
+
+class ServeCommandTests(SimpleTestCase):
+    """Test serving the app with pre-forked workers"""
+
+    def serve(self, **options):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='app.settings',
+                   PYTHONPATH=str(settings.BASE_DIR))
+        script = SERVE_SCRIPT.format(options=json.dumps(
+            dict(options, bind='127.0.0.1:0')))
+        process = subprocess.Popen(
+            [sys.executable, '-c', script], cwd=workdir.name, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.addCleanup(process.kill)
+        line = process.stdout.readline()
+        self.assertIn('Listening at', line)
+        return process, line.split()[2]
+
+    def get_status(self, url):
+        try:
+            return urlopen(url, timeout=10).status
+        except HTTPError as error:
+            return error.code
+
+    def test_recycled_workers_keep_serving(self):
+        """Test that workers replaced after each request keep serving"""
+        process, address = self.serve(workers=1, max_requests=1)
+        statuses = [self.get_status(f'{address}/api/recipe/tag/')
+                    for _ in range(3)]
+
+        self.assertEqual(statuses, [401] * 3)
+        process.send_signal(signal.SIGTERM)
+        self.assertEqual(process.wait(timeout=10), 0)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_workers_need_shared_cache(self):
+        """Test that several workers are refused a process-local cache"""
+        with self.assertRaisesMessage(CommandError, 'shared by all'):
+            call_command('serve', workers=2, bind='127.0.0.1:0')
+
+    def test_listen(self):
+        """Test opening the listening socket for IPv4 and IPv6 hosts"""
+        for host, family in (('127.0.0.1', socket.AF_INET),
+                             ('::1', socket.AF_INET6)):
+            if family == socket.AF_INET6 and not socket.has_ipv6:
+                continue
+            with listen(host, 0, 8) as sock:
+                self.assertEqual(sock.family, family)
+                self.assertFalse(sock.getblocking())
+                self.assertNotEqual(sock.getsockname()[1], 0)
+
+    def test_views_preloaded(self):
+        """Test finding the views whose serializers are warmed"""
+        views = set(iter_views())
+
+        self.assertIn(RecipeViewSet, views)
+        self.assertIn(TagViewSet, views)
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.throttling import SlidingWindowThrottle, reset_local_state
+
+TOKEN_URL = reverse('user:token')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(THROTTLE_ENABLED=True, THROTTLE_LOCAL_FRACTION=0.1,
+                   THROTTLE_RATES={'login': '3/min', 'recipe_create': '2/min',
+                                   'recipe_create_ip': '3/min',
+                                   'test': '100/min'})
+class SlidingWindowThrottleTests(TestCase):
+    """Test the shared sliding window rate limits"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        reset_local_state()
+        self.client = APIClient()
+        self.now = 600.0
+        patcher = mock.patch.object(
+            SlidingWindowThrottle, 'timer', lambda throttle: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, ip='10.0.0.1'):
+        return self.client.post(
+            TOKEN_URL, {'email': 'test@mail.com', 'password': 'wrong'},
+            REMOTE_ADDR=ip)
+
+    def test_login_limited_per_address(self):
+        """Test that login attempts are limited per client address"""
+        codes = [self.login().status_code for _ in range(4)]
+
+        self.assertEqual(codes[:3], [status.HTTP_400_BAD_REQUEST] * 3)
+        self.assertEqual(codes[3], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login('10.0.0.2').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_previous_window_weighted(self):
+        """Test that the previous window counts by its remaining overlap"""
+        for _ in range(3):
+            self.login()
+        self.now += 60
+        self.assertEqual(self.login().status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.now += 40
+        self.assertEqual(self.login().status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_create_limited_per_user(self):
+        """Test that recipe creation is limited per user"""
+        user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.client.force_authenticate(user)
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': 5}
+        codes = [self.client.post(RECIPES_URL, payload).status_code
+                 for _ in range(3)]
+
+        self.assertEqual(codes, [status.HTTP_201_CREATED] * 2 +
+                         [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_recipe_create_limited_per_address(self):
+        """Test that accounts sharing an address share its allowance"""
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': 5}
+        codes = []
+        for email in ('test@mail.com', 'other@mail.com'):
+            self.client.force_authenticate(
+                get_user_model().objects.create_user(email, 'Sstring1'))
+            codes += [self.client.post(RECIPES_URL, payload).status_code
+                      for _ in range(2)]
+
+        self.assertEqual(codes, [status.HTTP_201_CREATED] * 3 +
+                         [status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_rejected_requests_not_counted(self):
+        """Test that a request rejected by one limit uses up neither"""
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': 5}
+        first, second = [
+            get_user_model().objects.create_user(email, 'Sstring1')
+            for email in ('test@mail.com', 'other@mail.com')]
+
+        def create(user, ip='10.0.0.1'):
+            self.client.force_authenticate(user)
+            return self.client.post(
+                RECIPES_URL, payload, REMOTE_ADDR=ip).status_code
+
+        # The third is over the user limit and leaves the address alone
+        codes = [create(first) for _ in range(3)]
+        # The second is over the address limit and leaves the user alone
+        codes += [create(second) for _ in range(2)]
+        codes += [create(second, '10.0.0.2') for _ in range(2)]
+
+        created = status.HTTP_201_CREATED
+        rejected = status.HTTP_429_TOO_MANY_REQUESTS
+        self.assertEqual(codes, [created, created, rejected, created,
+                                 rejected, created, rejected])
+
+    def test_missing_rate_reported(self):
+        """Test that a scope without a rate names the scope"""
+        with self.assertRaisesMessage(ImproperlyConfigured, "'missing'"):
+            SlidingWindowThrottle('missing')
+
+    def test_requests_under_limit_admitted_locally(self):
+        """Test that clients far from their limit skip the shared cache"""
+        request = mock.Mock(user=mock.Mock(is_authenticated=True, pk=1))
+        throttle = SlidingWindowThrottle('test')
+        with mock.patch.object(throttling, 'cache', wraps=cache) as shared:
+            allowed = [throttle.allow_request(request, None)
+                       for _ in range(50)]
+
+        self.assertTrue(all(allowed))
+        self.assertLess(shared.incr.call_count, 25)
+        pending = throttling._states['throttle:test:user:1'].pending
+        self.assertEqual(cache.get('throttle:test:user:1:10') + pending, 50)
+
+    def test_limit_shared_between_processes(self):
+        """Test that requests counted by other processes are seen"""
+        cache.set('throttle:login:ip:10.0.0.1:10', 3)
+
+        self.assertEqual(self.login().status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
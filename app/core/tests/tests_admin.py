@@ -1,7 +1,11 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 
+from core.models import Recipe, Tag
+from core.pagination import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
     def setUp(self) -> None:
@@ -29,3 +33,56 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+
+class OwnedObjectAdminTests(TestCase):
+    """Test the admin of tags, ingredients and recipes"""
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@mail.com', password='Sstring1')
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='test@mail.com', password='Sstring1')
+        self.other_user = get_user_model().objects.create_user(
+            email='other@mail.com', password='Sstring1')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Quick vegan')
+        Tag.objects.create(user=self.other_user, name='Vegetarian')
+
+    def test_recipe_change_page_uses_autocomplete(self):
+        """Test that related objects are not all rendered in the form"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=5)
+        recipe.tags.add(self.vegan)
+
+        res = self.client.get(
+            reverse('admin:core_recipe_change', args=[recipe.id]))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertContains(res, 'Vegan')
+        self.assertNotContains(res, 'Vegetarian')
+
+    def test_search_by_prefix_and_owner(self):
+        """Test searching one user's tags by name prefix"""
+        res = self.client.get(reverse('admin:core_tag_changelist'),
+                              {'user': self.user.id, 'q': 'Veg'})
+
+        self.assertEqual(list(res.context['cl'].result_list), [self.vegan])
+        self.assertContains(res, self.user.email)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+    def test_large_table_counted_from_statistics(self):
+        """Test that unfiltered changelists use the table statistics"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Tag.objects.create(user=self.user, name='Spicy')
+
+        unfiltered = EstimatedCountPaginator(Tag.objects.order_by('id'), 10)
+        filtered = EstimatedCountPaginator(
+            Tag.objects.filter(user=self.user).order_by('id'), 10)
+
+        self.assertEqual(unfiltered.count, 3)
+        self.assertEqual(filtered.count, 3)
@@ -1,9 +1,12 @@
+from importlib import import_module
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from core import models
 
+link_catalog = import_module('core.migrations.0014_link_catalog')
+
 
 def sample_user(email='test@mail.com', password='Sstring1'):
     """Creste a sample user"""
@@ -69,4 +72,50 @@ class ModelTests(TestCase):
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'my_image.jpg')
         exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)
\ No newline at end of file
+        self.assertEqual(file_path, exp_path)
+
+    def test_catalog_key_fits_column(self):
+        """Test that names lengthened by case folding still fit"""
+        tag = models.Tag.objects.create(user=sample_user(), name='ß' * 200)
+
+        self.assertEqual(tag.canonical.name, 'ss' * 127 + 's')
+
+    def test_names_shared_through_catalog(self):
+        """Test that equal names of different users share a catalog row"""
+        other = sample_user('other@mail.com')
+        salt = models.Ingredient.objects.create(
+            user=sample_user(), name='Salt')
+        models.Ingredient.objects.create(user=other, name=' salt ')
+        models.Tag.objects.create(user=other, name='SALT')
+
+        self.assertEqual(salt.canonical.name, 'salt')
+        self.assertEqual(models.CanonicalName.objects.count(), 1)
+        self.assertEqual(salt.canonical.ingredients.count(), 2)
+        self.assertEqual(salt.canonical.tags.count(), 1)
+
+    def test_rename_interns_new_name(self):
+        """Test that renaming an entry links it to the new name"""
+        tag = models.Tag.objects.create(user=sample_user(), name='Vegan')
+
+        tag.name = 'Quick'
+        tag.save(update_fields=['name'])
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.canonical.name, 'quick')
+
+    def test_link_existing_entries_in_batches(self):
+        """Test that the migration links entries saved before the catalog"""
+        user = sample_user()
+        for name in ('Rice', 'rice', 'Beans'):
+            models.Ingredient.objects.create(user=user, name=name)
+        models.Ingredient.objects.update(canonical=None)
+        models.CanonicalName.objects.filter(name='beans').delete()
+
+        link_catalog.link_entries(
+            models.Ingredient, models.CanonicalName, 'default', batch_size=2)
+
+        self.assertEqual(
+            sorted(models.Ingredient.objects.values_list(
+                'name', 'canonical__name')),
+            [('Beans', 'beans'), ('Rice', 'rice'), ('rice', 'rice')])
+        self.assertEqual(models.CanonicalName.objects.count(), 2)
@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import SimpleRateThrottle
+
+# Clients tracked by the in-process fast path
+LOCAL_KEYS_MAX = 10000
+
+
+class WindowState:
+    """What one process knows about a client's current window"""
+    __slots__ = ('window', 'previous', 'synced', 'pending')
+
+    def __init__(self, window, previous):
+        self.window = window
+        self.previous = previous
+        self.synced = 0
+        self.pending = 0
+
+
+_states = OrderedDict()
+_lock = threading.Lock()
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Sliding window rate limit shared by all processes through the cache.
+
+    Requests are counted in fixed windows and the previous window is
+    weighted by how much of it still overlaps the sliding window. A
+    request normally costs a single atomic ``incr`` (and a ``decr`` when
+    it is rejected). Clients far from their limit are admitted from
+    process-local counters instead, and the local requests are added to
+    the shared counter with the next ``incr``; each process may only
+    grant ``THROTTLE_LOCAL_FRACTION`` of the remaining allowance that
+    way.
+
+    Clients are identified by their user when authenticated and by their
+    address otherwise. Rates come from ``THROTTLE_RATES``.
+    """
+
+    def __init__(self, scope=None):
+        if scope is not None:
+            self.scope = scope
+        self.wait_seconds = None
+        # Where the last admitted request was counted, see release()
+        self.admitted = None
+        super().__init__()
+
+    def get_rate(self):
+        try:
+            return settings.THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'No throttle rate set for {self.scope!r} scope in '
+                f'THROTTLE_RATES')
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'throttle:{self.scope}:user:{request.user.pk}'
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        key = self.get_cache_key(request, view)
+        window, elapsed = divmod(self.timer(), self.duration)
+        window = int(window)
+        # Share of the previous window still inside the sliding window
+        overlap = (self.duration - elapsed) / self.duration
+
+        state = self.window_state(key, window)
+        with _lock:
+            used = state.previous * overlap + state.synced + state.pending
+            headroom = self.num_requests - used - 1
+            # Only once this process has seen the shared count
+            counter = f'{key}:{window}'
+            if state.synced and state.pending + 1 <= \
+                    headroom * settings.THROTTLE_LOCAL_FRACTION:
+                state.pending += 1
+                self.admitted = (counter, state)
+                return True
+            delta, state.pending = state.pending + 1, 0
+
+        count = self.increment(counter, delta)
+        if state.previous * overlap + count <= self.num_requests:
+            with _lock:
+                state.synced = max(state.synced, count)
+            self.admitted = (counter, state)
+            return True
+        # Rejected requests do not use up the allowance
+        cache.decr(counter)
+        with _lock:
+            state.synced = max(state.synced, count - 1)
+        self.wait_seconds = self.duration - elapsed
+        return False
+
+    def release(self):
+        """Give back the allowance used by the last admitted request"""
+        if self.admitted is None:
+            return
+        (counter, state), self.admitted = self.admitted, None
+        with _lock:
+            if state.pending:
+                state.pending -= 1
+                return
+        # Already added to the shared counter
+        cache.decr(counter)
+
+    def window_state(self, key, window):
+        """Return the local state of a client for the current window"""
+        with _lock:
+            state = _states.get(key)
+            if state is not None and state.window == window:
+                _states.move_to_end(key)
+                return state
+        # Read once per window and process, the count is final by now
+        previous = cache.get(f'{key}:{window - 1}', 0)
+        with _lock:
+            state = _states.get(key)
+            if state is None or state.window != window:
+                state = _states[key] = WindowState(window, previous)
+            _states.move_to_end(key)
+            while len(_states) > LOCAL_KEYS_MAX:
+                _states.popitem(last=False)
+            return state
+
+    def increment(self, key, delta):
+        """Atomically add ``delta`` to a window counter"""
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # Kept for two windows, the next one weights it
+            if cache.add(key, delta, 2 * self.duration):
+                return delta
+            return cache.incr(key, delta)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPSlidingWindowThrottle(SlidingWindowThrottle):
+    """Sliding window rate limit per client address"""
+
+    def get_cache_key(self, request, view):
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+
+class AllThrottles:
+    """
+    Admit a request only when every throttle does. A rejected request is
+    given back to the throttles that admitted it, so it uses up none of
+    the limits; DRF alone would count it in all of them.
+    """
+
+    def __init__(self, *throttles):
+        self.throttles = throttles
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        admitted = []
+        for throttle in self.throttles:
+            if not throttle.allow_request(request, view):
+                for other in admitted:
+                    other.release()
+                self.wait_seconds = throttle.wait()
+                return False
+            admitted.append(throttle)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def reset_local_state():
+    """Forget the process-local counters"""
+    with _lock:
+        _states.clear()
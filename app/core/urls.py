@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+urlpatterns = [
+    path('', views.EnqueueJobView.as_view(), name='enqueue'),
+    path('<int:pk>/', views.JobView.as_view(), name='job'),
+    path('metrics/', views.JobMetricsView.as_view(), name='metrics'),
+]
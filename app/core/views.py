@@ -1,3 +1,73 @@
-from django.shortcuts import render
+from django.conf import settings
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from core import jobs
+from core.authentication import TokenAuthentication
+from core.batch import encode_responses, run_batch
+from core.middleware import SAFE_METHODS
+from core.models import Job
+from core.responses import PreRenderedResponse
+from core.serializers import BatchSerializer, JobSerializer
+from core.throttling import SlidingWindowThrottle
+
+
+class EnqueueJobView(generics.CreateAPIView):
+    """Queue a background job for the authenticated user"""
+    serializer_class = JobSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttles(self):
+        return [SlidingWindowThrottle('job_enqueue')]
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+
+class JobView(generics.RetrieveAPIView):
+    """Status of a background job of the authenticated user"""
+    serializer_class = JobSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+
+class JobMetricsView(APIView):
+    """Depth of the job queue"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(jobs.queue_metrics())
+
+
+class BatchView(APIView):
+    """
+    Run several API calls in one round trip. The client is authenticated
+    once; the calls run in order and their responses are returned
+    together.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(
+            data=request.data, context={'view_class': type(self)})
+        serializer.is_valid(raise_exception=True)
+        specs = serializer.validated_data['requests']
+        # Reads only batches may use the replicas of unpinned clients
+        responses = run_batch(
+            request, specs, settings.BATCH_CONCURRENCY,
+            replicas=not getattr(request, 'replica_pinned', True))
+        # Pin the client to the primary only once a call has written
+        request._request.wrote = any(
+            spec['method'] not in SAFE_METHODS and status_code < 400
+            for spec, (status_code, _) in zip(specs, responses))
+        return PreRenderedResponse(encode_responses(responses),
+                                   status=status.HTTP_200_OK)
@@ -0,0 +1,324 @@
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.models import Recipe
+from recipe.cache import get_generation
+
+TAG = 'tag'
+INGREDIENT = 'ingredient'
+
+BYTE_BITS = [
+    tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)
+]
+
+
+def popcount(bitmap):
+    """Number of bits set in a bitmap"""
+    return bin(bitmap).count('1')
+
+
+def iter_bits(bitmap):
+    """Yield the positions of the bits set in a bitmap"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        if byte:
+            for bit in BYTE_BITS[byte]:
+                yield index * 8 + bit
+
+
+def bit_sliced_sum(bitmaps):
+    """
+    Count, for every position, how many of the bitmaps have it set. The
+    counts are returned as bit planes: bit j of a position's count is the
+    position's bit in ``planes[j]``.
+    """
+    planes = []
+    for carry in bitmaps:
+        for j, plane in enumerate(planes):
+            if not carry:
+                break
+            planes[j] = plane ^ carry
+            carry &= plane
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def count_levels(planes, universe):
+    """Split a bit-sliced count into one bitmap per non-zero count"""
+    levels = {}
+    for count in range(1, 1 << len(planes)):
+        bitmap = universe
+        for j, plane in enumerate(planes):
+            bitmap &= plane if count >> j & 1 else ~plane
+            if not bitmap:
+                break
+        if bitmap:
+            levels[count] = bitmap
+    return levels
+
+
+def bitmap_from_positions(positions, size):
+    """Build a bitmap with the given bit positions set"""
+    data = bytearray((size + 7) // 8)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+class RecipeIndex:
+    """
+    Tag and ingredient membership of one user's recipes.
+
+    Recipes are numbered densely in the order they were added, and every
+    tag and ingredient maps to a bitmap (a Python int) of the recipe
+    positions it is linked to, so filters reduce to integer bit algebra.
+    """
+
+    def __init__(self, user_id, generation):
+        self.user_id = user_id
+        self.generation = generation
+        self.ids = array('q')
+        self.positions = {}
+        self.alive = 0
+        self.features = {TAG: {}, INGREDIENT: {}}
+        # Bumped on every change so derived data can be rebuilt lazily
+        self.version = 0
+        self.derived = {}
+
+    @classmethod
+    def build(cls, user_id, generation):
+        """Load the index of a user from the database"""
+        index = cls(user_id, generation)
+        for recipe_id in Recipe.objects.filter(
+                user_id=user_id).order_by('id').values_list('id', flat=True):
+            index.positions[recipe_id] = len(index.ids)
+            index.ids.append(recipe_id)
+        size = len(index.ids)
+        index.alive = (1 << size) - 1
+
+        for kind, descriptor in ((TAG, Recipe.tags),
+                                 (INGREDIENT, Recipe.ingredients)):
+            target = descriptor.field.m2m_reverse_name()
+            links = descriptor.through.objects.filter(
+                recipe__user_id=user_id).values_list('recipe_id', target)
+            grouped = {}
+            for recipe_id, feature_id in links.iterator():
+                position = index.positions.get(recipe_id)
+                if position is not None:
+                    grouped.setdefault(feature_id, []).append(position)
+            index.features[kind] = {
+                feature_id: bitmap_from_positions(positions, size)
+                for feature_id, positions in grouped.items()
+            }
+        return index
+
+    def nbytes(self):
+        """Approximate memory used by the index"""
+        total = sys.getsizeof(self.ids) + sys.getsizeof(self.positions) + \
+            sys.getsizeof(self.alive)
+        for bitmaps in self.features.values():
+            total += sys.getsizeof(bitmaps) + sum(
+                sys.getsizeof(bitmap) for bitmap in bitmaps.values())
+        return total
+
+    def bitmap(self, kind, feature_id):
+        return self.features[kind].get(feature_id, 0)
+
+    def recipe_ids(self, bitmap):
+        """Return the ids of the recipes in a bitmap"""
+        ids = self.ids
+        return [ids[position] for position in iter_bits(bitmap & self.alive)]
+
+    def match(self, include=(), exclude=(), match_all=True):
+        """
+        Return the bitmap of recipes linked to all (or any) of the
+        ``include`` features and to none of the ``exclude`` ones, both
+        given as (kind, id) pairs.
+        """
+        result = self.alive
+        if include:
+            bitmaps = [self.bitmap(kind, pk) for kind, pk in include]
+            if match_all:
+                for bitmap in bitmaps:
+                    result &= bitmap
+            else:
+                combined = 0
+                for bitmap in bitmaps:
+                    combined |= bitmap
+                result &= combined
+        for kind, pk in exclude:
+            result &= ~self.bitmap(kind, pk)
+        return result
+
+    def feature_sizes(self, kinds):
+        """
+        Bitmaps of recipes grouped by how many features of the given
+        kinds they have, rebuilt lazily after the index changes.
+        """
+        kinds = tuple(kinds)
+        cached = self.derived.get(kinds)
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, count_levels(bit_sliced_sum(
+                bitmap for kind in kinds
+                for bitmap in self.features[kind].values()), self.alive))
+            self.derived[kinds] = cached
+        return cached[1]
+
+    def recipe_bitmap(self, recipe_id):
+        """Bitmap holding only the given recipe"""
+        position = self.positions.get(recipe_id)
+        return 0 if position is None else 1 << position
+
+    def recipe_features(self, recipe_id, kinds):
+        """Return the (kind, id) features linked to a recipe"""
+        position = self.positions.get(recipe_id)
+        if position is None:
+            return []
+        return [
+            (kind, feature_id)
+            for kind in kinds
+            for feature_id, bitmap in self.features[kind].items()
+            if bitmap >> position & 1
+        ]
+
+    def rank(self, features, kinds, score, limit, exclude=0):
+        """
+        Return up to ``limit`` (recipe id, overlap, size, score) tuples
+        for the recipes sharing any of ``features``, ordered by
+        ``score(overlap, size)`` where overlap counts the shared features
+        and size counts all of the recipe's features of ``kinds``. Scores
+        may be any sortable value; ties go to the larger overlap and then
+        to the smaller size.
+
+        Recipes with the same overlap and size get the same score, so the
+        ranking only combines a handful of bitmaps per (overlap, size)
+        pair and never scores recipes one by one.
+        """
+        overlaps = count_levels(
+            bit_sliced_sum(self.bitmap(kind, pk) for kind, pk in features),
+            self.alive & ~exclude)
+        groups = [
+            (score(overlap, size), overlap, size, overlap_bitmap & bitmap)
+            for overlap, overlap_bitmap in overlaps.items()
+            for size, bitmap in self.feature_sizes(kinds).items()
+            if overlap_bitmap & bitmap
+        ]
+        groups.sort(key=lambda group: (group[0], group[1], -group[2]),
+                    reverse=True)
+        ranked = []
+        for value, overlap, size, bitmap in groups:
+            for position in iter_bits(bitmap):
+                ranked.append((self.ids[position], overlap, size, value))
+                if len(ranked) == limit:
+                    return ranked
+        return ranked
+
+    def add_recipe(self, recipe_id):
+        if recipe_id in self.positions:
+            return
+        self.positions[recipe_id] = len(self.ids)
+        self.alive |= 1 << len(self.ids)
+        self.ids.append(recipe_id)
+        self.version += 1
+
+    def remove_recipe(self, recipe_id):
+        position = self.positions.pop(recipe_id, None)
+        if position is not None:
+            # The stale bits left in feature bitmaps are masked by alive
+            self.alive &= ~(1 << position)
+            self.version += 1
+
+    def link(self, kind, recipe_ids, feature_ids):
+        bits = 0
+        for recipe_id in recipe_ids:
+            if recipe_id in self.positions:
+                bits |= 1 << self.positions[recipe_id]
+        bitmaps = self.features[kind]
+        for feature_id in feature_ids:
+            bitmaps[feature_id] = bitmaps.get(feature_id, 0) | bits
+        self.version += 1
+
+    def unlink(self, kind, recipe_ids, feature_ids):
+        bits = 0
+        for recipe_id in recipe_ids:
+            if recipe_id in self.positions:
+                bits |= 1 << self.positions[recipe_id]
+        bitmaps = self.features[kind]
+        for feature_id in feature_ids:
+            if feature_id in bitmaps:
+                bitmaps[feature_id] &= ~bits
+        self.version += 1
+
+    def clear_recipe(self, kind, recipe_id):
+        self.unlink(kind, [recipe_id], list(self.features[kind]))
+
+    def drop_feature(self, kind, feature_id):
+        self.features[kind].pop(feature_id, None)
+        self.version += 1
+
+
+class RecipeIndexCache:
+    """Per-process LRU of recipe indexes bounded by memory"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, user_id):
+        """Return an up to date index of the user, building it if needed"""
+        generation = get_generation(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0].generation == generation:
+                self.entries.move_to_end(user_id)
+                return entry[0]
+        index = RecipeIndex.build(user_id, generation)
+        with self.lock:
+            self._discard(user_id)
+            nbytes = index.nbytes()
+            self.entries[user_id] = (index, nbytes)
+            self.size += nbytes
+            while self.size > settings.RECIPE_INDEX_MAX_BYTES and \
+                    len(self.entries) > 1:
+                self._discard(next(iter(self.entries)))
+        return index
+
+    def apply(self, user_id, generation, update):
+        """
+        Apply a committed change to a cached index. The index is only
+        updated if it was current just before the change; otherwise
+        another process changed the data and it is rebuilt on next use.
+        """
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return
+            index, nbytes = entry
+            if index.generation != generation - 1:
+                self._discard(user_id)
+                return
+            if update is not None:
+                update(index)
+                resized = index.nbytes()
+                self.entries[user_id] = (index, resized)
+                self.size += resized - nbytes
+            index.generation = generation
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _discard(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+index_cache = RecipeIndexCache()
@@ -0,0 +1,34 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+
+def generation_key(user_id):
+    return f'recipe:generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Return the current version of a user's recipe data"""
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock so an evicted counter never goes back to a
+        # value that cached entries were already stored under
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate everything cached for a user's recipe data"""
+    try:
+        return cache.incr(generation_key(user_id))
+    except ValueError:
+        return get_generation(user_id)
+
+
+def cache_key(user_id, name, *parts):
+    """Return a cache key that changes whenever the user's data changes"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'recipe:{name}:{user_id}:{get_generation(user_id)}:{digest}'
@@ -0,0 +1,177 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ChangeLog, Ingredient, Recipe, Tag
+from recipe.serializers import IngredientSerializer, RecipeSerializer, \
+    TagSerializer
+
+CURSOR_SALT = 'recipe.changes'
+# Name of each kind in the feed, its model and serializer
+KINDS = {
+    ChangeLog.RECIPE: ('recipes', Recipe, RecipeSerializer),
+    ChangeLog.TAG: ('tags', Tag, TagSerializer),
+    ChangeLog.INGREDIENT: ('ingredients', Ingredient, IngredientSerializer),
+}
+
+_state = Local()
+
+
+class ExpiredCursor(Exception):
+    """The changes after a cursor may no longer all be recorded"""
+
+
+def record_changes(user_id, kind, object_ids, deleted=False):
+    """Append changes to the log now, or at the end of a deferred block"""
+    now = timezone.now()
+    entries = [
+        ChangeLog(user_id=user_id, kind=kind, object_id=pk,
+                  deleted=deleted, changed_at=now)
+        for pk in object_ids
+    ]
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.extend(entries)
+    elif entries:
+        ChangeLog.objects.bulk_create(entries)
+
+
+@contextmanager
+def deferred_changes(discard=False):
+    """
+    Run the block in a transaction and write the changes it records with
+    one insert, just before the transaction commits. With ``discard`` the
+    changes are dropped instead, when no client is left to sync them.
+    """
+    with transaction.atomic(savepoint=False):
+        outer = getattr(_state, 'pending', None)
+        if outer is not None and not discard:
+            yield
+            return
+        _state.pending = []
+        try:
+            yield
+            pending, _state.pending = _state.pending, outer
+            if not discard:
+                ChangeLog.objects.bulk_create(pending)
+        finally:
+            _state.pending = outer
+
+
+def encode_cursor(user, position, since=None):
+    """
+    Cursor continuing after ``position``. ``since`` is when the oldest
+    entry after it was logged, the settle horizon when none is settled.
+    """
+    since = since or settle_horizon()
+    return signing.dumps([user.id, position, since.timestamp()],
+                         salt=CURSOR_SALT)
+
+
+def decode_cursor(user, cursor):
+    """
+    Position of a cursor issued to ``user``. Raises ``ExpiredCursor`` when
+    tombstones following it may have been pruned and ``BadSignature`` when
+    it is not a valid cursor of the user.
+    """
+    payload = signing.loads(cursor, salt=CURSOR_SALT)
+    if not isinstance(payload, list) or payload[:1] != [user.id]:
+        raise signing.BadSignature('Cursor of another user')
+    if len(payload) != 3:
+        # Issued before cursors carried the age of their unread entries
+        raise ExpiredCursor
+    _, position, since = payload
+    if not isinstance(position, int) or \
+            not isinstance(since, (int, float)):
+        raise signing.BadSignature('Malformed cursor')
+    # Retention counts from the unread entries, not from the cursor
+    if time.time() - since > settings.SYNC_RETENTION:
+        raise ExpiredCursor
+    return position
+
+
+def settle_horizon():
+    """
+    Changes logged before this are settled: no transaction still in
+    progress can insert an earlier position.
+    """
+    return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def settled_changes(user, horizon=None):
+    """Changes of the user logged before the settle horizon"""
+    return ChangeLog.objects.filter(
+        user=user, changed_at__lte=horizon or settle_horizon())
+
+
+def head_position(user):
+    """Position of the user's latest settled change"""
+    return settled_changes(user).order_by('-id').values_list(
+        'id', flat=True).first() or 0
+
+
+def change_feed(user, position, limit):
+    """
+    Current state of the objects changed after ``position`` and the ids
+    of the ones deleted since, reading at most ``limit`` log entries.
+    Returns the feed and the cursor to continue from.
+    """
+    horizon = settle_horizon()
+    entries = list(settled_changes(user, horizon).filter(
+        id__gt=position,
+    ).order_by('id').values_list(
+        'id', 'kind', 'object_id', 'deleted', 'changed_at')[:limit + 1])
+    has_more = len(entries) > limit
+    # The first entry left unread dates the cursor
+    since = entries[limit][4] if has_more else horizon
+    entries = entries[:limit]
+    if entries:
+        position = entries[-1][0]
+
+    # The latest entry of each object wins
+    latest = {}
+    for _, kind, object_id, deleted, _ in entries:
+        latest[kind, object_id] = deleted
+
+    feed = {'changed': {}, 'deleted': {}, 'has_more': has_more}
+    for kind, (name, model, serializer_class) in KINDS.items():
+        ids = {pk for (k, pk), deleted in latest.items()
+               if k == kind and not deleted}
+        objects = model.objects.filter(user=user, id__in=ids).order_by('id')
+        if model is Recipe:
+            objects = objects.prefetch_related('tags', 'ingredients')
+        objects = list(objects)
+        # Objects deleted after the last entry read are tombstones too
+        deleted = {pk for (k, pk), deleted in latest.items()
+                   if k == kind and deleted}
+        deleted |= ids - {obj.id for obj in objects}
+        feed['changed'][name] = serializer_class(objects, many=True).data
+        feed['deleted'][name] = sorted(deleted)
+    return feed, encode_cursor(user, position, since)
+
+
+def prune_changes(batch_size=None):
+    """
+    Delete the log entries older than the retention period in bounded
+    batches, returning how many were deleted.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    # Cursors expire SYNC_RETENTION after the first entry they have not
+    # read; the margin covers later entries logged up to a settle delay
+    # before it
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.SYNC_RETENTION + settings.SYNC_SETTLE_SECONDS)
+    pruned = 0
+    while True:
+        ids = list(ChangeLog.objects.filter(
+            changed_at__lt=cutoff,
+        ).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return pruned
+        pruned += ChangeLog.objects.filter(id__in=ids).delete()[0]
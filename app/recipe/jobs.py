@@ -0,0 +1,28 @@
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+
+from core import jobs
+from core.models import Recipe
+from recipe.renderers import RecipeStreamRenderer
+
+
+def export_storage():
+    """Private storage of the exports, outside of the public media"""
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+@jobs.register('recipe_export', public=True)
+def export_recipes(job):
+    """Write the user's recipes as a JSON file to the export storage"""
+    recipes = Recipe.objects.filter(user_id=job.user_id).order_by('id')
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as output:
+        for chunk in RecipeStreamRenderer().render(recipes):
+            output.write(chunk)
+        output.seek(0)
+        path = export_storage().save(
+            f'{job.user_id}/recipes-{job.id}.json', File(output))
+    return {'path': path, 'url': reverse('recipe:export', args=[job.id])}
@@ -0,0 +1,170 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError as ParamError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.pagination import EstimatedPageNumberPagination
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination following the ordering of the queryset.
+
+    Each page continues after the ordering values of the previous page's
+    last row instead of skipping an offset, so with an index matching the
+    ordering deep pages are as cheap as the first one. The ordering must
+    end with a unique field. Lists are only paginated when ``limit`` or
+    ``cursor`` is given.
+    """
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit = 50
+    max_limit = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = [str(field) for field in queryset.query.order_by]
+        if not self.start(request, ordering):
+            return None
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.after(position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(_('Invalid cursor'))
+        return self.take(list(queryset[:self.limit + 1]), lambda row: [
+            getattr(row, field.lstrip('-')) for field in self.ordering])
+
+    def paginate_rows(self, rows, model, ordering, request):
+        """
+        Paginate ``rows`` of ordering values already sorted by
+        ``ordering``, such as ids matched in memory.
+        """
+        if not self.start(request, ordering):
+            return None
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                position = [
+                    model._meta.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(ordering, position)
+                ]
+            except ValidationError:
+                raise NotFound(_('Invalid cursor'))
+            rows = rows[self.first_after(rows, position):]
+        return self.take(rows[:self.limit + 1], list)
+
+    def start(self, request, ordering):
+        """Read the page size, or return False when not paginating"""
+        params = request.query_params
+        if self.limit_query_param not in params and \
+                self.cursor_query_param not in params:
+            return False
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = ordering
+        return True
+
+    def take(self, rows, position_of):
+        """Keep one page of the rows, remembering where the next starts"""
+        self.next_position = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            self.next_position = position_of(rows[-1])
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(
+                self.limit_query_param, self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_limit:
+            raise ParamError({self.limit_query_param: _(
+                'Expected a number between 1 and %d') % self.max_limit})
+        return limit
+
+    def after(self, position):
+        """Rows following ``position`` in the ordering"""
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y)
+        condition, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def first_after(self, rows, position):
+        """Index of the first of the sorted rows following ``position``"""
+        for index, row in enumerate(rows):
+            for field, value, start in zip(self.ordering, row, position):
+                if value != start:
+                    if (value < start) == field.startswith('-'):
+                        return index
+                    break
+        return len(rows)
+
+    def encode_cursor(self, position):
+        data = json.dumps([self.ordering, position], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            ordering, position = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(_('Invalid cursor'))
+        if ordering != self.ordering or not isinstance(position, list) or \
+                len(position) != len(ordering):
+            raise NotFound(_('Invalid cursor'))
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+
+class RecipePagination(BasePagination):
+    """
+    Page number pagination with estimated counts when ``page`` is given,
+    keyset pagination when ``limit`` or ``cursor`` is given, and plain
+    lists otherwise.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'page' in request.query_params:
+            self.pagination = EstimatedPageNumberPagination()
+        else:
+            self.pagination = KeysetPagination()
+        return self.pagination.paginate_queryset(queryset, request, view)
+
+    def paginate_rows(self, rows, model, ordering, request):
+        """
+        Paginate rows of ordering values sorted in memory; page number
+        pages hold rows and are counted exactly.
+        """
+        if 'page' in request.query_params:
+            self.pagination = EstimatedPageNumberPagination()
+            return self.pagination.paginate_queryset(rows, request)
+        self.pagination = KeysetPagination()
+        return self.pagination.paginate_rows(rows, model, ordering, request)
+
+    def get_paginated_response(self, data):
+        return self.pagination.get_paginated_response(data)
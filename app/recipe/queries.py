@@ -0,0 +1,158 @@
+import math
+
+from django.db import connections
+from django.db.models import Aggregate, Avg, CharField, Count, Field, \
+    FloatField, Max, Min
+from django.db.models.functions import Cast, Floor, Least
+
+from core.models import Recipe, normalize_name
+
+
+class IdList(Aggregate):
+    """Comma separated list of the ids in a group"""
+    function = 'GROUP_CONCAT'
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG',
+            template="%(function)s(CAST(%(expressions)s AS TEXT), ',')",
+            **extra_context)
+
+
+def filter_by_catalog(recipes, field, term):
+    """
+    Recipes whose ``field`` (tags or ingredients) has a catalog name
+    containing ``term``, ignoring case; all of them without a term. Each
+    recipe is listed once however many of its entries match.
+    """
+    key = normalize_name(term or '')
+    if not key:
+        return recipes
+    return recipes.filter(
+        **{f'{field}__canonical__name__contains': key}).distinct()
+
+
+def shopping_list(user, recipe_ids):
+    """
+    Merge the ingredients of the user's recipes in ``recipe_ids``,
+    listing for each ingredient the recipes that use it.
+    """
+    rows = Recipe.ingredients.through.objects.filter(
+        recipe__user=user,
+        recipe_id__in=recipe_ids,
+    ).values(
+        'ingredient_id', 'ingredient__name',
+    ).annotate(
+        recipe_ids=IdList('recipe_id'),
+    ).order_by('ingredient__name', 'ingredient_id')
+    return [
+        {
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'recipes': sorted(int(pk) for pk in row['recipe_ids'].split(',')),
+        }
+        for row in rows
+    ]
+
+
+STATS_COLUMNS = ('price', 'time_minutes')
+STATS_PERCENTILES = (50, 90, 99)
+
+
+def recipe_stats(recipes, buckets):
+    """
+    Summarise the price and cooking time of ``recipes``: count, min, max,
+    mean, nearest-rank percentiles and a histogram of ``buckets`` equal
+    width bins, all computed by the database.
+    """
+    recipes = recipes.order_by()
+    aggregates = {
+        f'{column}_{name}': function(column)
+        for column in STATS_COLUMNS
+        for name, function in (('min', Min), ('max', Max), ('mean', Avg))
+    }
+    ordered_sets = connections[recipes.db].vendor == 'postgresql'
+    if ordered_sets:
+        aggregates.update({
+            f'{column}_percentiles': Percentiles(column, STATS_PERCENTILES)
+            for column in STATS_COLUMNS
+        })
+    summary = recipes.aggregate(count=Count('id'), **aggregates)
+    count = summary['count']
+    data = {'count': count}
+    for column in STATS_COLUMNS:
+        low, high = summary[f'{column}_min'], summary[f'{column}_max']
+        if ordered_sets:
+            values = summary[f'{column}_percentiles'] or \
+                [None] * len(STATS_PERCENTILES)
+        else:
+            values = [percentile(recipes, column, count, pct)
+                      for pct in STATS_PERCENTILES]
+        data[column] = {
+            'min': _number(low),
+            'max': _number(high),
+            'mean': _number(summary[f'{column}_mean']),
+            'percentiles': {
+                str(pct): _number(value)
+                for pct, value in zip(STATS_PERCENTILES, values)
+            },
+            'histogram': histogram(recipes, column, low, high, buckets),
+        }
+    return data
+
+
+class Percentiles(Aggregate):
+    """
+    Nearest-rank percentiles of a column as one array, computed by
+    PostgreSQL in the same scan as the other aggregates.
+    """
+    function = 'PERCENTILE_DISC'
+    template = '%(function)s(ARRAY[%(fractions)s]) ' \
+        'WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentiles, **extra):
+        fractions = ', '.join(str(pct / 100) for pct in percentiles)
+        # The array is returned as is, without conversion
+        super().__init__(expression, fractions=fractions,
+                         output_field=Field(), **extra)
+
+
+def percentile(recipes, column, count, pct):
+    """
+    Nearest-rank percentile of a column, read with one ordered query
+    that the (user, column, id) indexes answer without sorting. Each
+    query still skips ``rank`` rows, so this is only used where
+    ``Percentiles`` is not available.
+    """
+    if not count:
+        return None
+    rank = max(1, math.ceil(pct / 100 * count))
+    return recipes.order_by(column, 'id') \
+        .values_list(column, flat=True)[rank - 1]
+
+
+def histogram(recipes, column, low, high, buckets):
+    """Count the recipes in equal width bins between low and high"""
+    if low is None:
+        return []
+    low, high = float(low), float(high)
+    width = (high - low) / buckets or 1
+    bucket = Least(
+        Floor((Cast(column, FloatField()) - low) / width), buckets - 1,
+        output_field=FloatField())
+    counts = dict(
+        recipes.annotate(bucket=bucket).values('bucket')
+        .annotate(count=Count('id')).values_list('bucket', 'count'))
+    return [
+        {
+            'start': round(low + index * width, 2),
+            'end': round(min(low + (index + 1) * width, high), 2),
+            'count': counts.get(index, 0),
+        }
+        for index in range(buckets if high > low else 1)
+    ]
+
+
+def _number(value):
+    return None if value is None else round(float(value), 2)
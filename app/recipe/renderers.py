@@ -0,0 +1,129 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from rest_framework.relations import ManyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import CharField, IntegerField
+
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer
+
+
+def encode_string(value):
+    """Encode a string the way ``JSONRenderer`` does"""
+    return json.dumps(value, ensure_ascii=False) \
+        .replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def value_encoder(field):
+    """Return a function encoding a column value as the field renders it"""
+    if isinstance(field, IntegerField):
+        return lambda value: str(int(value))
+    if isinstance(field, CharField):
+        return lambda value: encode_string(str(value))
+    renderer = JSONRenderer()
+    return lambda value: renderer.render(
+        field.to_representation(value)).decode()
+
+
+class RecipeStreamRenderer:
+    """
+    Encode a queryset of recipes as the JSON list ``RecipeSerializer``
+    renders, yielding one chunk of recipes at a time.
+
+    The layout is worked out once from the serializer fields: rows are read
+    as plain column tuples and formatted into a precomputed template, and
+    the tag and ingredient ids of each chunk are loaded with one query per
+    relation, so no model or serializer instance is built per recipe.
+    """
+    media_type = 'application/json'
+
+    def __init__(self, serializer_class=RecipeSerializer):
+        self.columns = []
+        self.relations = []
+        self.slots = []
+        keys = []
+        for name, field in serializer_class().fields.items():
+            keys.append(json.dumps(name) + ':%s')
+            if isinstance(field, ManyRelatedField):
+                self.slots.append((len(self.relations), None))
+                self.relations.append(getattr(Recipe, field.source))
+            else:
+                self.slots.append((len(self.columns), value_encoder(field)))
+                self.columns.append(field.source)
+        if 'id' not in self.columns:
+            self.columns.append('id')
+        self.pk_index = self.columns.index('id')
+        self.template = '{' + ','.join(keys) + '}'
+
+    def render(self, queryset, chunk_size=None):
+        """
+        Return a generator of the encoded list in chunks of
+        ``chunk_size`` recipes.
+        """
+        chunk_size = chunk_size or settings.RECIPE_STREAM_CHUNK_SIZE
+        # Resolved now: the response is iterated after the routing of the
+        # request has ended, and must still read from the database chosen
+        using = queryset.db
+        rows = queryset.using(using).values_list(*self.columns) \
+            .iterator(chunk_size)
+        return self.render_rows(rows, using, chunk_size)
+
+    def render_ids(self, queryset, ids, chunk_size=None):
+        """
+        Like ``render``, for the recipes of ``queryset`` with the given
+        ids in that order; each chunk is read with its own ``IN`` list.
+        """
+        chunk_size = chunk_size or settings.RECIPE_STREAM_CHUNK_SIZE
+        using = queryset.db
+        queryset = queryset.using(using).order_by()
+
+        def rows():
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                found = {
+                    row[self.pk_index]: row for row in
+                    queryset.filter(id__in=chunk).values_list(*self.columns)
+                }
+                yield from (found[pk] for pk in chunk if pk in found)
+
+        return self.render_rows(rows(), using, chunk_size)
+
+    def render_rows(self, rows, using, chunk_size):
+        """Yield the JSON list of an iterator of rows, chunk by chunk"""
+        separator = '['
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield (separator + ','.join(
+                self.encode_chunk(chunk, using))).encode()
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+    def encode_chunk(self, rows, using):
+        links = self.load_links([row[self.pk_index] for row in rows], using)
+        template, slots = self.template, self.slots
+        for row in rows:
+            pk = row[self.pk_index]
+            yield template % tuple(
+                '[' + ','.join(links[index].get(pk, ())) + ']'
+                if encode is None else
+                'null' if row[index] is None else encode(row[index])
+                for index, encode in slots)
+
+    def load_links(self, recipe_ids, using):
+        """Map every relation to the encoded ids linked to each recipe"""
+        links = []
+        for descriptor in self.relations:
+            field = descriptor.field
+            grouped = {}
+            for recipe_id, target_id in descriptor.through.objects.using(
+                    using).filter(**{
+                        f'{field.m2m_column_name()}__in': recipe_ids,
+                    }).order_by('id').values_list(
+                        field.m2m_column_name(), field.m2m_reverse_name()):
+                grouped.setdefault(recipe_id, []).append(str(target_id))
+            links.append(grouped)
+        return links
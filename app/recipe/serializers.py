@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from core.models import Tag, Ingredient, Recipe
+from core.profiling import ProfiledSerializerMixin
 from django.utils.translation import ugettext_lazy as _
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for the tags model object"""
 
     class Meta:
@@ -12,7 +13,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for the ingredients model object"""
 
     class Meta:
@@ -21,7 +23,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for the ingredients model object"""
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -50,6 +52,34 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(msg, code='bad_request')
         return attrs
 
+    def update(self, instance, validated_data):
+        """
+        Write only the columns whose value changed and apply tag and
+        ingredient changes as a diff of the links, skipping all writes
+        when nothing changed.
+        """
+        links = {
+            field: validated_data.pop(field)
+            for field in ('tags', 'ingredients') if field in validated_data
+        }
+        changed = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                changed.append(field)
+        if changed:
+            instance.save(update_fields=changed)
+
+        for field, objects in links.items():
+            manager = getattr(instance, field)
+            current = set(manager.values_list('id', flat=True))
+            wanted = {obj.id for obj in objects}
+            if wanted - current:
+                manager.add(*(wanted - current))
+            if current - wanted:
+                manager.remove(*(current - wanted))
+        return instance
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for the detailed ingredient model objects"""
@@ -57,9 +87,47 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(ProfiledSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializer for uploading image to recipes"""
     class Meta:
         model = Recipe
         fields = ('id', 'image',)
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',)
+
+    def update(self, instance, validated_data):
+        """Save the image alone, it is not part of the snapshots"""
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class RecipeListParamsSerializer(serializers.Serializer):
+    """Validate the range filter and ordering parameters of recipe lists"""
+    ORDERINGS = ('price', 'time_minutes', 'title')
+
+    min_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False)
+    min_time = serializers.IntegerField(min_value=0, required=False)
+    max_time = serializers.IntegerField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=[prefix + field for field in ORDERINGS
+                 for prefix in ('', '-')],
+        required=False)
+
+    def validate(self, attrs):
+        for low, high in (('min_price', 'max_price'),
+                          ('min_time', 'max_time')):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError(
+                    {low: _('Must not be greater than %s') % high})
+        return attrs
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Validate the ids of recipes to delete in the background"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False)
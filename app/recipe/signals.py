@@ -0,0 +1,161 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+
+from core.models import ChangeLog, Tag, Ingredient, Recipe
+from recipe.bitmap_index import INGREDIENT, TAG, index_cache
+from recipe.changes import record_changes
+from recipe.cache import bump_generation
+from recipe.snapshots import SNAPSHOT_FIELDS, snapshots_changed
+
+
+def data_changed(user_id, update=None):
+    """
+    Once the change is committed, invalidate the user's cached data and
+    apply ``update`` to the user's in-process recipe index.
+    """
+    def committed():
+        generation = bump_generation(user_id)
+        index_cache.apply(user_id, generation, update)
+
+    transaction.on_commit(committed)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    def add(index):
+        index.add_recipe(instance.id)
+    data_changed(instance.user_id, add if created else None)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_id = instance.id
+    data_changed(
+        instance.user_id, lambda index: index.remove_recipe(recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    """Remove the image file once the deletion is committed"""
+    if instance.image:
+        storage, name = instance.image.storage, instance.image.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def feature_saved(sender, instance, **kwargs):
+    data_changed(instance.user_id)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def feature_deleted(sender, instance, **kwargs):
+    kind = TAG if sender is Tag else INGREDIENT
+    feature_id = instance.id
+    data_changed(
+        instance.user_id, lambda index: index.drop_feature(kind, feature_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    kind = TAG if sender is Recipe.tags.through else INGREDIENT
+    pk_set = set(pk_set or ())
+    if action == 'post_clear':
+        if reverse:
+            def update(index):
+                index.drop_feature(kind, instance.id)
+        else:
+            def update(index):
+                index.clear_recipe(kind, instance.id)
+    else:
+        if reverse:
+            recipe_ids, feature_ids = pk_set, [instance.id]
+        else:
+            recipe_ids, feature_ids = [instance.id], pk_set
+        method = 'link' if action == 'post_add' else 'unlink'
+
+        def update(index):
+            getattr(index, method)(kind, recipe_ids, feature_ids)
+    data_changed(instance.user_id, update)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_snapshot_saved(sender, instance, update_fields, **kwargs):
+    if update_fields is None or SNAPSHOT_FIELDS & set(update_fields):
+        snapshots_changed([instance.id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def feature_snapshots_saved(sender, instance, created, **kwargs):
+    if not created:
+        snapshots_changed(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def feature_snapshots_deleting(sender, instance, **kwargs):
+    # The links are gone once the cascade has run
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def feature_snapshots_deleted(sender, instance, **kwargs):
+    snapshots_changed(getattr(instance, '_linked_recipe_ids', ()))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def links_snapshots_changed(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            snapshots_changed([instance.id])
+    elif action == 'pre_clear':
+        instance._linked_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        snapshots_changed(getattr(instance, '_linked_recipe_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        snapshots_changed(pk_set or ())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def change_saved(sender, instance, **kwargs):
+    record_changes(instance.user_id, sender._meta.model_name, [instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def change_deleted(sender, instance, **kwargs):
+    record_changes(instance.user_id, sender._meta.model_name, [instance.id],
+                   deleted=True)
+    # The representation of the recipes lists their tags and ingredients
+    record_changes(instance.user_id, ChangeLog.RECIPE,
+                   getattr(instance, '_linked_recipe_ids', ()))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def links_change_recorded(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_changes(instance.user_id, ChangeLog.RECIPE, [instance.id])
+    elif action == 'post_clear':
+        record_changes(instance.user_id, ChangeLog.RECIPE,
+                       getattr(instance, '_linked_recipe_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        record_changes(instance.user_id, ChangeLog.RECIPE,
+                       sorted(pk_set or ()))
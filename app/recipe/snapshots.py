@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe, RecipeSnapshot
+from recipe.serializers import RecipeDetailSerializer
+
+BATCH_SIZE = 500
+# Recipe columns that appear in the snapshots
+SNAPSHOT_FIELDS = {'title', 'time_minutes', 'price', 'link'}
+
+_state = Local()
+
+
+def render_snapshot(recipe):
+    """Encode the detail representation of a recipe"""
+    data = RecipeDetailSerializer(recipe).data
+    return JSONRenderer().render(data).decode()
+
+
+def expected_snapshots(recipe_ids):
+    """Yield up to date snapshots of the recipes, loaded in batches"""
+    recipe_ids = sorted(set(recipe_ids))
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        recipes = Recipe.objects.filter(
+            id__in=recipe_ids[start:start + BATCH_SIZE],
+        ).prefetch_related('tags', 'ingredients')
+        for recipe in recipes:
+            yield RecipeSnapshot(
+                recipe_id=recipe.id, user_id=recipe.user_id,
+                data=render_snapshot(recipe))
+
+
+def refresh_snapshots(recipe_ids):
+    """Rewrite the snapshots of the recipes in the current transaction"""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            snapshots = list(expected_snapshots(batch))
+            RecipeSnapshot.objects.filter(recipe_id__in=batch).delete()
+            RecipeSnapshot.objects.bulk_create(snapshots)
+
+
+def snapshots_changed(recipe_ids):
+    """Refresh the snapshots now, or at the end of a deferred block"""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.update(recipe_ids)
+    else:
+        refresh_snapshots(recipe_ids)
+
+
+@contextmanager
+def deferred_snapshots():
+    """
+    Run the block in a transaction and refresh every snapshot it changed
+    once, just before the transaction commits.
+    """
+    with transaction.atomic():
+        if getattr(_state, 'pending', None) is not None:
+            yield
+            return
+        _state.pending = set()
+        try:
+            yield
+            pending, _state.pending = _state.pending, None
+            refresh_snapshots(pending)
+        finally:
+            _state.pending = None
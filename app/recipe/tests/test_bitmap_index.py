@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.bitmap_index import INGREDIENT, TAG, RecipeIndex, index_cache, \
+    bit_sliced_sum, count_levels
+
+
+def sample_recipe(user, title='Sample recipe'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5)
+
+
+class BitSlicedCountTests(TestCase):
+    """Tests counting bitmap membership with bit planes"""
+
+    def test_counts_split_into_levels(self):
+        """Test that each position lands in the level of its count"""
+        planes = bit_sliced_sum([0b0111, 0b0110, 0b0100, 0b0100])
+        levels = count_levels(planes, 0b1111)
+        self.assertEqual(levels, {1: 0b0001, 2: 0b0010, 4: 0b0100})
+
+
+class RecipeIndexTests(TestCase):
+    """Tests the per-user tag/ingredient bitmap index"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        index_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.salad = sample_recipe(self.user, 'Salad')
+        self.risotto = sample_recipe(self.user, 'Risotto')
+        self.steak = sample_recipe(self.user, 'Steak')
+        self.salad.tags.add(self.vegan, self.quick)
+        self.risotto.tags.add(self.vegan)
+        self.risotto.ingredients.add(self.rice)
+        self.steak.tags.add(self.quick)
+
+    def matching(self, index, include=(), exclude=(), match_all=True):
+        return set(index.recipe_ids(
+            index.match(include, exclude, match_all)))
+
+    def test_set_algebra(self):
+        """Test AND, OR and NOT combinations of tags and ingredients"""
+        index = RecipeIndex.build(self.user.id, 0)
+        vegan, quick = (TAG, self.vegan.id), (TAG, self.quick.id)
+        rice = (INGREDIENT, self.rice.id)
+
+        self.assertEqual(self.matching(index, [vegan, quick]),
+                         {self.salad.id})
+        self.assertEqual(self.matching(index, [rice, quick], match_all=False),
+                         {self.risotto.id, self.salad.id, self.steak.id})
+        self.assertEqual(self.matching(index, [vegan], [rice]),
+                         {self.salad.id})
+        self.assertEqual(self.matching(index, exclude=[quick]),
+                         {self.risotto.id})
+
+    def test_rank_by_overlap(self):
+        """Test ranking recipes by shared features and feature count"""
+        index = RecipeIndex.build(self.user.id, 0)
+        kinds = (TAG, INGREDIENT)
+        features = index.recipe_features(self.salad.id, kinds)
+        ranked = index.rank(
+            features, kinds, lambda overlap, size: overlap / size, 10,
+            exclude=index.recipe_bitmap(self.salad.id))
+
+        self.assertEqual(sorted(features),
+                         sorted([(TAG, self.vegan.id), (TAG, self.quick.id)]))
+        self.assertEqual(ranked, [
+            (self.steak.id, 1, 1, 1.0),
+            (self.risotto.id, 1, 2, 0.5),
+        ])
+
+    def test_index_updated_incrementally(self):
+        """Test that committed changes are applied without a rebuild"""
+        index = index_cache.get(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = sample_recipe(self.user, 'Soup')
+            soup.ingredients.add(self.rice)
+            self.risotto.ingredients.remove(self.rice)
+            self.salad.delete()
+            self.vegan.recipe_set.add(self.steak)
+
+        self.assertIs(index_cache.get(self.user.id), index)
+        self.assertEqual(self.matching(index, [(INGREDIENT, self.rice.id)]),
+                         {soup.id})
+        self.assertEqual(self.matching(index, [(TAG, self.vegan.id)]),
+                         {self.risotto.id, self.steak.id})
+
+    def test_index_rebuilt_after_external_change(self):
+        """Test that a change made by another process forces a rebuild"""
+        index = index_cache.get(self.user.id)
+        cache.incr(f'recipe:generation:{self.user.id}')
+
+        self.assertIsNot(index_cache.get(self.user.id), index)
+
+    @override_settings(RECIPE_INDEX_MAX_BYTES=1)
+    def test_indexes_evicted_over_budget(self):
+        """Test that least recently used indexes are evicted"""
+        other_user = get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1')
+        index_cache.get(self.user.id)
+        index_cache.get(other_user.id)
+
+        self.assertEqual(list(index_cache.entries), [other_user.id])
@@ -0,0 +1,195 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChangeLog, Ingredient, Recipe, Tag
+from recipe import changes
+
+CHANGES_URL = reverse('recipe:changes')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, title='Salad'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=5)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class ChangeFeedApiTests(TestCase):
+    """Test syncing recipes, tags and ingredients from a cursor"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@mail.com', 'Sstring1')
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = sample_recipe(self.user)
+        self.recipe.tags.add(self.tag)
+        self.cursor = self.sync()['cursor']
+
+    def sync(self, cursor=None, **params):
+        if cursor is not None:
+            params['cursor'] = cursor
+        res = self.client.get(CHANGES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_required(self):
+        """Test that the feed requires authentication"""
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_first_sync_requests_resync(self):
+        """Test that a client without a cursor starts with a full sync"""
+        data = self.sync()
+
+        self.assertTrue(data['resync'])
+        self.assertNotIn('changed', data)
+        self.assertEqual(self.sync(data['cursor'])['changed']['recipes'], [])
+
+    def test_changes_since_cursor(self):
+        """Test that only the objects written after the cursor are sent"""
+        sample_recipe(self.user, 'Untouched')
+        cursor = self.sync()['cursor']
+        self.client.patch(f'{RECIPE_URL}{self.recipe.id}/',
+                          {'title': 'Stew'})
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+
+        data = self.sync(cursor)
+
+        self.assertFalse(data['resync'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual([recipe['title'] for recipe in
+                          data['changed']['recipes']], ['Stew'])
+        self.assertEqual(data['changed']['ingredients'],
+                         [{'id': ingredient.id, 'name': 'Rice'}])
+        self.assertEqual(data['changed']['tags'], [])
+        self.assertEqual(self.sync(data['cursor'])['changed']['recipes'], [])
+
+    def test_update_logged_with_one_insert(self):
+        """Test that the writes of an update are logged together"""
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(f'{RECIPE_URL}{self.recipe.id}/',
+                              {'title': 'Stew', 'tags': [tag.id]})
+
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT INTO "core_changelog"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_deletions_sent_as_tombstones(self):
+        """Test that deleted objects are listed by id"""
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+
+        data = self.sync(self.cursor)
+
+        self.assertEqual(data['deleted']['recipes'], [recipe_id])
+        self.assertEqual(data['changed']['recipes'], [])
+
+    def test_deleted_tag_changes_its_recipes(self):
+        """Test that recipes listing a deleted tag are sent again"""
+        tag_id = self.tag.id
+        self.tag.delete()
+
+        data = self.sync(self.cursor)
+
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertEqual(data['changed']['recipes'][0]['tags'], [])
+
+    def test_sync_reads_changes_not_collection(self):
+        """Test that the cost of a sync follows the number of changes"""
+        for i in range(20):
+            sample_recipe(self.user, str(i))
+        cursor = self.sync()['cursor']
+        self.recipe.title = 'Stew'
+        self.recipe.save()
+
+        # The log, the changed recipe and its two kinds of links
+        with self.assertNumQueries(4):
+            data = self.sync(cursor)
+
+        self.assertEqual(len(data['changed']['recipes']), 1)
+
+    def test_pages_follow_the_log(self):
+        """Test that a limited sync continues where it stopped"""
+        recipes = [sample_recipe(self.user, str(i)) for i in range(5)]
+
+        first = self.sync(self.cursor, limit=3)
+        second = self.sync(first['cursor'], limit=3)
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        titles = [recipe['title'] for page in (first, second)
+                  for recipe in page['changed']['recipes']]
+        self.assertEqual(titles, [recipe.title for recipe in recipes])
+
+    def test_unsettled_changes_held_back(self):
+        """Test that changes newer than the settle delay wait"""
+        sample_recipe(self.user, 'Fresh')
+
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync(self.cursor)
+
+        self.assertEqual(data['changed']['recipes'], [])
+        self.assertEqual(changes.decode_cursor(self.user, data['cursor']),
+                         changes.decode_cursor(self.user, self.cursor))
+
+    def test_expired_cursor_requests_resync(self):
+        """Test that cursors older than the retention force a resync"""
+        later = timezone.now() + timedelta(days=31)
+        with patch('django.core.signing.time.time',
+                   return_value=later.timestamp()):
+            data = self.sync(self.cursor)
+
+        self.assertTrue(data['resync'])
+
+    def test_cursor_expires_with_its_unread_entries(self):
+        """Test that a page cursor ages with the entries it has not read"""
+        for i in range(5):
+            sample_recipe(self.user, str(i))
+        ChangeLog.objects.filter(user=self.user).update(
+            changed_at=timezone.now() - timedelta(days=29))
+        cursor = self.sync(self.cursor, limit=3)['cursor']
+
+        later = timezone.now() + timedelta(days=2)
+        with patch('django.core.signing.time.time',
+                   return_value=later.timestamp()):
+            data = self.sync(cursor)
+
+        self.assertTrue(data['resync'])
+
+    def test_invalid_cursor_rejected(self):
+        """Test that tampered cursors and other users' cursors fail"""
+        other = get_user_model().objects.create_user(
+            'other@mail.com', 'Sstring1')
+        foreign = changes.encode_cursor(other, 0)
+
+        for cursor in (self.cursor + 'x', foreign):
+            res = self.client.get(CHANGES_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_expired_entries(self):
+        """Test that entries older than the retention are deleted"""
+        ChangeLog.objects.filter(user=self.user).update(
+            changed_at=timezone.now() - timedelta(days=31))
+        sample_recipe(self.user, 'Fresh')
+        out = StringIO()
+
+        call_command('prune_changes', batch_size=1, stdout=out)
+
+        self.assertEqual(ChangeLog.objects.count(), 1)
+        self.assertIn('3 change log entries deleted', out.getvalue())
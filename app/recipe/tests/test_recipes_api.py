@@ -1,10 +1,19 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, RecipeSnapshot, Tag, Ingredient
+from recipe.bitmap_index import INGREDIENT, index_cache
+from recipe.queries import Percentiles
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+import base64
+import json
+import math
 import tempfile
 import os
 from PIL import Image
@@ -328,3 +337,840 @@ class RecipeImageUploadTest(TestCase):
         self.assertEqual(len(res.data), 2)
         serializer = RecipeSerializer([recipe1, recipe2], many=True)
         self.assertEqual(serializer.data, res.data)
+
+    def test_search_ignores_case(self):
+        """Test that searches match names whatever their case"""
+        tag = sample_tag(user=self.user, name='Gluten Free')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        sample_recipe(user=self.user)
+
+        res = self.client.get(search_url(), {'tag': 'gluten f'})
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_search_lists_recipes_once(self):
+        """Test that a recipe with several matching entries is one hit"""
+        recipe = sample_recipe(user=self.user)
+        recipe.ingredients.add(
+            sample_ingredient(user=self.user, name='Sea salt'),
+            sample_ingredient(user=self.user, name='Salt'))
+
+        res = self.client.get(search_url(), {'ingredient': 'salt'})
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_search_without_match(self):
+        """Test that a name matching no ingredient finds no recipe"""
+        recipe = sample_recipe(user=self.user)
+        recipe.ingredients.add(sample_ingredient(user=self.user, name='Egg'))
+
+        res = self.client.get(search_url(), {'ingredient': 'flour'})
+
+        self.assertEqual(res.data, [])
+
+
+def shopping_list_url():
+    """Return URL for the shopping list"""
+    return reverse('recipe:recipe-shopping-list')
+
+
+class ShoppingListApiTests(TestCase):
+    """Tests merging the ingredients of several recipes"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.salt = sample_ingredient(user=self.user, name='Salt')
+        self.egg = sample_ingredient(user=self.user, name='Egg')
+        self.recipe1 = sample_recipe(user=self.user, title='Omelette')
+        self.recipe2 = sample_recipe(user=self.user, title='Fries')
+        self.recipe1.ingredients.add(self.salt, self.egg)
+        self.recipe2.ingredients.add(self.salt)
+
+    def get_list(self, *recipes):
+        ids = ','.join(str(recipe.id) for recipe in recipes)
+        return self.client.get(shopping_list_url(), {'recipes': ids})
+
+    def test_ingredients_merged(self):
+        """Test that shared ingredients are listed once with their recipes"""
+        res = self.get_list(self.recipe1, self.recipe2)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.egg.id, 'name': 'Egg',
+             'recipes': [self.recipe1.id]},
+            {'id': self.salt.id, 'name': 'Salt',
+             'recipes': sorted([self.recipe1.id, self.recipe2.id])},
+        ])
+
+    def test_other_users_recipes_ignored(self):
+        """Test that recipes of other users are not included"""
+        other_user = sample_user(email='other@mail.com')
+        other_recipe = sample_recipe(user=other_user)
+        other_recipe.ingredients.add(
+            sample_ingredient(user=other_user, name='Pepper'))
+
+        res = self.get_list(self.recipe2, other_recipe)
+
+        self.assertEqual(res.data, [
+            {'id': self.salt.id, 'name': 'Salt',
+             'recipes': [self.recipe2.id]},
+        ])
+
+    def test_computed_in_one_query(self):
+        """Test that the list is built with a single grouped query"""
+        recipes = [self.recipe1, self.recipe2]
+        for i in range(20):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.ingredients.add(self.salt, self.egg)
+            recipes.append(recipe)
+
+        with self.assertNumQueries(1):
+            res = self.get_list(*recipes)
+        self.assertEqual(len(res.data[1]['recipes']), 22)
+
+    def test_cached_until_recipes_change(self):
+        """Test that the cached list is refreshed after a change"""
+        self.get_list(self.recipe1)
+        with self.assertNumQueries(0):
+            self.get_list(self.recipe1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe1.ingredients.remove(self.egg)
+        res = self.get_list(self.recipe1)
+
+        self.assertEqual([item['name'] for item in res.data], ['Salt'])
+
+    def test_invalid_ids_rejected(self):
+        """Test that malformed recipe ids return bad request"""
+        res = self.client.get(shopping_list_url(), {'recipes': '1,a'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFeatureFilterApiTests(TestCase):
+    """Tests filtering the recipe list by tag and ingredient ids"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.rice = sample_ingredient(user=self.user, name='Rice')
+        self.salad = sample_recipe(user=self.user, title='Salad')
+        self.risotto = sample_recipe(user=self.user, title='Risotto')
+        self.steak = sample_recipe(user=self.user, title='Steak')
+        self.salad.tags.add(self.vegan)
+        self.risotto.tags.add(self.vegan)
+        self.risotto.ingredients.add(self.rice)
+
+    def listed_titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_filter_all(self):
+        """Test that recipes must have every requested tag and ingredient"""
+        titles = self.listed_titles(
+            {'tags': f'{self.vegan.id}', 'ingredients': f'{self.rice.id}'})
+        self.assertEqual(titles, ['Risotto'])
+
+    def test_filter_any(self):
+        """Test matching recipes with any of the requested ids"""
+        titles = self.listed_titles({'tags': f'{self.vegan.id}',
+                                     'match': 'any'})
+        self.assertEqual(titles, ['Risotto', 'Salad'])
+
+    def test_filter_exclude(self):
+        """Test excluding recipes with an ingredient"""
+        titles = self.listed_titles({'exclude_ingredients': f'{self.rice.id}'})
+        self.assertEqual(titles, ['Steak', 'Salad'])
+
+    def test_other_users_ids_match_nothing(self):
+        """Test that another user's tag does not leak their recipes"""
+        other_user = sample_user(email='other@mail.com')
+        other_tag = sample_tag(user=other_user)
+        sample_recipe(user=other_user).tags.add(other_tag)
+
+        self.assertEqual(self.listed_titles({'tags': f'{other_tag.id}'}), [])
+
+    def test_invalid_match_rejected(self):
+        """Test that an unknown match mode returns bad request"""
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pages_sliced_from_index(self):
+        """Test that only the recipes of the page are fetched"""
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'Bowl {i}').tags.add(
+                self.vegan)
+        params = {'tags': f'{self.vegan.id}', 'limit': 2}
+        self.client.get(RECIPE_URL, params)
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(RECIPE_URL, params).data
+
+        # The page's recipes, then their tags and ingredients
+        self.assertEqual(len(queries), 3)
+        self.assertIn('IN (%d, %d)' % tuple(
+            recipe['id'] for recipe in first['results']),
+            queries[0]['sql'])
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+        self.assertEqual(
+            [recipe['title'] for page in (first, second, third)
+             for recipe in page['results']],
+            ['Bowl 2', 'Bowl 1', 'Bowl 0', 'Risotto', 'Salad'])
+        self.assertIsNone(third['next'])
+
+    @override_settings(RECIPE_FETCH_CHUNK_SIZE=1)
+    def test_ranges_and_ordering_with_pages(self):
+        """Test that range filters and orderings apply to matched ids"""
+        for price in (3, 1, 2, 9):
+            sample_recipe(user=self.user, title=f'Bowl {price}',
+                          price=price).tags.add(self.vegan)
+        params = {'tags': f'{self.vegan.id}', 'max_price': 5,
+                  'ordering': '-price', 'limit': 2}
+
+        first = self.client.get(RECIPE_URL, params).data
+        second = self.client.get(first['next']).data
+
+        self.assertEqual(
+            [recipe['title'] for page in (first, second)
+             for recipe in page['results']],
+            ['Bowl 3', 'Bowl 2', 'Bowl 1'])
+
+    def test_page_numbers_counted_from_index(self):
+        """Test that numbered pages report the exact number of matches"""
+        res = self.client.get(
+            RECIPE_URL, {'tags': f'{self.vegan.id}', 'page': 2,
+                         'page_size': 1})
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertFalse(res.data['count_is_estimated'])
+        self.assertEqual([recipe['title'] for recipe in res.data['results']],
+                         ['Salad'])
+
+
+def similar_url(recipe_id):
+    """Return URL for the recipes similar to a recipe"""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def stale_index_recipe(user, ingredients):
+    """
+    Add a recipe that does not exist to the user's cached index, linked
+    to the ingredients, as if it was deleted after the index was loaded.
+    """
+    ghost = Recipe.objects.order_by('-id').values_list('id', flat=True)[0]
+    ghost += 100
+    index = index_cache.get(user.id)
+    index.add_recipe(ghost)
+    index.link(INGREDIENT, [ghost], [item.id for item in ingredients])
+    return ghost
+
+
+class SimilarRecipesApiTests(TestCase):
+    """Tests ranking recipes by shared tags and ingredients"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        rice = sample_ingredient(user=self.user, name='Rice')
+        egg = sample_ingredient(user=self.user, name='Egg')
+        peas = sample_ingredient(user=self.user, name='Peas')
+        self.fried_rice = sample_recipe(user=self.user, title='Fried rice')
+        self.fried_rice.ingredients.add(rice, egg, peas)
+        self.risotto = sample_recipe(user=self.user, title='Risotto')
+        self.risotto.ingredients.add(rice, peas)
+        self.omelette = sample_recipe(user=self.user, title='Omelette')
+        self.omelette.ingredients.add(egg)
+        sample_recipe(user=self.user, title='Toast')
+
+    def test_similar_recipes_ranked(self):
+        """Test that recipes are ordered by Jaccard similarity"""
+        res = self.client.get(similar_url(self.fried_rice.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in res.data],
+                         ['Risotto', 'Omelette'])
+        self.assertEqual([item['score'] for item in res.data],
+                         [round(2 / 3, 4), round(1 / 3, 4)])
+
+    def test_cosine_metric_and_limit(self):
+        """Test choosing the metric and the number of results"""
+        res = self.client.get(similar_url(self.fried_rice.id),
+                              {'metric': 'cosine', 'k': 1})
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], self.risotto.id)
+        self.assertEqual(res.data[0]['score'], round(2 / math.sqrt(6), 4))
+
+    def test_other_users_recipe_not_found(self):
+        """Test that similarity of other users' recipes is not exposed"""
+        other_recipe = sample_recipe(user=sample_user(email='o@mail.com'))
+        res = self.client.get(similar_url(other_recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_index_ids_skipped(self):
+        """Test that recipes left in the index after deletion are skipped"""
+        ghost = stale_index_recipe(
+            self.user, self.fried_rice.ingredients.all())
+        res = self.client.get(similar_url(self.fried_rice.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn(ghost, [item['id'] for item in res.data])
+        self.assertEqual(len(res.data), 2)
+
+    def test_invalid_parameters_rejected(self):
+        """Test that unknown metrics and bad limits return bad request"""
+        url = similar_url(self.fried_rice.id)
+        for params in ({'metric': 'euclid'}, {'k': 0}, {'k': 'x'}):
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+class CookableRecipesApiTests(TestCase):
+    """Tests ranking recipes by the ingredients on hand"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.rice = sample_ingredient(user=self.user, name='Rice')
+        self.egg = sample_ingredient(user=self.user, name='Egg')
+        peas = sample_ingredient(user=self.user, name='Peas')
+        milk = sample_ingredient(user=self.user, name='Milk')
+        sugar = sample_ingredient(user=self.user, name='Sugar')
+        lettuce = sample_ingredient(user=self.user, name='Lettuce')
+        recipes = {
+            'Pudding': (self.rice, self.egg, milk, sugar),
+            'Risotto': (self.rice, peas),
+            'Fried rice': (self.rice, self.egg, peas),
+            'Omelette': (self.egg,),
+            'Salad': (lettuce,),
+        }
+        for title, ingredients in recipes.items():
+            sample_recipe(user=self.user, title=title) \
+                .ingredients.add(*ingredients)
+        sample_recipe(user=self.user, title='Toast')
+
+    def test_recipes_ranked_by_coverage(self):
+        """Test ordering by coverage, then by fewest missing ingredients"""
+        res = self.client.get(COOKABLE_URL, {
+            'ingredients': f'{self.rice.id},{self.egg.id},{self.egg.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['title'], item['coverage'], item['missing'])
+             for item in res.data],
+            [('Omelette', 1.0, 0), ('Fried rice', round(2 / 3, 4), 1),
+             ('Risotto', 0.5, 1), ('Pudding', 0.5, 2)])
+
+    def test_limit_results(self):
+        """Test limiting the number of recipes returned"""
+        res = self.client.get(
+            COOKABLE_URL, {'ingredients': self.rice.id, 'k': 2})
+
+        self.assertEqual([item['title'] for item in res.data],
+                         ['Risotto', 'Fried rice'])
+
+    def test_stale_index_ids_skipped(self):
+        """Test that recipes left in the index after deletion are skipped"""
+        stale_index_recipe(self.user, [self.rice])
+        res = self.client.get(COOKABLE_URL, {'ingredients': self.rice.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+    def test_other_users_ingredients_ignored(self):
+        """Test that ingredients of other users match no recipe"""
+        other = sample_user(email='o@mail.com')
+        ingredient = sample_ingredient(user=other, name='Rice')
+        sample_recipe(user=other).ingredients.add(ingredient)
+
+        res = self.client.get(COOKABLE_URL, {'ingredients': ingredient.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+class RecipeStatsApiTests(TestCase):
+    """Tests the price and cooking time statistics"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        for price, time_minutes in ((2, 10), (4, 20), (6, 30), (10, 60)):
+            recipe = sample_recipe(
+                user=self.user, price=price, time_minutes=time_minutes)
+            if price < 5:
+                recipe.tags.add(self.vegan)
+        sample_recipe(user=sample_user(email='o@mail.com'), price=100)
+
+    def test_statistics_of_users_recipes(self):
+        """Test aggregates, percentiles and histogram of a column"""
+        res = self.client.get(STATS_URL, {'buckets': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 4)
+        self.assertEqual(res.data['price'], {
+            'min': 2.0,
+            'max': 10.0,
+            'mean': 5.5,
+            'percentiles': {'50': 4.0, '90': 10.0, '99': 10.0},
+            'histogram': [
+                {'start': 2.0, 'end': 6.0, 'count': 2},
+                {'start': 6.0, 'end': 10.0, 'count': 2},
+            ],
+        })
+        self.assertEqual(res.data['time_minutes']['mean'], 30.0)
+
+    def test_statistics_filtered_by_tag(self):
+        """Test restricting the statistics to recipes with a tag"""
+        res = self.client.get(STATS_URL, {'tags': self.vegan.id})
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['time_minutes']['max'], 20.0)
+
+    def test_statistics_refreshed_after_change(self):
+        """Test that cached statistics are invalidated by recipe writes"""
+        self.client.get(STATS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_recipe(user=self.user, price=1)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 5)
+        self.assertEqual(res.data['price']['min'], 1.0)
+
+    def test_percentiles_aggregated_on_postgresql(self):
+        """Test that PostgreSQL computes every percentile in one pass"""
+        queryset = Recipe.objects.values('user').annotate(
+            percentiles=Percentiles('price', (50, 90, 99)))
+
+        self.assertIn('PERCENTILE_DISC(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP '
+                      '(ORDER BY "core_recipe"."price")', str(queryset.query))
+
+    def test_statistics_without_recipes(self):
+        """Test the statistics of an empty selection"""
+        res = self.client.get(STATS_URL, {'ingredients': 999})
+
+        self.assertEqual(res.data['count'], 0)
+        self.assertEqual(res.data['price']['percentiles']['50'], None)
+        self.assertEqual(res.data['price']['histogram'], [])
+
+
+class RecipeRangeOrderingApiTests(TestCase):
+    """Tests range filters, ordering and keyset pages of recipe lists"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            sample_recipe(user=self.user, title=title, price=price,
+                          time_minutes=time_minutes)
+            for title, price, time_minutes in (
+                ('Stew', 12, 90), ('Salad', 6, 10), ('Omelette', 4, 10),
+                ('Curry', 9, 40), ('Toast', 2, 5), ('Salad', 7, 15))
+        ]
+
+    def titles(self, res):
+        return [item['title'] for item in res.data]
+
+    def test_filter_by_ranges_and_order(self):
+        """Test listing recipes under 30 minutes, cheapest first"""
+        res = self.client.get(
+            RECIPE_URL, {'max_time': 30, 'min_price': 3, 'ordering': 'price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(res), ['Omelette', 'Salad', 'Salad'])
+        self.assertEqual(res.data[1]['id'], self.recipes[1].id)
+
+    def test_descending_order_breaks_ties_by_id(self):
+        """Test that equal values keep a stable order"""
+        res = self.client.get(RECIPE_URL, {'ordering': '-title'})
+
+        self.assertEqual(self.titles(res),
+                         ['Toast', 'Stew', 'Salad', 'Salad', 'Omelette',
+                          'Curry'])
+        self.assertEqual([res.data[2]['id'], res.data[3]['id']],
+                         [self.recipes[5].id, self.recipes[1].id])
+
+    def test_invalid_parameters_rejected(self):
+        """Test that malformed ranges and orderings return bad request"""
+        for params in ({'min_price': 10, 'max_price': 5},
+                       {'min_time': 'x'}, {'ordering': 'link'},
+                       {'limit': 0}):
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keyset_pages(self):
+        """Test walking all pages of an ordering through next links"""
+        res = self.client.get(
+            RECIPE_URL, {'ordering': '-time_minutes', 'limit': 4})
+        first_page = res.data['results']
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [item['id'] for item in first_page + res.data['results']],
+            [self.recipes[i].id for i in (0, 3, 5, 2, 1, 4)])
+        self.assertIsNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test that a cursor of another ordering is rejected"""
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'limit': 1})
+        cursor = res.data['next'].split('cursor=')[1]
+
+        res = self.client.get(RECIPE_URL, {'cursor': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor(self):
+        """Test that cursors that do not decode to a position fail"""
+        for data in (b'[["-id"], 5]', b'{}', b'"x"', b'not json'):
+            cursor = base64.urlsafe_b64encode(data).decode()
+            res = self.client.get(RECIPE_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipePageNumberApiTests(TestCase):
+    """Tests page number pagination of recipe lists"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        for title in ('Stew', 'Salad', 'Curry'):
+            sample_recipe(user=self.user, title=title)
+
+    def test_page_reports_count(self):
+        """Test that pages report an exact count for small lists"""
+        res = self.client.get(RECIPE_URL, {'page': 2, 'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertFalse(res.data['count_is_estimated'])
+        self.assertIsNone(res.data['next'])
+        self.assertEqual([item['title'] for item in res.data['results']],
+                         ['Stew'])
+
+
+class RecipeSnapshotApiTests(TestCase):
+    """Tests serving recipe details from stored snapshots"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user, name='Vegan')
+        self.ingredient = sample_ingredient(user=self.user, name='Rice')
+        self.recipe = sample_recipe(user=self.user)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get_detail(self):
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_detail_read_with_one_query(self):
+        """Test that the detail is one row read of pre-encoded content"""
+        with self.assertNumQueries(1):
+            res = self.get_detail()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.data, RecipeDetailSerializer(self.recipe).data)
+
+    def test_snapshot_follows_feature_changes(self):
+        """Test that renamed and deleted tags and ingredients are applied"""
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+        self.ingredient.delete()
+
+        res = self.get_detail()
+
+        self.assertEqual([tag['name'] for tag in res.data['tags']],
+                         ['Vegetarian'])
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_snapshot_follows_reverse_link_changes(self):
+        """Test that links changed from the tag side are applied"""
+        self.tag.recipe_set.clear()
+        self.assertEqual(self.get_detail().data['tags'], [])
+
+        self.tag.recipe_set.add(self.recipe)
+        self.assertEqual(len(self.get_detail().data['tags']), 1)
+
+    def test_snapshot_follows_update(self):
+        """Test that updating through the API refreshes the snapshot"""
+        tag = sample_tag(user=self.user, name='Quick')
+        self.client.patch(detail_url(self.recipe.id),
+                          {'title': 'Fried rice', 'tags': [tag.id]})
+
+        res = self.get_detail()
+
+        self.assertEqual(res.data['title'], 'Fried rice')
+        self.assertEqual([item['name'] for item in res.data['tags']],
+                         ['Quick'])
+
+    def test_other_users_snapshot_not_found(self):
+        """Test that other users' recipes are not served"""
+        self.client.force_authenticate(sample_user(email='o@mail.com'))
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeBulkDeleteApiTests(TestCase):
+    """Tests deleting several recipes in the background"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_delete_scheduled(self):
+        """Test that the user's recipes are queued for deletion"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        other_recipe = sample_recipe(user=sample_user(email='o@mail.com'))
+
+        res = self.client.post(
+            reverse('recipe:recipe-bulk-delete'),
+            {'ids': [recipes[0].id, recipes[1].id, other_recipe.id]},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['total'], 2)
+
+    def test_invalid_ids_rejected(self):
+        """Test that an empty or malformed list returns bad request"""
+        for payload in ({'ids': []}, {'ids': ['a']}, {}):
+            res = self.client.post(reverse('recipe:recipe-bulk-delete'),
+                                   payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeMinimalUpdateApiTests(TestCase):
+    """Tests that recipe updates only write what changed"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.quick = sample_tag(user=self.user, name='Quick')
+        self.spicy = sample_tag(user=self.user, name='Spicy')
+        self.recipe = sample_recipe(user=self.user, price=5)
+        self.recipe.tags.add(self.vegan, self.quick)
+
+    def writes(self, payload):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(self.recipe.id), payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+            and 'recipesnapshot' not in query['sql']
+            and 'changelog' not in query['sql']
+        ]
+
+    def test_only_changed_columns_written(self):
+        """Test that a title change updates the title column alone"""
+        writes = self.writes({'title': 'Curry', 'price': '5.00'})
+
+        self.assertEqual(len(writes), 1)
+        self.assertIn('SET "title"', writes[0])
+        self.assertNotIn('"price"', writes[0])
+
+    def test_links_updated_as_diff(self):
+        """Test that only added and removed links are written"""
+        writes = self.writes(
+            {'tags': [self.quick.id, self.spicy.id]})
+
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {self.quick.id, self.spicy.id})
+
+    def test_unchanged_update_skips_writes(self):
+        """Test that a patch repeating current values writes nothing"""
+        writes = self.writes({
+            'title': self.recipe.title,
+            'tags': [self.vegan.id, self.quick.id],
+        })
+
+        self.assertEqual(writes, [])
+
+
+class RecipeStreamingListApiTests(TestCase):
+    """Tests streaming unpaginated recipe lists"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        vegan = sample_tag(user=self.user, name='Vegan')
+        quick = sample_tag(user=self.user, name='Quick')
+        rice = sample_ingredient(user=self.user, name='Rice')
+        for i in range(5):
+            recipe = sample_recipe(
+                user=self.user, title=f'Caf\u00e9 \u2028 "{i}"', price=i + 0.5,
+                link=f'https://example.com/{i}' if i % 2 else '')
+            recipe.tags.add(quick, vegan)
+            if i % 2:
+                recipe.ingredients.add(rice)
+        sample_recipe(user=sample_user(email='other@mail.com'))
+
+    def expected(self):
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        return JSONRenderer().render(
+            RecipeSerializer(recipes, many=True).data)
+
+    def test_list_streamed_as_rendered(self):
+        """Test that the streamed list matches the rendered serializer"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(b''.join(res.streaming_content), self.expected())
+
+    @override_settings(RECIPE_STREAM_CHUNK_SIZE=2)
+    def test_links_loaded_per_chunk(self):
+        """Test that each chunk loads its tags and ingredients at once"""
+        res = self.client.get(RECIPE_URL)
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(res.streaming_content)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), self.expected())
+        self.assertEqual(len(queries), 1 + 3 * 2)
+
+    def test_empty_list(self):
+        """Test that an empty list is streamed as valid JSON"""
+        Recipe.objects.filter(user=self.user).delete()
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_filters_applied(self):
+        """Test that list filters apply to the streamed list"""
+        res = self.client.get(RECIPE_URL, {'max_price': '1.00'})
+
+        self.assertEqual([recipe['price'] for recipe in res.data], ['0.50'])
+
+    def test_indented_json_not_streamed(self):
+        """Test that other representations are rendered as before"""
+        res = self.client.get(
+            RECIPE_URL, HTTP_ACCEPT='application/json; indent=2')
+
+        self.assertFalse(res.streaming)
+        self.assertEqual(len(res.data), 5)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class RecipeStreamingReplicaTests(TestCase):
+    """Tests streaming recipe lists from a read replica"""
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        self.replica = connections['replica']
+        # The replica mirrors the test database; let it read the rows of
+        # the transaction wrapping each test
+        with self.replica.cursor() as cursor:
+            cursor.execute('PRAGMA read_uncommitted = 1')
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        sample_recipe(user=self.user, title='Salad')
+
+    def test_streamed_from_routed_database(self):
+        """Test that the list is read after routing, from the replica"""
+        res = self.client.get(RECIPE_URL)
+        with CaptureQueriesContext(self.replica) as queries:
+            content = json.loads(b''.join(res.streaming_content))
+
+        self.assertEqual([recipe['title'] for recipe in content], ['Salad'])
+        # The recipes, then their tags and ingredients
+        self.assertEqual(len(queries), 3)
+
+
+MULTI_GET_URL = reverse('recipe:recipe-multi-get')
+
+
+class RecipeMultiGetApiTests(TestCase):
+    """Tests fetching the details of several recipes at once"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(email='test@mail.com')
+        self.client.force_authenticate(self.user)
+        tag = sample_tag(user=self.user, name='Vegan')
+        self.recipes = [sample_recipe(user=self.user, title=str(i))
+                        for i in range(3)]
+        self.recipes[1].tags.add(tag)
+
+    def multi_get(self, ids):
+        return self.client.get(
+            MULTI_GET_URL, {'ids': ','.join(str(pk) for pk in ids)})
+
+    def test_details_in_requested_order(self):
+        """Test that details follow the order of the ids"""
+        ids = [self.recipes[2].id, self.recipes[0].id, self.recipes[1].id]
+
+        with self.assertNumQueries(1):
+            res = self.multi_get(ids)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = [RecipeDetailSerializer(Recipe.objects.get(id=pk)).data
+                    for pk in ids]
+        self.assertEqual(res.data['results'], expected)
+        self.assertEqual(res.data['missing'], [])
+
+    def test_missing_and_other_users_ids_reported(self):
+        """Test that unknown ids and other users' recipes are missing"""
+        other = sample_recipe(user=sample_user(email='o@mail.com'))
+
+        res = self.multi_get([other.id, self.recipes[0].id, 9999])
+
+        self.assertEqual([recipe['id'] for recipe in res.data['results']],
+                         [self.recipes[0].id])
+        self.assertEqual(res.data['missing'], [other.id, 9999])
+
+    def test_unsnapshotted_recipes_loaded_at_once(self):
+        """Test that recipes without snapshots are read with one query"""
+        RecipeSnapshot.objects.all().delete()
+        ids = [recipe.id for recipe in reversed(self.recipes)]
+
+        # Snapshots, recipes, then one query per relation
+        with self.assertNumQueries(4):
+            res = self.multi_get(ids)
+
+        self.assertEqual([recipe['id'] for recipe in res.data['results']],
+                         ids)
+        self.assertEqual(res.data['results'][1]['tags'][0]['name'], 'Vegan')
+
+    def test_ids_required_and_bounded(self):
+        """Test that empty and oversized id lists are rejected"""
+        for ids in ([], range(1, 102)):
+            res = self.multi_get(ids)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -9,5 +9,8 @@ router.register('recipe', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('changes/', views.ChangeFeedView.as_view(), name='changes'),
+    path('exports/<int:pk>/', views.RecipeExportView.as_view(),
+         name='export'),
     path('', include(router.urls)),
 ]
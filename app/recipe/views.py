@@ -1,17 +1,63 @@
+import json
+import math
+from operator import itemgetter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext as _
 from rest_framework import viewsets, mixins, status
-from rest_framework import authentication
 from rest_framework import permissions
-from core.models import Tag, Ingredient, Recipe
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+from core import deletion
+from core.authentication import TokenAuthentication
+from core.models import Tag, Ingredient, Job, Recipe, RecipeSnapshot
+from core.responses import PreRenderedResponse, StreamingJSONResponse, \
+    renders_plain_json
+from core.throttling import AllThrottles, IPSlidingWindowThrottle, \
+    SlidingWindowThrottle
 from recipe import serializers
+from recipe.bitmap_index import INGREDIENT, TAG, index_cache
+from recipe.cache import cache_key
+from recipe.jobs import export_storage
+from recipe.changes import ExpiredCursor, change_feed, decode_cursor, \
+    deferred_changes, encode_cursor, head_position
+from recipe.pagination import RecipePagination
+from recipe.queries import filter_by_catalog, recipe_stats, shopping_list
+from recipe.renderers import RecipeStreamRenderer
+from recipe.snapshots import deferred_snapshots, render_snapshot
+from user.serializers import DeletionTaskSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 
+def jaccard(count):
+    """Jaccard similarity to a recipe with ``count`` features"""
+    return lambda overlap, size: overlap / (count + size - overlap)
+
+
+def cosine(count):
+    """Cosine similarity to a recipe with ``count`` features"""
+    return lambda overlap, size: overlap / math.sqrt(count * size)
+
+
+SIMILARITY_METRICS = {'jaccard': jaccard, 'cosine': cosine}
+
+
+def coverage(overlap, size):
+    """Share of a recipe's ingredients on hand, then fewest missing"""
+    return overlap / size, overlap - size
+
+
 class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base ViewSet for recipe attributes (eg.: Tag, Ingredient)"""
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_queryset(self):
@@ -35,16 +81,196 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
+class ChangeFeedView(APIView):
+    """
+    Recipes, tags and ingredients changed since a cursor, with the ids of
+    the deleted ones. Without a cursor, or when the cursor has expired,
+    the response asks for a full resync and carries the cursor to sync
+    from once the full lists have been downloaded.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= settings.SYNC_MAX_PAGE_SIZE:
+            raise ValidationError({'limit': _(
+                'Expected a number between 1 and %d')
+                % settings.SYNC_MAX_PAGE_SIZE})
+        cursor = request.query_params.get('cursor')
+        position = None
+        if cursor:
+            try:
+                position = decode_cursor(request.user, cursor)
+            except ExpiredCursor:
+                pass
+            except signing.BadSignature:
+                raise ValidationError({'cursor': _('Invalid cursor')})
+        if position is None:
+            return Response({
+                'resync': True,
+                'cursor': encode_cursor(
+                    request.user, head_position(request.user)),
+            })
+        feed, cursor = change_feed(request.user, position, limit)
+        feed.update(resync=False, cursor=cursor)
+        return Response(feed)
+
+
+class RecipeExportView(APIView):
+    """Download the file written by a finished export job"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request, pk):
+        job = get_object_or_404(
+            Job, id=pk, user=request.user, name='recipe_export',
+            status=Job.DONE)
+        return FileResponse(
+            export_storage().open(job.result['path']), as_attachment=True,
+            filename='recipes.json', content_type='application/json')
+
+
 class RecipeViewSet(viewsets.ModelViewSet):
     """ Manage recipe in the database """
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
+    pagination_class = RecipePagination
+    # Actions rate limited per user, see THROTTLE_RATES
+    throttle_scopes = {'create': 'recipe_create', 'upload_image': 'upload'}
+
+    def _params_to_ints(self, name):
+        """Convert a comma separated query parameter to a list of ints"""
+        value = self.request.query_params.get(name, '')
+        try:
+            return [int(str_id) for str_id in value.split(',') if str_id]
+        except ValueError:
+            raise ValidationError({name: _('Expected comma separated ids')})
+
+    def _limit_param(self, name, maximum, default=10):
+        """Read a positive integer query parameter capped at maximum"""
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            value = 0
+        if not 0 < value <= maximum:
+            raise ValidationError(
+                {name: _('Expected a number between 1 and %d') % maximum})
+        return value
 
     def get_queryset(self):
         """Returns objects for the current authenticated user"""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list':
+            return self._filter_and_order(queryset)
+        return queryset.order_by('-id')
+
+    def _filter_and_order(self, queryset):
+        """
+        Apply the ``min_price``, ``max_price``, ``min_time`` and
+        ``max_time`` ranges and the ``ordering`` parameter. The ordering
+        always ends with the id so that it is stable across pages.
+        """
+        params = serializers.RecipeListParamsSerializer(
+            data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        values = params.validated_data
+        filters = {
+            lookup: values[name]
+            for name, lookup in (('min_price', 'price__gte'),
+                                 ('max_price', 'price__lte'),
+                                 ('min_time', 'time_minutes__gte'),
+                                 ('max_time', 'time_minutes__lte'))
+            if name in values
+        }
+        queryset = queryset.filter(**filters)
+        self.range_filters = filters
+        ordering = values.get('ordering')
+        if ordering is None:
+            return queryset.order_by('-id')
+        direction = '-' if ordering.startswith('-') else ''
+        return queryset.order_by(ordering, direction + 'id')
+
+    def _feature_matches(self, queryset):
+        """
+        Filter by tag and ingredient ids using the user's bitmap index:
+        ``tags`` and ``ingredients`` must all match (or any of them with
+        ``match=any``), ``exclude_tags`` and ``exclude_ingredients`` must
+        not match.
+
+        Returns the ordering values of the matching recipes in list
+        order, ending with their id, or None without these filters. The
+        ids come sorted from the index unless range filters or another
+        ordering need their columns, which are then read in chunks.
+        """
+        include = [(TAG, pk) for pk in self._params_to_ints('tags')] + \
+            [(INGREDIENT, pk) for pk in self._params_to_ints('ingredients')]
+        exclude = \
+            [(TAG, pk) for pk in self._params_to_ints('exclude_tags')] + \
+            [(INGREDIENT, pk)
+             for pk in self._params_to_ints('exclude_ingredients')]
+        if not include and not exclude:
+            return None
+        match = self.request.query_params.get('match', 'all')
+        if match not in ('all', 'any'):
+            raise ValidationError({'match': _("Expected 'all' or 'any'")})
+
+        index = index_cache.get(self.request.user.id)
+        ids = index.recipe_ids(
+            index.match(include, exclude, match_all=match == 'all'))
+        ordering = [str(field) for field in queryset.query.order_by]
+        if not self.range_filters and ordering == ['-id']:
+            return [(pk,) for pk in sorted(ids, reverse=True)]
+
+        fields = [field.lstrip('-') for field in ordering]
+        size = settings.RECIPE_FETCH_CHUNK_SIZE
+        rows = []
+        for start in range(0, len(ids), size):
+            rows.extend(queryset.order_by().filter(
+                id__in=ids[start:start + size]).values_list(*fields))
+        # Stable sorts, least significant field first
+        for position in reversed(range(len(ordering))):
+            rows.sort(key=itemgetter(position),
+                      reverse=ordering[position].startswith('-'))
+        return rows
+
+    def _fetch_in_order(self, queryset, ids):
+        """Recipes with the given ids, in that order"""
+        recipes = queryset.prefetch_related('tags', 'ingredients').in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+    def _list_matches(self, queryset, rows):
+        """
+        List the recipes matched by the bitmap index. Pages are sliced
+        from the matched rows, then only the page's recipes are fetched.
+        """
+        ordering = [str(field) for field in queryset.query.order_by]
+        page = self.paginator.paginate_rows(
+            rows, queryset.model, ordering, self.request)
+        if page is not None:
+            recipes = self._fetch_in_order(
+                queryset, [row[-1] for row in page])
+            serializer = self.get_serializer(recipes, many=True)
+            return self.get_paginated_response(serializer.data)
+        ids = [row[-1] for row in rows]
+        if renders_plain_json(self.request.accepted_renderer,
+                              self.request.accepted_media_type):
+            return StreamingJSONResponse(
+                RecipeStreamRenderer().render_ids(queryset, ids))
+        size = settings.RECIPE_FETCH_CHUNK_SIZE
+        recipes = [
+            recipe for start in range(0, len(ids), size)
+            for recipe in self._fetch_in_order(
+                queryset, ids[start:start + size])
+        ]
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -57,6 +283,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def get_throttles(self):
+        """
+        Rate limit the writes that are expensive to serve, per user and
+        per address so that many accounts cannot share one client.
+        """
+        scope = self.throttle_scopes.get(self.action)
+        if scope is None:
+            return []
+        return [AllThrottles(SlidingWindowThrottle(scope),
+                             IPSlidingWindowThrottle(f'{scope}_ip'))]
+
     def get_serializer_context(self):
         """
         Extra context provided to the serializer class.
@@ -67,9 +304,76 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'view': self
         }
 
+    def list(self, request, *args, **kwargs):
+        """Stream unpaginated JSON lists instead of building them whole"""
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self._feature_matches(queryset)
+        if rows is not None:
+            return self._list_matches(queryset, rows)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            prefetch_related_objects(page, 'tags', 'ingredients')
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        if renders_plain_json(request.accepted_renderer,
+                              request.accepted_media_type):
+            return StreamingJSONResponse(
+                RecipeStreamRenderer().render(queryset))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the stored snapshot of a recipe with one row read"""
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        content = RecipeSnapshot.objects.filter(
+            recipe_id=recipe_id, user=request.user,
+        ).values_list('data', flat=True).first()
+        if content is None:
+            # Not snapshotted yet (see check_recipe_snapshots --repair)
+            return super().retrieve(request, *args, **kwargs)
+        return PreRenderedResponse(content.encode(), status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='multi-get')
+    def multi_get(self, request):
+        """
+        Return the details of the recipes in ``ids`` in the requested
+        order, read from their snapshots with one query, and the ids that
+        were not found.
+        """
+        recipe_ids = list(dict.fromkeys(self._params_to_ints('ids')))
+        if not recipe_ids:
+            raise ValidationError({'ids': _('Expected comma separated ids')})
+        if len(recipe_ids) > settings.RECIPE_MULTI_GET_MAX:
+            raise ValidationError({'ids': _('Too many recipes')})
+        details = dict(RecipeSnapshot.objects.filter(
+            user=request.user, recipe_id__in=recipe_ids,
+        ).values_list('recipe_id', 'data'))
+        unsnapshotted = [pk for pk in recipe_ids if pk not in details]
+        if unsnapshotted:
+            # Not snapshotted yet (see check_recipe_snapshots --repair)
+            recipes = self.queryset.filter(
+                user=request.user, id__in=unsnapshotted,
+            ).prefetch_related('tags', 'ingredients')
+            for recipe in recipes:
+                details[recipe.id] = render_snapshot(recipe)
+        results = ','.join(details[pk] for pk in recipe_ids if pk in details)
+        missing = [pk for pk in recipe_ids if pk not in details]
+        content = '{"results":[%s],"missing":%s}' % (
+            results, json.dumps(missing, separators=(',', ':')))
+        return PreRenderedResponse(content.encode(), status=status.HTTP_200_OK)
+
     def perform_create(self, serializer):
         """Create a new recipe"""
-        serializer.save(user=self.request.user)
+        with deferred_snapshots(), deferred_changes():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a recipe, refreshing its snapshot once"""
+        with deferred_snapshots(), deferred_changes():
+            serializer.save()
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -81,16 +385,111 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete several recipes in the background"""
+        serializer = serializers.RecipeBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task = deletion.schedule_recipe_deletion(
+            request.user, serializer.validated_data['ids'])
+        return Response(DeletionTaskSerializer(task).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """Merge the ingredients of several recipes into one list"""
+        recipe_ids = sorted(set(self._params_to_ints('recipes')))
+        if len(recipe_ids) > settings.SHOPPING_LIST_MAX_RECIPES:
+            raise ValidationError({'recipes': _('Too many recipes')})
+        key = cache_key(request.user.id, 'shopping-list', recipe_ids)
+        data = cache.get(key)
+        if data is None:
+            data = shopping_list(request.user, recipe_ids)
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """Aggregate statistics of price and cooking time"""
+        tag_ids = sorted(set(self._params_to_ints('tags')))
+        ingredient_ids = sorted(set(self._params_to_ints('ingredients')))
+        buckets = self._limit_param(
+            'buckets', settings.RECIPE_STATS_MAX_BUCKETS)
+        key = cache_key(
+            request.user.id, 'stats', tag_ids, ingredient_ids, buckets)
+        data = cache.get(key)
+        if data is None:
+            recipes = self.queryset.filter(user=request.user)
+            for pk in tag_ids:
+                recipes = recipes.filter(tags=pk)
+            for pk in ingredient_ids:
+                recipes = recipes.filter(ingredients=pk)
+            data = recipe_stats(recipes, buckets)
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """Return the recipes sharing most tags and ingredients"""
+        recipe = self.get_object()
+        metric = request.query_params.get('metric', 'jaccard')
+        if metric not in SIMILARITY_METRICS:
+            raise ValidationError(
+                {'metric': _("Expected 'jaccard' or 'cosine'")})
+        limit = self._limit_param('k', settings.SIMILAR_RECIPES_MAX)
+
+        index = index_cache.get(request.user.id)
+        kinds = (TAG, INGREDIENT)
+        features = index.recipe_features(recipe.id, kinds)
+        ranked = index.rank(
+            features, kinds, SIMILARITY_METRICS[metric](len(features)),
+            limit, exclude=index.recipe_bitmap(recipe.id))
+
+        return self._ranked_response(ranked, lambda overlap, size, score: {
+            'score': round(score, 4),
+        })
+
+    @action(methods=['GET'], detail=False, url_path='cookable')
+    def cookable(self, request):
+        """Rank recipes by how many of their ingredients are on hand"""
+        ingredient_ids = set(self._params_to_ints('ingredients'))
+        limit = self._limit_param('k', settings.COOKABLE_RECIPES_MAX)
+
+        index = index_cache.get(request.user.id)
+        ranked = index.rank(
+            [(INGREDIENT, pk) for pk in ingredient_ids], (INGREDIENT,),
+            coverage, limit)
+
+        return self._ranked_response(ranked, lambda overlap, size, score: {
+            'coverage': round(score[0], 4),
+            'missing': size - overlap,
+        })
+
+    def _ranked_response(self, ranked, extra_fields):
+        """
+        Serialize the recipes ranked by the bitmap index, adding the
+        fields ``extra_fields(overlap, size, score)`` returns. Ids of
+        recipes deleted since the index was loaded are skipped.
+        """
+        recipes = self.queryset.filter(
+            user=self.request.user, id__in=[row[0] for row in ranked],
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        data = []
+        for recipe_id, overlap, size, score in ranked:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            item = serializers.RecipeSerializer(recipe).data
+            item.update(extra_fields(overlap, size, score))
+            data.append(item)
+        return Response(data, status=status.HTTP_200_OK)
+
     @action(methods=['GET'], detail=False, url_path='search-recipe')
     def search_recipe(self, request):
         ingredient_name = request.query_params.get('ingredient')
         tag_name = request.query_params.get('tag')
-        ingredients = Ingredient.objects.all().filter(name__contains=ingredient_name) if ingredient_name else []
-        tags = Tag.objects.all().filter(name__contains=tag_name) if tag_name else []
         recipes = Recipe.objects.all().filter(user=self.request.user)
-        if ingredients:
-            recipes = recipes.filter(ingredients__in=ingredients)
-        if tags:
-            recipes = recipes.filter(tags__in=tags)
+        recipes = filter_by_catalog(recipes, 'ingredients', ingredient_name)
+        recipes = filter_by_catalog(recipes, 'tags', tag_name)
         serializer = serializers.RecipeSerializer(recipes, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
+from core.models import DeletionTask
+from core.profiling import ProfiledSerializerMixin
 from django.utils.translation import ugettext_lazy as _
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Serializer for the users objects"""
 
     class Meta:
@@ -49,3 +51,13 @@ class AuthTokenSerializer(serializers.Serializer):
             raise serializers.ValidationError(msg, code='authentication')
         attrs['user'] = user
         return attrs
+
+
+class DeletionTaskSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of background deletions"""
+
+    class Meta:
+        model = DeletionTask
+        fields = ('id', 'kind', 'status', 'total', 'deleted', 'created_at',
+                  'finished_at')
+        read_only_fields = fields
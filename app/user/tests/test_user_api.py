@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import DeletionTask
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -122,3 +124,49 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class AccountDeletionApiTests(TestCase):
+    """Test deleting the authenticated account"""
+
+    def setUp(self) -> None:
+        self.user = create_user(email='test@mail.com', password='Sstring1')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_delete_account_scheduled(self):
+        """Test that deleting the account deactivates it right away"""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], DeletionTask.PENDING)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_account_deletion_progress_link(self):
+        """Test that progress is readable once the tokens are gone"""
+        res = self.client.delete(ME_URL)
+        client = APIClient()
+
+        progress = client.get(res.data['progress_url'])
+        tampered = client.get(
+            res.data['progress_url'].replace('progress/', 'progress/1'))
+
+        self.assertEqual(progress.status_code, status.HTTP_200_OK)
+        self.assertEqual(progress.data['id'], res.data['id'])
+        self.assertEqual(tampered.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deletion_progress(self):
+        """Test reading the progress of an own deletion task"""
+        task = DeletionTask.objects.create(
+            kind=DeletionTask.RECIPES, user=self.user, total=3, deleted=1)
+        other_task = DeletionTask.objects.create(
+            kind=DeletionTask.RECIPES,
+            user=create_user(email='o@mail.com', password='Sstring1'))
+
+        res = self.client.get(reverse('user:deletion', args=[task.id]))
+        other_res = self.client.get(
+            reverse('user:deletion', args=[other_task.id]))
+
+        self.assertEqual((res.data['deleted'], res.data['total']), (1, 3))
+        self.assertEqual(other_res.status_code, status.HTTP_404_NOT_FOUND)
@@ -5,5 +5,9 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me')
+    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('deletions/<int:pk>/', views.DeletionTaskView.as_view(),
+         name='deletion'),
+    path('deletions/progress/<str:token>/',
+         views.DeletionProgressView.as_view(), name='deletion-progress'),
 ]
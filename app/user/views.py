@@ -1,5 +1,13 @@
-from user.serializers import UserSerializer, AuthTokenSerializer
-from rest_framework import generics, authentication, permissions
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+    DeletionTaskSerializer
+from django.urls import reverse
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from core import deletion
+from core.models import DeletionTask
+from core.authentication import TokenAuthentication
+from core.throttling import IPSlidingWindowThrottle
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -8,18 +16,58 @@ class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
 
+    def get_throttles(self):
+        return [IPSlidingWindowThrottle('signup')]
+
 
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def get_throttles(self):
+        return [IPSlidingWindowThrottle('login')]
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the account and delete its data in the background"""
+        task = deletion.schedule_account_deletion(self.get_object())
+        data = DeletionTaskSerializer(task).data
+        # The account's tokens are gone, so progress is read through a
+        # signed link instead of the authenticated endpoint
+        data['progress_url'] = request.build_absolute_uri(reverse(
+            'user:deletion-progress',
+            args=[deletion.progress_token(task)]))
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class DeletionTaskView(generics.RetrieveAPIView):
+    """Progress of a background deletion of the authenticated user"""
+    serializer_class = DeletionTaskSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return DeletionTask.objects.filter(user=self.request.user)
+
+
+class DeletionProgressView(generics.RetrieveAPIView):
+    """Progress of a deletion task read through its signed link"""
+    serializer_class = DeletionTaskSerializer
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get_object(self):
+        task = deletion.task_from_token(self.kwargs['token'])
+        if task is None:
+            raise NotFound()
+        return task